@@ -1,14 +1,89 @@
 # api.py
-from fastapi import FastAPI, HTTPException, Query, Body
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Body, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import json
 import os
 from typing import List, Dict, Any, Optional
 
 # 导入修正后的 models
-from models import CharacterData, CalculationRequest
+from models import CharacterData, CalculationRequest, TeamSearchRequest, RotationRequest
+from main import run_optimizer, run_rotation, plan_team_search, TeamSearch, artifacts_version
+from src.common.jobs import JobQueue, QueueFullError
+from src.common.logger import metrics, MetricsRegistry
+from src.common.repository import repository, CHARACTERS_PATH, SET_EFFECTS_PATH
+from src.common.result_cache import ResultCache, cache_key
+from src.engine.formula import compile_formula, FormulaError
+
+# --- 指标 (GET /metrics，Prometheus 文本格式) ---
+HTTP_LATENCY = metrics.histogram("genshin_http_request_duration_seconds", "HTTP 请求耗时 (秒)",
+                                 ("method", "route", "status"))
+PHASE_LATENCY = metrics.histogram("genshin_optimizer_phase_seconds", "优化任务各阶段耗时 (秒，见 meta.timings)",
+                                  ("kind", "phase"))
+OPTIMIZER_RUNS = metrics.counter("genshin_optimizer_runs_total", "优化任务完成次数", ("kind", "engine", "stop_reason"))
+OPTIMIZER_EVALUATIONS = metrics.counter("genshin_optimizer_evaluations_total", "优化器适应度评估次数", ("engine",))
+FITNESS_CACHE = metrics.counter("genshin_fitness_cache_lookups_total", "优化器适应度缓存查询次数", ("engine", "result"))
+JOBS_FINISHED = metrics.counter("genshin_jobs_finished_total", "后台任务结束次数", ("kind", "status"))
+JOB_QUEUE = metrics.gauge("genshin_job_queue", "后台任务队列状态", ("state",))
+RESULT_CACHE = metrics.gauge("genshin_result_cache", "结果缓存状态", ("stat",))
+
+
+def record_result(kind: str, result) -> None:
+    """把一次优化结果的 meta (阶段耗时 / 评估次数 / 适应度缓存命中) 汇总进指标"""
+    meta = result.get("meta", {}) if isinstance(result, dict) else {}
+    # 剖析下的阶段耗时含剖析开销，不计入直方图
+    for name, ms in ({} if "profile" in meta else meta.get("timings", {})).items():
+        if name.endswith("_ms"): PHASE_LATENCY.observe(ms / 1000, kind=kind, phase=name[:-3])
+    stats = meta.get("optimizer")
+    if not stats: return
+    engine = stats.get("engine", meta.get("engine", ""))
+    OPTIMIZER_RUNS.inc(kind=kind, engine=engine, stop_reason=stats.get("stop_reason", "completed"))
+    OPTIMIZER_EVALUATIONS.inc(stats.get("evaluations", 0), engine=engine)
+    FITNESS_CACHE.inc(stats.get("cache_hits", 0), engine=engine, result="hit")
+    FITNESS_CACHE.inc(stats.get("cache_misses", 0), engine=engine, result="miss")
+
+
+def record_job(job) -> None:
+    JOBS_FINISHED.inc(kind=job.kind, status=job.status)
+    if job.status == "done": record_result(job.kind, job.result)
+
+
+# --- 后台任务配置 (并发上限 / 排队上限) ---
+JOB_WORKERS = int(os.environ.get("GENSHIN_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("GENSHIN_JOB_QUEUE", "16"))
+
+jobs = JobQueue(max_workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE, on_finish=record_job)
+# SSE 进度流读取进度事件的间隔 (秒)
+PROGRESS_POLL_S = 0.2
+
+# --- 单次优化的墙钟预算上限 (毫秒，0 为不限)：请求未给出或超出时按此截断，保证响应时延 ---
+MAX_TIME_BUDGET_MS = int(os.environ.get("GENSHIN_MAX_TIME_BUDGET_MS", "0"))
 
-app = FastAPI(title="Genshin Calc API - Dynamic Meta")
+# --- 结果缓存配置 (条目上限 / 可选 SQLite 文件，留空则只在内存) ---
+RESULT_CACHE_SIZE = int(os.environ.get("GENSHIN_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DB = os.environ.get("GENSHIN_RESULT_CACHE_DB", "")
+
+result_cache = ResultCache(maxsize=RESULT_CACHE_SIZE, path=RESULT_CACHE_DB or None)
+
+# --- 按需性能剖析 (请求带 profile=true)：默认关闭，生产环境不要开启；可选把 .prof 文件存入目录 ---
+PROFILING_ENABLED = os.environ.get("GENSHIN_PROFILING", "0") == "1"
+PROFILE_DIR = os.environ.get("GENSHIN_PROFILE_DIR", "")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    jobs.shutdown()
+    result_cache.close()
+
+
+app = FastAPI(title="Genshin Calc API - Dynamic Meta", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,22 +93,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def observe_latency(request: Request, call_next):
+    # 按路由模板 (而非实际路径) 聚合，避免 /api/jobs/{job_id} 之类的标签无限增长
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_LATENCY.observe(time.perf_counter() - t0, method=request.method,
+                             route=getattr(route, "path", "unmatched"), status=str(status))
+
 # --- 路径配置 ---
-CHAR_DATA_PATH = "data/rules/characters.json"
-SET_EFFECTS_PATH = "data/rules/set_effects.json"
+CHAR_DATA_PATH = CHARACTERS_PATH
 
 
-def load_json(path):
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def load_json(path, copy=False):
+    # 经进程内仓库读取 (文件未变不重复解析)；需要修改时传 copy=True
+    return repository.get(path, default={}, copy=copy)
 
 
 def save_json(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    repository.save(path, data)
 
 
 # --- 🟢 核心辅助：清洗数据 ---
@@ -127,7 +212,7 @@ async def get_character_detail(char_id: str):
 @app.post("/api/characters/{char_id}")
 async def save_character(char_id: str, data: CharacterData, old_id: Optional[str] = Query(None)):
     """接收前端发来的数据 (Rust 已对齐模型)，保存到文件"""
-    chars = load_json(CHAR_DATA_PATH)
+    chars = load_json(CHAR_DATA_PATH, copy=True)
 
     # 处理重命名
     if old_id and old_id != char_id and old_id in chars:
@@ -139,25 +224,305 @@ async def save_character(char_id: str, data: CharacterData, old_id: Optional[str
     return {"status": "success"}
 
 
-@app.post("/api/calculate")
-async def calculate_damage(req: CalculationRequest):
+def optimizer_kwargs(req: CalculationRequest) -> Dict[str, Any]:
+    """规范化请求：队友去重排序 (不含主C)，空串统一为 None，相同组合得到相同参数"""
+    return {
+        "target_char": req.target_char,
+        "teammates": sorted(set(req.teammates) - {req.target_char}),
+        "skill_type": req.skill_type,
+        "reaction": req.reaction if req.reaction else None,  # 空串转 None
+        "forced_set": req.forced_set if req.forced_set else None,
+        "engine": req.engine,
+        **stopping_kwargs(req),
+    }
+
+
+def stopping_kwargs(req) -> Dict[str, Any]:
+    """提前结束参数 (只带上给出的项，未设置时缓存键与旧请求一致)；时间预算受服务端上限约束"""
+    budget = req.time_budget_ms
+    if MAX_TIME_BUDGET_MS > 0:
+        budget = min(budget or MAX_TIME_BUDGET_MS, MAX_TIME_BUDGET_MS)
+    kwargs = {"time_budget_ms": budget, "patience": req.patience,
+              "min_improvement": req.min_improvement if req.patience else None}
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+
+def profiling_kwargs(req, kind: str) -> Dict[str, Any]:
+    """profile=true 时的剖析参数；服务端未开启则拒绝。文件名由服务端生成，不接受客户端路径"""
+    if not req.profile: return {}
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="性能剖析未开启 (服务端设置 GENSHIN_PROFILING=1)")
+    path = os.path.join(PROFILE_DIR, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.prof") \
+        if PROFILE_DIR else None
+    return {"profile": True, "profile_path": path}
+
+
+def result_cache_key(kwargs: Dict[str, Any]) -> str:
+    # 角色 / 圣遗物 / 套装任一文件内容变化，版本号随之变化，旧条目自然失效
+    return cache_key(kwargs, f"{repository.version(CHARACTERS_PATH, SET_EFFECTS_PATH)}:{artifacts_version()}")
+
+
+def cacheable(result) -> bool:
+    # 被取消或因时间预算截断的结果取决于当时负载，不缓存；剖析结果只针对这一次运行，也不缓存
+    meta = result.get("meta", {}) if result else {}
+    stats = meta.get("optimizer", {})
+    return bool(result) and not stats.get("cancelled") and stats.get("stop_reason") != "time_budget" \
+        and "profile" not in meta
+
+
+def submit_calculation(req: CalculationRequest, **extra):
+    profiling = profiling_kwargs(req, "calculate")
     try:
-        from main import run_optimizer, print_result_cli
-        result_data = run_optimizer(
-            target_char=req.target_char,
-            teammates=req.teammates,
-            skill_type=req.skill_type,
-            reaction=req.reaction if req.reaction else None,  # 空串转 None
-            forced_set=req.forced_set
-        )
-        # 可以在服务器控制台打印结果方便调试
-        # print_result_cli(result_data)
-        return result_data
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
+        return jobs.submit(run_optimizer, kind="calculate", **optimizer_kwargs(req), **profiling, **extra)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@app.post("/api/calculate")
+async def calculate_damage(req: CalculationRequest, response: Response):
+    """
+    同步语义：任务在进程池中执行，这里只等待结果，不阻塞其他请求。相同请求 + 相同数据版本直接命中缓存；
+    profile=true 时跳过缓存，结果附 meta.profile (前若干函数的耗时)
+    """
+    key = await run_in_threadpool(result_cache_key, optimizer_kwargs(req))
+    response.headers["X-Cache-Key"] = key
+    cached = await run_in_threadpool(result_cache.get, key) if not req.profile else None
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+    response.headers["X-Cache"] = "MISS"
+    job = await jobs.wait(submit_calculation(req))
+    if job.status != "done":
         # 返回 500 详情
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=job.error)
+    if cacheable(job.result): await run_in_threadpool(result_cache.put, key, job.result)
+    return job.result
+
+
+@app.post("/api/calculate/batch")
+async def calculate_damage_batch(reqs: List[CalculationRequest], request: Request):
+    """
+    批量计算：各项作为 batch 任务提交到共享任务队列，与单次计算共用进程池、并发与排队上限 (队列满时 429)；
+    工作进程按数据版本缓存编译好的圣遗物矩阵与套装表，整批不重复编译。每批最多同时占用 max_workers 个任务位，
+    其余项随前面的完成依次提交。按完成先后以 JSON Lines 逐条返回 ({"index", "status", "cache", "result" | "error"})。
+    不支持 profile。
+    """
+    if any(r.profile for r in reqs):
+        raise HTTPException(status_code=422, detail="批量接口不支持 profile，请改用 /api/calculate")
+    items = [optimizer_kwargs(r) for r in reqs]
+    # 缓存键需读取数据版本，缓存可能落在 SQLite：都放到线程池，不阻塞事件循环
+    keys = await run_in_threadpool(lambda: [result_cache_key(kw) for kw in items])
+    cached = await run_in_threadpool(lambda: {key: result_cache.get(key) for key in dict.fromkeys(keys)})
+    pending: Dict[str, List[int]] = {}  # 同批内相同请求只算一次
+    for i, key in enumerate(keys):
+        if cached[key] is None: pending.setdefault(key, []).append(i)
+    todo = list(pending)
+    running: Dict[asyncio.Task, Any] = {}  # 任务协程 -> (缓存键, Job)
+
+    def submit_next():
+        key = todo[0]
+        job = jobs.submit(run_optimizer, kind="batch", **items[pending[key][0]])
+        todo.pop(0)
+        running[job.task] = (key, job)
+
+    # 首项即排不进队列时整批返回 429
+    if todo:
+        try:
+            submit_next()
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+
+    async def lines():
+        try:
+            for i, key in enumerate(keys):
+                if cached[key] is not None:
+                    yield json_line({"index": i, "status": "done", "cache": "HIT", "result": cached[key]})
+            while running or todo:
+                while todo and len(running) < jobs.max_workers:
+                    try:
+                        submit_next()
+                    except QueueFullError as e:
+                        if running: break  # 等本批已提交的任务完成后再试
+                        for key in todo:
+                            for i in pending[key]:
+                                yield json_line({"index": i, "status": "failed", "cache": "MISS", "error": str(e)})
+                        todo.clear()
+                if not running: break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    key, job = running.pop(task)
+                    if job.status != "done":
+                        for i in pending[key]:
+                            yield json_line({"index": i, "status": "failed", "cache": "MISS", "error": job.error})
+                        continue
+                    if cacheable(job.result): await run_in_threadpool(result_cache.put, key, job.result)
+                    for i in pending[key]:
+                        yield json_line({"index": i, "status": "done", "cache": "MISS", "result": job.result})
+                if await request.is_disconnected(): return
+        finally:
+            # 客户端断开：撤销本批仍在排队的任务
+            for _, job in running.values():
+                jobs.cancel(job)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/calculate/rotation")
+async def calculate_rotation(req: RotationRequest, response: Response):
+    """轮换优化：一次搜索使 Σ 次数 × 单次伤害 最大，结果附各技能伤害拆分"""
+    kwargs = {
+        "target_char": req.target_char,
+        "teammates": sorted(set(req.teammates) - {req.target_char}),
+        "rotation": [{"skill_type": h.skill_type, "hits": h.hits, "reaction": h.reaction if h.reaction else None}
+                     for h in req.rotation],
+        "forced_set": req.forced_set if req.forced_set else None,
+        **stopping_kwargs(req),
+    }
+    profiling = profiling_kwargs(req, "rotation")
+    key = await run_in_threadpool(result_cache_key, {"kind": "rotation", **kwargs})
+    response.headers["X-Cache-Key"] = key
+    cached = await run_in_threadpool(result_cache.get, key) if not req.profile else None
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+    response.headers["X-Cache"] = "MISS"
+    try:
+        job = jobs.submit(run_rotation, kind="rotation", **kwargs, **profiling)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    job = await jobs.wait(job)
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=job.error)
+    if cacheable(job.result): await run_in_threadpool(result_cache.put, key, job.result)
+    return job.result
+
+
+@app.post("/api/teams/search")
+async def search_teams(req: TeamSearchRequest):
+    """
+    配队搜索：先以一个任务求出各队伍的 Buff 面板与伤害上界，再把各队伍的优化作为 team_item 任务按上界顺序
+    提交到同一任务队列 (最多同时占用 max_workers 个任务位，门槛随已完成队伍抬高)，按优化后伤害返回前 top_k 个队伍
+    """
+    try:
+        job = jobs.submit(plan_team_search, kind="team_search", target_char=req.target_char,
+                          skill_type=req.skill_type, candidates=req.candidates,
+                          reaction=req.reaction if req.reaction else None,
+                          forced_set=req.forced_set if req.forced_set else None, engine=req.engine,
+                          team_size=req.team_size)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    job = await jobs.wait(job)
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=job.error)
+    search = TeamSearch(job.result, req.top_k)
+    running: Dict[asyncio.Task, Any] = {}  # 任务协程 -> (上界, 队友, Job)
+    try:
+        while running or search.has_next():
+            while len(running) < jobs.max_workers and search.has_next():
+                bound, team, kwargs = search.peek()
+                try:
+                    item = jobs.submit(run_optimizer, kind="team_item", **kwargs)
+                except QueueFullError as e:
+                    if running: break  # 等已提交的队伍完成后再试
+                    raise HTTPException(status_code=429, detail=str(e))
+                search.advance()
+                running[item.task] = (bound, team, item)
+            if not running: break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                bound, team, item = running.pop(task)
+                if item.status != "done":
+                    raise HTTPException(status_code=500, detail=item.error)
+                search.record(bound, team, item.result)
+    finally:
+        for _, _, item in running.values():
+            jobs.cancel(item)
+    return search.result()
+
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    return result_cache.stats()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus 抓取端点：HTTP / 优化阶段耗时直方图、评估次数、缓存与队列状态"""
+    for state in ("queued", "running", "tracked"):
+        JOB_QUEUE.set(jobs.stats()[state], state=state)
+    for stat, value in result_cache.stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool): RESULT_CACHE.set(value, stat=stat)
+    return Response(metrics.render(), media_type=MetricsRegistry.CONTENT_TYPE)
+
+
+def json_line(data) -> str:
+    return json.dumps(data, ensure_ascii=False, default=float) + "\n"
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=float)}\n\n"
+
+
+@app.post("/api/calculate/stream")
+async def calculate_damage_stream(req: CalculationRequest, request: Request):
+    """
+    SSE 进度流：每代推送 progress (代数 / 当前最优伤害 / 评估速率 / 当前最优配装)，
+    结束时推送 result 或 error。客户端断开即取消任务。
+    """
+    key = await run_in_threadpool(result_cache_key, optimizer_kwargs(req))
+    cached = await run_in_threadpool(result_cache.get, key) if not req.profile else None
+    if cached is not None:
+        return StreamingResponse(iter([sse_event("result", cached)]), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Cache": "HIT", "X-Cache-Key": key})
+    channel = jobs.channel()
+    job = submit_calculation(req, progress=channel)
+
+    async def events():
+        try:
+            yield sse_event("queued", job.to_dict(include_result=False))
+            # 定时取出已到达的进度事件，等待期间不占用线程池；任务结束后再取一次，确保事件全部送出
+            while True:
+                finished = job.finished_at is not None
+                for event in channel.drain():
+                    yield sse_event("progress", event)
+                if finished:
+                    break
+                if await request.is_disconnected():
+                    return
+                await asyncio.sleep(PROGRESS_POLL_S)
+            if job.status == "done":
+                if cacheable(job.result): await run_in_threadpool(result_cache.put, key, job.result)
+                yield sse_event("result", job.result)
+            else:
+                yield sse_event("error", {"status": job.status, "detail": job.error})
+        finally:
+            if job.finished_at is None:
+                channel.cancel()
+                jobs.cancel(job)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      "X-Cache": "MISS", "X-Cache-Key": key})
+
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(req: CalculationRequest):
+    """提交优化任务，立即返回任务 ID"""
+    job = submit_calculation(req)
+    return job.to_dict(include_result=False)
+
+
+@app.get("/api/jobs")
+async def get_job_stats():
+    return jobs.stats()
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在或已过期: {job_id}")
+    return job.to_dict()
 
 @app.get("/api/rules/set_effects")
 async def get_set_effects():
@@ -169,6 +534,15 @@ async def get_set_effects():
 @app.post("/api/rules/set_effects")
 async def save_set_effects(data: dict = Body(...)):
     """保存圣遗物套装配置"""
+    # 动态公式在保存时即编译校验
+    for set_name, effs in data.items():
+        for piece_key, eff_list in (effs.items() if isinstance(effs, dict) else []):
+            for eff in eff_list if isinstance(eff_list, list) else []:
+                if isinstance(eff, dict) and isinstance(eff.get("value"), str):
+                    try:
+                        compile_formula(eff["value"])
+                    except FormulaError as e:
+                        raise HTTPException(status_code=422, detail=f"{set_name} [{piece_key}]: {e}")
     save_json(SET_EFFECTS_PATH, data)
     return {"status": "success"}
 if __name__ == "__main__":
@@ -3,8 +3,10 @@ import json
 import os
 from starlette.responses import RedirectResponse
 
+from src.common.repository import repository, CHARACTERS_PATH
+
 # 数据路径
-DATA_PATH = "data/rules/characters.json"
+DATA_PATH = CHARACTERS_PATH
 
 # --- 中文映射字典 ---
 SKILL_TYPE_MAP = {
@@ -57,19 +59,16 @@ BUFF_TYPE_MAP = [
 
 
 # --- 数据操作 ---
-def load_characters():
-    if not os.path.exists(DATA_PATH): return {}
+def load_characters(copy=False):
+    # 经进程内仓库读取 (文件未变不重复解析)；需要修改时传 copy=True
     try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return repository.get(DATA_PATH, default={}, copy=copy)
     except Exception:
         return {}
 
 
 def save_characters(data):
-    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    repository.save(DATA_PATH, data)
 
 
 skill_types = list(SKILL_TYPE_MAP.keys())
@@ -353,7 +352,7 @@ async def post(req):
     form = await req.form()
     new_id, old_id = form.get("char_id", "").strip(), form.get("old_char_id", "").strip()
     if not new_id: return RedirectResponse("/edit_config", status_code=303)
-    chars = load_characters()
+    chars = load_characters(copy=True)
     if old_id and old_id in chars and old_id != new_id: chars[new_id] = chars.pop(old_id)
     data = chars.setdefault(new_id, {"base_stats": {}, "skills": {}, "buffs": []})
     base = data["base_stats"]
@@ -0,0 +1,255 @@
+# benchmarks/bench.py
+"""
+性能基准 (在项目根目录运行)：
+
+    python -m benchmarks.bench                          # 全部基准，结果写入 benchmarks/results/
+    python -m benchmarks.bench --sizes 500,2000 --only run_optimizer
+    python -m benchmarks.bench --compare old.json       # 运行并与旧结果对比
+    python -m benchmarks.bench --compare old.json new.json  # 只对比两份结果
+
+微基准 (单次伤害 / 面板 / 词条分析) 与圣遗物数量无关，只在最小规模上跑一次；
+导入器、矩阵编译与端到端优化按各规模分别计时。合成数据由 --seed 决定，前后两次运行数据一致。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import timeit
+import importlib.util
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import generate_inventory, to_mona
+from main import load_json, apply_team_buffs_to_panel, resolve_skill_data, resolve_reaction, run_optimizer
+from src.common.repository import CHARACTERS_PATH, SET_EFFECTS_PATH
+from src.engine.analyzer import SubstatAnalyzer
+from src.engine.calculator import DamageCalculator
+from src.optimizer.genetic_algo import ArtifactOptimizer
+from src.optimizer.inventory import CompiledInventory
+
+SIZES = [500, 2000, 10000, 50000]
+CASE = {"target_char": "龙王", "teammates": ["万叶"], "skill_type": "ChargedAttack", "reaction": None}
+RESULTS_DIR = "benchmarks/results"
+CONVERTER_PATH = "src/parser(yas_converter.py"
+REGRESSION_THRESHOLD = 1.10  # 对比时慢于旧结果 10% 以上标记为退化
+
+
+def load_converter():
+    """导入器模块文件名含括号，按路径加载"""
+    spec = importlib.util.spec_from_file_location("yas_converter", CONVERTER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(fn: Callable[[], Any], repeat: int, number: Optional[int] = None,
+            setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """重复 repeat 轮、每轮调用 number 次 (未给出时自动校准到 ≥0.2s)，统计单次调用耗时"""
+    if number is None:
+        number = timeit.Timer(fn).autorange()[0]
+    times = []
+    for _ in range(repeat):
+        if setup is not None: setup()
+        t0 = time.perf_counter()
+        for _ in range(number): fn()
+        times.append((time.perf_counter() - t0) / number)
+    return {"repeat": repeat, "number": number, "min_s": min(times), "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times), "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0}
+
+
+class Scenario:
+    """某一规模下的合成数据 (或给定的圣遗物列表) 与按 case 构造好的优化器 (供各基准复用)"""
+
+    def __init__(self, size: int, seed: int, case: Optional[Dict[str, Any]] = None,
+                 artifacts: Optional[List[Dict[str, Any]]] = None):
+        self.case = case = case or CASE
+        self.seed = seed
+        self.chars = load_json(CHARACTERS_PATH)
+        self.sets = load_json(SET_EFFECTS_PATH)
+        self.artifacts = artifacts if artifacts is not None else generate_inventory(size, list(self.sets), seed)
+        self.size = len(self.artifacts)
+        self.inventory = CompiledInventory(self.artifacts)
+
+        char = self.chars[case["target_char"]]
+        team = {k: self.chars[k] for k in [case["target_char"]] + case["teammates"]}
+        self.element, self.dmg_type = resolve_skill_data(char, case["skill_type"])
+        self.reaction = resolve_reaction(case["reaction"], self.element)
+        self.multipliers = char["skills"][case["skill_type"]]["default"]["multipliers"]
+        self.base, self.fixed_panel, self.fixed_dmg, self.others, _ = apply_team_buffs_to_panel(
+            case["target_char"], team, self.element, case["skill_type"])
+        self.optimizer = self.make_optimizer()
+        random.seed(seed)
+        self.build = self.optimizer._init_population(1)[0]
+        self.panel = self.optimizer._calculate_panel_and_bonus(self.build, case["skill_type"])
+
+    def make_optimizer(self, engine=ArtifactOptimizer) -> ArtifactOptimizer:
+        """按场景参数新建一个优化器 (engine 为 OPTIMIZER_ENGINES 中的类)"""
+        return engine(self.inventory, self.sets, self.base, self.fixed_panel, self.fixed_dmg, self.multipliers,
+                      self.element, self.case["skill_type"], self.dmg_type, self.reaction, self.case.get("forced_set"),
+                      **self.others)
+
+    @property
+    def dataset(self) -> Dict[str, Any]:
+        return {"characters": self.chars, "set_effects": self.sets, "inventory": self.inventory}
+
+
+# --- 各基准：(场景, 参数) -> 计时结果 ---
+def bench_calculate_damage(s: Scenario, args) -> Dict[str, Any]:
+    p = s.panel
+    return measure(lambda: DamageCalculator.calculate_damage(
+        skill_multipliers=s.multipliers, damage_type=s.dmg_type, final_atk=p["atk"], final_hp=p["hp"],
+        final_def=p["def"], final_em=p["em"], final_er_bonus=p.get("energy_recharge_bonus", 0),
+        all_damage_bonus=p["all_damage_bonus"], crit_rate=p["crit_rate"], crit_dmg=p["crit_dmg"],
+        reaction=s.reaction, **s.others), args.repeat)
+
+
+def bench_calculate_panel_and_bonus(s: Scenario, args) -> Dict[str, Any]:
+    return measure(lambda: s.optimizer._calculate_panel_and_bonus(s.build, CASE["skill_type"]), args.repeat)
+
+
+def bench_substat_analyze(s: Scenario, args) -> Dict[str, Any]:
+    calc_args = {"skill_multipliers": s.multipliers, "damage_type": s.dmg_type,
+                 "all_damage_bonus": s.panel["all_damage_bonus"], "reaction": s.reaction}
+    return measure(lambda: SubstatAnalyzer.analyze(s.base, s.panel, calc_args, s.others), args.repeat)
+
+
+def bench_compile_inventory(s: Scenario, args) -> Dict[str, Any]:
+    return measure(lambda: CompiledInventory(s.artifacts), args.repeat)
+
+
+def bench_convert_mona(s: Scenario, args) -> Dict[str, Any]:
+    converter = load_converter()
+    workdir = tempfile.mkdtemp(prefix="bench_mona_")
+    src, dst = os.path.join(workdir, "mona.json"), os.path.join(workdir, "artifacts.json")
+    with open(src, "w", encoding="utf-8") as f:
+        json.dump(to_mona(s.artifacts, seed=s.seed), f, ensure_ascii=False)
+
+    def fresh():  # 每轮都按首次导入计时 (不走增量比对的跳过分支)
+        for path in (dst, os.path.splitext(dst)[0] + ".bin"):
+            if os.path.exists(path): os.remove(path)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            converter.convert_mona_to_my_format(src, dst)
+
+    try:
+        return measure(run, args.macro_repeat, number=1, setup=fresh)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_run_optimizer(s: Scenario, args) -> Dict[str, Any]:
+    stats = {}
+
+    def run():
+        random.seed(s.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_optimizer(CASE["target_char"], CASE["teammates"], CASE["skill_type"], CASE["reaction"],
+                                   engine=args.engine, dataset=s.dataset)
+        stats.update(evaluations=result["meta"]["optimizer"].get("evaluations"),
+                     best_damage=result["solutions"][0]["damage"] if result["solutions"] else 0.0)
+
+    return {**measure(run, args.macro_repeat, number=1), **stats}
+
+
+# 名称 -> (函数, 是否随圣遗物数量变化)
+BENCHMARKS: Dict[str, tuple] = {
+    "calculate_damage": (bench_calculate_damage, False),
+    "calculate_panel_and_bonus": (bench_calculate_panel_and_bonus, False),
+    "substat_analyze": (bench_substat_analyze, False),
+    "compile_inventory": (bench_compile_inventory, True),
+    "convert_mona_to_my_format": (bench_convert_mona, True),
+    "run_optimizer": (bench_run_optimizer, True),
+}
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def run(args) -> Dict[str, Any]:
+    names = args.only or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown: raise SystemExit(f"未知基准: {', '.join(unknown)} (可选: {', '.join(BENCHMARKS)})")
+    results = []
+    for size in args.sizes:
+        todo = [n for n in names if BENCHMARKS[n][1] or size == args.sizes[0]]
+        if not todo: continue
+        print(f"[size={size}] 生成合成圣遗物 (seed={args.seed})...")
+        scenario = Scenario(size, args.seed)
+        for name in todo:
+            fn, sized = BENCHMARKS[name]
+            r = {"name": name, "size": size if sized else None, **fn(scenario, args)}
+            results.append(r)
+            print(f"  {name:<28} {r['median_s'] * 1e3:>12.3f} ms  (min {r['min_s'] * 1e3:.3f}, n={r['number']}×{r['repeat']})")
+    return {"meta": {**environment(), "seed": args.seed, "sizes": args.sizes, "engine": args.engine, "case": CASE},
+            "results": results}
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按 (名称, 规模) 对齐两份结果，ratio = 新中位数 / 旧中位数"""
+    old_by_key = {(r["name"], r["size"]): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        o = old_by_key.get((r["name"], r["size"]))
+        if o is None: continue
+        ratio = r["median_s"] / o["median_s"] if o["median_s"] else float("inf")
+        rows.append({"name": r["name"], "size": r["size"], "old_s": o["median_s"], "new_s": r["median_s"],
+                     "ratio": ratio, "regression": ratio > REGRESSION_THRESHOLD})
+    print(f"\n对比 {old['meta'].get('commit') or '?'} -> {new['meta'].get('commit') or '?'}")
+    for row in rows:
+        flag = "  <-- 退化" if row["regression"] else ""
+        print(f"  {row['name']:<28} {str(row['size'] or '-'):>6} {row['old_s'] * 1e3:>12.3f} ms -> "
+              f"{row['new_s'] * 1e3:>12.3f} ms  x{row['ratio']:.2f}{flag}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GenshinOptimizer 性能基准")
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=SIZES,
+                        help="合成圣遗物数量，逗号分隔 (默认 500,2000,10000,50000)")
+    parser.add_argument("--only", type=lambda v: v.split(","), default=None, help="只运行指定基准，逗号分隔")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="微基准重复轮数")
+    parser.add_argument("--macro-repeat", type=int, default=1, help="导入器 / 端到端优化重复轮数")
+    parser.add_argument("--engine", default="ga", help="端到端优化使用的引擎")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径 (默认 benchmarks/results/<时间>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", default=None,
+                        help="与旧结果对比；给出两个文件时只对比不运行")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) >= 2:
+        with open(args.compare[0], encoding="utf-8") as f: old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f: new = json.load(f)
+        compare(old, new)
+        return
+
+    data = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            compare(json.load(f), data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/quality.py
+"""
+解质量 / 算力基准 (在项目根目录运行)：固定圣遗物库上，以精确引擎 (分支定界) 的最优解为真值，
+对每个引擎、每组 population_size×generations 预算跑多个种子，统计最优性差距、方差与达到 99% 最优所需的时间 / 评估次数。
+
+    python -m benchmarks.quality                                    # 默认：真实圣遗物库 (data/processed)
+    python -m benchmarks.quality --instances real,500,2000 --seeds 10 --budgets 100x20,400x100,1000x200
+    python -m benchmarks.quality --engines ga,islands
+
+据此选择 run_optimizer 的默认预算：输出中 recommended 为平均差距不超过 --target-gap 且
+所有种子都达到 99% 最优的最小预算 (按平均评估次数)。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench import Scenario, environment, RESULTS_DIR
+from main import load_json, OPTIMIZER_ENGINES, GA_BUDGET
+from src.common.repository import ARTIFACTS_PATH
+
+# 固定实例中的角色 / 技能 (与 check 用例一致，覆盖 攻击 / 生命 / 精通 / 激化 几类伤害)
+CASES = [
+    {"target_char": "龙王", "teammates": ["水神-芙宁娜", "万叶", "希诺宁"], "skill_type": "ChargedAttack", "reaction": None},
+    {"target_char": "草神", "teammates": ["白术", "万叶"], "skill_type": "ElementalSkill", "reaction": "spread"},
+    {"target_char": "雷电将军", "teammates": ["万叶", "白术"], "skill_type": "ElementalBurst", "reaction": "aggravate"},
+]
+BUDGETS = [(100, 20), (200, 50), (400, 100), (GA_BUDGET["population_size"], GA_BUDGET["generations"])]
+REACH = 0.99  # 统计达到最优解该比例所需的时间 / 评估次数
+TOP_N = 5
+
+
+def ground_truth(scenario: Scenario) -> Dict[str, Any]:
+    """精确引擎求真值 (剪枝后的实例上等价于穷举)"""
+    opt = scenario.make_optimizer(OPTIMIZER_ENGINES["exact"])
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = opt.optimize(top_n=TOP_N)
+    return {"damage": res[0]["damage"] if res else 0.0, "seconds": time.perf_counter() - t0,
+            "evaluations": opt.evaluations}
+
+
+def run_once(scenario: Scenario, engine: str, population_size: int, generations: int, seed: int,
+             optimum: float) -> Dict[str, Any]:
+    """跑一次并记录每代 (或每轮迁移) 的最优值，求首次达到 REACH×最优 的时刻"""
+    opt = scenario.make_optimizer(OPTIMIZER_ENGINES[engine])
+    reached: Dict[str, Any] = {}
+
+    def progress(event: Dict[str, Any]) -> bool:
+        if not reached and event["best_damage"] >= REACH * optimum:
+            reached.update(seconds=event["elapsed"], evaluations=event["evaluations"])
+        return False
+
+    opt.progress_callback = progress
+    random.seed(seed)
+    kwargs = {"seed": seed} if engine == "islands" else {}
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = opt.optimize(population_size=population_size, generations=generations, top_n=TOP_N, **kwargs)
+    best = res[0]["damage"] if res else 0.0
+    if not reached and best >= REACH * optimum:  # 最后一代之后才达到 (进度按代汇报)
+        reached.update(seconds=time.perf_counter() - t0, evaluations=opt.evaluations)
+    return {"seed": seed, "best": best, "gap": (optimum - best) / optimum if optimum else 0.0,
+            "seconds": time.perf_counter() - t0, "evaluations": opt.evaluations,
+            "reach_seconds": reached.get("seconds"), "reach_evaluations": reached.get("evaluations")}
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    gaps = [r["gap"] for r in runs]
+    reach = [r for r in runs if r["reach_seconds"] is not None]
+    median = lambda xs: statistics.median(xs) if xs else None
+    return {
+        "runs": len(runs),
+        "gap_mean": statistics.fmean(gaps), "gap_stdev": statistics.stdev(gaps) if len(gaps) > 1 else 0.0,
+        "gap_max": max(gaps), "optimal_rate": sum(g <= 1e-9 for g in gaps) / len(gaps),
+        "reach_rate": len(reach) / len(runs),
+        "reach_seconds_median": median([r["reach_seconds"] for r in reach]),
+        "reach_evaluations_median": median([r["reach_evaluations"] for r in reach]),
+        "seconds_mean": statistics.fmean(r["seconds"] for r in runs),
+        "evaluations_mean": statistics.fmean(r["evaluations"] for r in runs),
+    }
+
+
+def recommend(rows: List[Dict[str, Any]], target_gap: float) -> Dict[str, Optional[str]]:
+    """每个引擎：在所有实例上都满足 (平均差距 ≤ target_gap 且全部种子达到 99%) 的最小预算"""
+    picks = {}
+    for engine in sorted({r["engine"] for r in rows}):
+        by_budget: Dict[str, List[Dict[str, Any]]] = {}
+        for r in rows:
+            if r["engine"] == engine: by_budget.setdefault(r["budget"], []).append(r)
+        ok = [(statistics.fmean(x["evaluations_mean"] for x in rs), b) for b, rs in by_budget.items()
+              if all(x["gap_mean"] <= target_gap and x["reach_rate"] == 1.0 for x in rs)]
+        picks[engine] = min(ok)[1] if ok else None
+    return picks
+
+
+def load_instance(name: str, seed: int, case: Dict[str, Any]) -> Scenario:
+    """real = data/processed/artifacts.json；数字 = 该数量的合成圣遗物库"""
+    if name == "real":
+        return Scenario(0, seed, case, artifacts=load_json(ARTIFACTS_PATH))
+    return Scenario(int(name), seed, case)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="优化引擎解质量 / 算力基准")
+    parser.add_argument("--instances", type=lambda v: v.split(","), default=["real"],
+                        help="real 或合成圣遗物数量，逗号分隔 (合成库的真值求解较慢，500 件约 10~25 秒 / 用例)")
+    parser.add_argument("--engines", type=lambda v: v.split(","), default=["ga"])
+    parser.add_argument("--budgets", type=lambda v: [tuple(int(x) for x in b.split("x")) for b in v.split(",")],
+                        default=BUDGETS, help="population_size x generations，逗号分隔，如 100x20,1000x200")
+    parser.add_argument("--seeds", type=int, default=5, help="每组预算的种子数")
+    parser.add_argument("--data-seed", type=int, default=0, help="合成圣遗物库的种子")
+    parser.add_argument("--target-gap", type=float, default=0.001, help="推荐预算允许的平均最优性差距")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径 (默认 benchmarks/results/quality-<时间>.json)")
+    args = parser.parse_args()
+
+    rows = []
+    for instance in args.instances:
+        for case in CASES:
+            scenario = load_instance(instance, args.data_seed, case)
+            truth = ground_truth(scenario)
+            label = f"{instance}/{case['target_char']}/{case['skill_type']}"
+            print(f"[{label}] {scenario.size} 件，最优 {truth['damage']:.1f} "
+                  f"(精确引擎 {truth['seconds']:.2f}s, {truth['evaluations']} 次评估)")
+            for engine in args.engines:
+                for population_size, generations in args.budgets:
+                    runs = [run_once(scenario, engine, population_size, generations, seed, truth["damage"])
+                            for seed in range(args.seeds)]
+                    row = {"instance": instance, "size": scenario.size, "case": case, "engine": engine,
+                           "budget": f"{population_size}x{generations}", "population_size": population_size,
+                           "generations": generations, "optimum": truth["damage"], "ground_truth": truth,
+                           **summarize(runs), "seeds": runs}
+                    rows.append(row)
+                    reach_s = row["reach_seconds_median"]
+                    print(f"  {engine:<8} {row['budget']:>9}  差距 均值 {row['gap_mean']:.3%} ± {row['gap_stdev']:.3%} "
+                          f"(最大 {row['gap_max']:.3%}, 命中最优 {row['optimal_rate']:.0%})  "
+                          f"99%: {row['reach_rate']:.0%} / {'-' if reach_s is None else f'{reach_s:.2f}s'}  "
+                          f"耗时 {row['seconds_mean']:.2f}s")
+
+    picks = recommend(rows, args.target_gap)
+    print(f"\n当前 run_optimizer 默认预算: {GA_BUDGET['population_size']}x{GA_BUDGET['generations']}")
+    for engine, budget in picks.items():
+        print(f"推荐预算 [{engine}]: {budget or '无满足条件的预算'} (平均差距 ≤ {args.target_gap:.2%}，全部种子达到 99%)")
+
+    data = {"meta": {**environment(), "default_budget": GA_BUDGET, "instances": args.instances, "engines": args.engines, "seeds": args.seeds,
+                     "data_seed": args.data_seed, "target_gap": args.target_gap, "reach": REACH},
+            "recommended": picks, "results": rows}
+    output = args.output or os.path.join(RESULTS_DIR, f"quality-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/synthetic.py
+"""
+带种子的合成圣遗物库：按游戏内 5 星 +20 圣遗物的主词条概率、副词条权重与档位生成，
+套装名取自 set_effects.json。同一 (数量, 种子) 每次生成完全相同的数据。
+"""
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+SLOTS = ["flower", "plume", "sands", "goblet", "circlet"]
+
+# 主词条：部位 -> [(类型, 元素, 数值, 权重)]
+MAIN_STATS: Dict[str, List[tuple]] = {
+    "flower": [("hp_flat", "null", 4780.0, 1)],
+    "plume": [("atk_flat", "null", 311.0, 1)],
+    "sands": [("hp_percent", "null", 0.466, 26.68), ("atk_percent", "null", 0.466, 26.66),
+              ("def_percent", "null", 0.583, 26.66), ("energy_recharge", "null", 0.518, 10),
+              ("em", "null", 187.0, 10)],
+    "goblet": [("hp_percent", "null", 0.466, 19.25), ("atk_percent", "null", 0.466, 19.25),
+               ("def_percent", "null", 0.583, 19), ("em", "null", 187.0, 2.5),
+               ("elemental_bonus", "Physical", 0.583, 5)] +
+              [("elemental_bonus", e, 0.466, 5) for e in ("Pyro", "Hydro", "Electro", "Cryo", "Anemo", "Geo", "Dendro")],
+    "circlet": [("hp_percent", "null", 0.466, 22), ("atk_percent", "null", 0.466, 22),
+                ("def_percent", "null", 0.583, 22), ("crit_rate", "null", 0.311, 10),
+                ("crit_dmg", "null", 0.622, 10), ("healing_bonus", "null", 0.359, 10), ("em", "null", 187.0, 4)],
+}
+
+# 副词条：类型 -> (单次最高档数值, 出现权重)
+SUB_STATS: Dict[str, tuple] = {
+    "hp_flat": (298.75, 6), "atk_flat": (19.45, 6), "def_flat": (23.15, 6),
+    "hp_percent": (0.0583, 4), "atk_percent": (0.0583, 4), "def_percent": (0.0729, 4),
+    "energy_recharge": (0.0648, 4), "em": (23.31, 4), "crit_rate": (0.0389, 3), "crit_dmg": (0.0777, 3),
+}
+ROLL_TIERS = (0.7, 0.8, 0.9, 1.0)
+FLAT_STATS = {"hp_flat", "atk_flat", "def_flat", "em"}
+FOUR_LINER_CHANCE = 0.2  # 初始 4 词条的概率 (否则 3 词条，+4 时补第 4 条)
+UPGRADES = 5  # +4 / +8 / +12 / +16 / +20 各强化一次
+
+
+def _pick(rng: random.Random, options: Sequence[tuple], weight_index: int) -> tuple:
+    return rng.choices(options, weights=[o[weight_index] for o in options])[0]
+
+
+def _roll_substats(rng: random.Random, main_type: str) -> List[Dict[str, Any]]:
+    pool = [t for t in SUB_STATS if t != main_type]
+    weights = [SUB_STATS[t][1] for t in pool]
+    picked: List[str] = []
+    while len(picked) < 4:
+        t = rng.choices(pool, weights=weights)[0]
+        if t not in picked: picked.append(t)
+    rolls = [1] * 4
+    # 3 词条开局时第一次强化用于补第 4 条
+    for _ in range(UPGRADES - (0 if rng.random() < FOUR_LINER_CHANCE else 1)):
+        rolls[rng.randrange(4)] += 1
+    substats = []
+    for t, n in zip(picked, rolls):
+        value = sum(SUB_STATS[t][0] * rng.choice(ROLL_TIERS) for _ in range(n))
+        substats.append({"type": t, "value": float(round(value)) if t in FLAT_STATS else round(value, 3),
+                         "element": "null"})
+    return substats
+
+
+def generate_artifact(rng: random.Random, artifact_id: int, set_names: Sequence[str],
+                      slot: Optional[str] = None) -> Dict[str, Any]:
+    """生成单件 +20 圣遗物 (artifacts.json 格式)"""
+    slot = slot or rng.choice(SLOTS)
+    main_type, element, value, _ = _pick(rng, MAIN_STATS[slot], 3)
+    return {
+        "id": artifact_id,
+        "set": rng.choice(set_names),
+        "slot": slot,
+        "main_stat": {"type": main_type, "value": value, "element": element},
+        "substats": _roll_substats(rng, main_type),
+    }
+
+
+def generate_inventory(count: int, set_names: Sequence[str], seed: int = 0) -> List[Dict[str, Any]]:
+    """count 件圣遗物，五个部位轮流 (保证每个部位都有候选)，其余属性按种子随机"""
+    rng = random.Random(seed)
+    set_names = sorted(set_names)
+    return [generate_artifact(rng, i + 1, set_names, SLOTS[i % len(SLOTS)]) for i in range(count)]
+
+
+# --- 莫娜导出格式 (用于导入器基准) ---
+MONA_SLOTS = {"flower": "flower", "plume": "feather", "sands": "sand", "goblet": "cup", "circlet": "head"}
+MONA_STATS = {
+    "hp_flat": "lifeStatic", "hp_percent": "lifePercentage", "atk_flat": "attackStatic",
+    "atk_percent": "attackPercentage", "def_flat": "defendStatic", "def_percent": "defendPercentage",
+    "em": "elementalMastery", "energy_recharge": "recharge", "crit_rate": "critical",
+    "crit_dmg": "criticalDamage", "healing_bonus": "cureEffect",
+}
+MONA_ELEMENTS = {"Cryo": "iceBonus", "Pyro": "fireBonus", "Hydro": "waterBonus", "Anemo": "windBonus",
+                 "Geo": "rockBonus", "Electro": "thunderBonus", "Dendro": "grassBonus", "Physical": "physicalBonus"}
+
+
+def to_mona(artifacts: Sequence[Dict[str, Any]], low_level_ratio: float = 0.25, seed: int = 0) -> Dict[str, Any]:
+    """把合成圣遗物还原为莫娜导出 (按部位分组)；约 low_level_ratio 的圣遗物标为未满级，供筛选逻辑处理"""
+    rng = random.Random(seed)
+    export: Dict[str, Any] = {"version": "1", **{pos: [] for pos in MONA_SLOTS.values()}}
+    for art in artifacts:
+        main = art["main_stat"]
+        main_name = MONA_ELEMENTS[main["element"]] if main["type"] == "elemental_bonus" else MONA_STATS[main["type"]]
+        export[MONA_SLOTS[art["slot"]]].append({
+            "setName": art["set"], "position": MONA_SLOTS[art["slot"]],
+            "mainTag": {"name": main_name, "value": main["value"]},
+            "normalTags": [{"name": MONA_STATS[s["type"]], "value": s["value"]} for s in art["substats"]],
+            "omit": False, "level": 20 if rng.random() >= low_level_ratio else rng.choice((0, 4, 8, 12, 16)),
+            "star": 5,
+        })
+    return export
@@ -1,19 +1,32 @@
 # main.py
-import json
 import os
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import combinations
+from typing import List, Dict, Any, Optional, Tuple
 from collections import Counter
 
+from src.common.repository import repository, CHARACTERS_PATH, SET_EFFECTS_PATH, ARTIFACTS_PATH, \
+    ARTIFACTS_STORE_PATH
+from src.optimizer.artifact_store import fresh_store
 from src.optimizer.genetic_algo import ArtifactOptimizer
+from src.optimizer.inventory import CompiledInventory
+from src.optimizer.branch_bound import ExactArtifactOptimizer
+from src.optimizer.islands import IslandArtifactOptimizer
+from src.optimizer.rotation import RotationArtifactOptimizer
 from src.engine.calculator import DamageCalculator
 from src.engine.analyzer import SubstatAnalyzer
+from src.common.logger import PhaseTimer, profilable
+
+
+# 可选优化引擎：ga = 遗传算法 (随机近似)，exact = 分支定界 (精确最优)
+OPTIMIZER_ENGINES = {"ga": ArtifactOptimizer, "exact": ExactArtifactOptimizer, "islands": IslandArtifactOptimizer}
+# 遗传算法默认预算 (种群 × 代数)；调整前先用 python -m benchmarks.quality 对比解质量
+GA_BUDGET = {"population_size": 1000, "generations": 200}
 
 
 def load_json(path: str) -> Any:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"找不到文件: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # 经进程内仓库读取：文件未变时直接复用已解析的数据 (只读共享)
+    return repository.get(path)
 
 
 def format_value(t: str, v: float) -> str:
@@ -129,7 +142,12 @@ def apply_team_buffs_to_panel(target_key, team_data, skill_ele, skill_type):
     current_ctx = teammate_panels[target_key]
     for owner_name, buff in pending_dynamic:
         eval_ctx = current_ctx if owner_name == target_key else teammate_panels.get(owner_name, {})
-        val = DamageCalculator.resolve_dynamic_value(buff["value"], eval_ctx)
+        try:
+            val = DamageCalculator.resolve_dynamic_value(buff["value"], eval_ctx)
+        except ArithmeticError as e:
+            # 公式合法但按当前面板求值失败 (如除零)：跳过该 Buff，与旧解析器按 0 处理一致
+            logs.setdefault(owner_name, []).append(f"[{buff['type']}] 已跳过: {e}")
+            continue
         d_val = apply_single_buff(buff["type"], val, sums, other_params, skill_ele, buff.get("element", "null"))
         fixed_damage_bonus += d_val
         logs.setdefault(owner_name, []).append(
@@ -142,10 +160,47 @@ def apply_team_buffs_to_panel(target_key, team_data, skill_ele, skill_type):
                        "damage_bonus": fixed_damage_bonus}, fixed_damage_bonus, other_params, logs
 
 
-def run_optimizer(target_char, teammates, skill_type="ElementalSkill", reaction=None, forced_set=None):
-    chars = load_json("data/rules/characters.json")
-    arts = load_json("data/processed/artifacts.json")
-    sets = load_json("data/rules/set_effects.json")
+def load_dataset(dataset=None):
+    """(角色, 套装, 圣遗物矩阵)；批量计算时使用调用方预先加载 / 编译好的数据快照"""
+    if dataset is not None:
+        return dataset["characters"], dataset["set_effects"], dataset["inventory"]
+    return load_json(CHARACTERS_PATH), load_json(SET_EFFECTS_PATH), load_inventory()
+
+
+def load_inventory() -> CompiledInventory:
+    """圣遗物矩阵：优先映射列式存储 (零拷贝、多进程共享页面)，过期或缺失时回退到 artifacts.json"""
+    store = fresh_store(ARTIFACTS_STORE_PATH, ARTIFACTS_PATH)
+    if store is not None:
+        return store.inventory
+    # 圣遗物矩阵按 artifacts.json 版本缓存，文件不变时跨请求复用
+    return repository.derived("inventory", ARTIFACTS_PATH, CompiledInventory)
+
+
+def artifacts_version() -> str:
+    """圣遗物数据的内容哈希；列式存储可用时取其记录的源文件哈希，避免为此解析 JSON"""
+    store = fresh_store(ARTIFACTS_STORE_PATH, ARTIFACTS_PATH)
+    if store is not None and store.source is not None:
+        return store.source["digest"]
+    return repository.digest(ARTIFACTS_PATH)
+
+
+def resolve_reaction(reaction, element):
+    # 显式传 "" 代表强制无反应，不进行自动推断
+    if reaction is None:
+        return "spread" if element.lower() == "dendro" else "aggravate" if element.lower() == "electro" else None
+    return reaction or None
+
+
+@profilable
+def run_optimizer(target_char, teammates, skill_type="ElementalSkill", reaction=None, forced_set=None, engine="ga",
+                  progress=None, dataset=None, team_buffs=None, min_damage=0.0, time_budget_ms=None, patience=None,
+                  min_improvement=0.0):
+    if engine not in OPTIMIZER_ENGINES:
+        raise ValueError(f"未知优化引擎: {engine} (可选: {', '.join(OPTIMIZER_ENGINES)})")
+
+    timer = PhaseTimer()
+    with timer.phase("load"):
+        chars, sets, arts = load_dataset(dataset)
 
     if target_char not in chars:
         print(f"Error: Character {target_char} not found.")
@@ -154,70 +209,276 @@ def run_optimizer(target_char, teammates, skill_type="ElementalSkill", reaction=
     team_data = {k: chars[k] for k in [target_char] + teammates if k in chars}
     ele, dmg_type = resolve_skill_data(chars[target_char], skill_type)
 
-    # [步骤 1] 应用队伍 Buff 和共鸣
-    base, panel, fixed_dmg, others, logs = apply_team_buffs_to_panel(target_char, team_data, ele, skill_type)
+    # [步骤 1] 应用队伍 Buff 和共鸣 (配队搜索时由调用方传入已算好的结果)
+    with timer.phase("team_buffs"):
+        base, panel, fixed_dmg, others, logs = team_buffs or apply_team_buffs_to_panel(target_char, team_data, ele,
+                                                                                       skill_type)
 
     # [步骤 2] 反应推断逻辑
-    # 显式传 "" 代表强制无反应，不进行自动推断
-    if reaction is None:
-        reaction = "spread" if ele.lower() == "dendro" else "aggravate" if ele.lower() == "electro" else None
-    elif reaction == "":
-        reaction = None
+    reaction = resolve_reaction(reaction, ele)
 
-    print(f"Running optimization for {target_char} ({dmg_type})...")
+    print(f"Running optimization for {target_char} ({dmg_type}) [{engine}]...")
 
     # [步骤 3] 初始化优化器
-    opt = ArtifactOptimizer(
-        arts, sets, base, panel, fixed_dmg,
-        chars[target_char]["skills"][skill_type]["default"]["multipliers"],
-        ele, skill_type, dmg_type, reaction, forced_set, **others
-    )
-    res = opt.optimize(population_size=1000, generations=200)
+    with timer.phase("setup"):
+        opt = OPTIMIZER_ENGINES[engine](
+            arts, sets, base, panel, fixed_dmg,
+            chars[target_char]["skills"][skill_type]["default"]["multipliers"],
+            ele, skill_type, dmg_type, reaction, forced_set, **others
+        )
+    opt.progress_callback = progress  # 进度回调 (返回 True 则提前结束)
+    opt.min_score = min_damage  # 伤害门槛 (精确引擎据此剪枝)
+    # 提前结束：墙钟预算 / 连续 patience 代提升不足 min_improvement (见 meta.optimizer.stop_reason)
+    opt.time_budget_ms, opt.patience, opt.min_improvement = time_budget_ms, patience, min_improvement
+    with timer.phase("optimize"):
+        res = opt.optimize(**GA_BUDGET)
+    print(f"Pruned {opt.pruned_count} dominated artifacts, {opt.evaluations} evaluations.")
 
     solutions = []
     others_params = others.copy()
 
-    for i, r in enumerate(res, 1):
-        p = r["panel"]
-
-        # 这里的 p 已经由 genetic_algo 修正，包含了 elemental_bonus 和 action_bonus
-        calc_args = {
-            "skill_multipliers": chars[target_char]["skills"][skill_type]["default"]["multipliers"],
-            "damage_type": dmg_type,
-            "all_damage_bonus": p["all_damage_bonus"],
-            "reaction": reaction,
-        }
+    # [步骤 4] 词条收益分析：所有方案、所有词条、1..N 次追加一次批量算完
+    multipliers = chars[target_char]["skills"][skill_type]["default"]["multipliers"]
+    with timer.phase("analyze"):
+        priorities = SubstatAnalyzer.analyze_batch(
+            base, [r["panel"] for r in res],
+            {"skill_multipliers": multipliers, "damage_type": dmg_type, "reaction": reaction},
+            others_params, SubstatAnalyzer.MAX_ROLLS, [r["panel"]["all_damage_bonus"] for r in res])
+
+    # [步骤 5] 逐方案计算最终伤害并组装结果
+    with timer.phase("build"):
+        for i, r in enumerate(res, 1):
+            p = r["panel"]
+
+            # 这里的 p 已经由 genetic_algo 修正，包含了 elemental_bonus 和 action_bonus
+            calc_args = {
+                "skill_multipliers": chars[target_char]["skills"][skill_type]["default"]["multipliers"],
+                "damage_type": dmg_type,
+                "all_damage_bonus": p["all_damage_bonus"],
+                "reaction": reaction,
+            }
+
+            final_dmg = DamageCalculator.calculate_damage(
+                final_atk=p['atk'], final_hp=p['hp'], final_def=p['def'],
+                final_em=p['em'], final_er_bonus=p.get('energy_recharge_bonus', 0),
+                crit_rate=p['crit_rate'],
+                crit_dmg=p['crit_dmg'],
+                **calc_args, **others_params
+            )
+
+            substat_priority = priorities[i - 1]
+
+            solutions.append({
+                "rank": i,
+                "damage": final_dmg,
+                "panel": p,
+                "sets": r["sets"],
+                "dmg_type": dmg_type,
+                "artifact_strings": r.get("artifact_strings", []),
+                "substat_priority": substat_priority
+            })
 
-        # [步骤 4] 计算最终伤害
-        final_dmg = DamageCalculator.calculate_damage(
-            final_atk=p['atk'], final_hp=p['hp'], final_def=p['def'],
-            final_em=p['em'], final_er_bonus=p.get('energy_recharge_bonus', 0),
-            crit_rate=p['crit_rate'],
-            crit_dmg=p['crit_dmg'],
-            **calc_args, **others_params
-        )
-
-        # [步骤 5] 执行收益分析
+    return {
+        "meta": {"target_char": target_char, "skill_type": skill_type, "dmg_type": dmg_type,
+                 "engine": engine, "optimizer": opt.run_stats, "timings": timer.as_dict()},
+        "solutions": solutions,
+        "logs": logs
+    }
 
-        substat_priority = SubstatAnalyzer.analyze(base, p, calc_args, others_params)
 
-        solutions.append({
-            "rank": i,
-            "damage": final_dmg,
-            "panel": p,
-            "sets": r["sets"],
-            "dmg_type": dmg_type,
-            "artifact_strings": r.get("artifact_strings", []),
-            "substat_priority": substat_priority
-        })
+@profilable
+def run_rotation(target_char, teammates, rotation, forced_set=None, progress=None, dataset=None, time_budget_ms=None,
+                 patience=None, min_improvement=0.0):
+    """
+    轮换优化：rotation 为 [{"skill_type", "hits", "reaction"}]，一次遗传算法搜索使 Σ 次数 × 单次伤害 最大。
+    各技能的队伍 Buff / 元素 / 反应分别解析，圣遗物面板每个候选只累加一次。
+    """
+    timer = PhaseTimer()
+    with timer.phase("load"):
+        chars, sets, arts = load_dataset(dataset)
+    if target_char not in chars:
+        print(f"Error: Character {target_char} not found.")
+        return None
+    team_data = {k: chars[k] for k in [target_char] + teammates if k in chars}
 
+    entries, logs = [], {}
+    for hit in rotation:
+        skill_type = hit["skill_type"]
+        if skill_type not in chars[target_char].get("skills", {}):
+            raise ValueError(f"{target_char} 未配置技能: {skill_type}")
+        ele, dmg_type = resolve_skill_data(chars[target_char], skill_type)
+        with timer.phase("team_buffs"):
+            base, panel, fixed_dmg, others, skill_logs = apply_team_buffs_to_panel(target_char, team_data, ele,
+                                                                                   skill_type)
+        entries.append({"skill_type": skill_type, "hits": hit.get("hits", 1), "base_info": base, "fixed_panel": panel,
+                        "fixed_damage_bonus": fixed_dmg,
+                        "multipliers": chars[target_char]["skills"][skill_type]["default"]["multipliers"],
+                        "element": ele, "damage_type": dmg_type, "reaction": resolve_reaction(hit.get("reaction"), ele),
+                        "params": others})
+        for name, lines in skill_logs.items():
+            logs.setdefault(name, [])
+            logs[name] += [line for line in lines if line not in logs[name]]
+
+    desc = " + ".join(f"{e['hits']}x {e['skill_type']}" for e in entries)
+    print(f"Running rotation optimization for {target_char}: {desc}...")
+    with timer.phase("setup"):
+        opt = RotationArtifactOptimizer(arts, sets, entries, forced_set)
+    opt.progress_callback = progress
+    opt.time_budget_ms, opt.patience, opt.min_improvement = time_budget_ms, patience, min_improvement
+    with timer.phase("optimize"):
+        res = opt.optimize(**GA_BUDGET)
+    print(f"Pruned {opt.pruned_count} dominated artifacts, {opt.evaluations} evaluations.")
+
+    solutions = [{"rank": i, "damage": r["damage"], "rotation": r["rotation"], "sets": r["sets"],
+                  "artifact_strings": r.get("artifact_strings", [])} for i, r in enumerate(res, 1)]
     return {
-        "meta": {"target_char": target_char, "skill_type": skill_type, "dmg_type": dmg_type},
+        "meta": {"target_char": target_char, "rotation": [{k: e[k] for k in ("skill_type", "hits", "damage_type",
+                                                                              "reaction")} for e in entries],
+                 "engine": "ga", "optimizer": opt.run_stats, "timings": timer.as_dict()},
         "solutions": solutions,
         "logs": logs
     }
 
 
+def plan_team_search(target_char, skill_type="ElementalSkill", candidates=None, reaction=None, forced_set=None,
+                     engine="exact", team_size=3, dataset=None) -> Dict[str, Any]:
+    """
+    配队搜索第一步：对候选池中所有 team_size 人队友组合各算一次 Buff 面板与伤害上界，按上界从高到低排序。
+    Buff 面板随队伍一起返回，优化时直接复用。
+    """
+    if engine not in OPTIMIZER_ENGINES:
+        raise ValueError(f"未知优化引擎: {engine} (可选: {', '.join(OPTIMIZER_ENGINES)})")
+    chars, sets, inventory = load_dataset(dataset)
+    if target_char not in chars:
+        raise ValueError(f"角色不存在: {target_char}")
+    pool = sorted(c for c in (candidates or chars.keys()) if c in chars and c != target_char)
+    ele, dmg_type = resolve_skill_data(chars[target_char], skill_type)
+    multipliers = chars[target_char]["skills"][skill_type]["default"]["multipliers"]
+    rx = resolve_reaction(reaction, ele)
+
+    teams = []
+    for team in combinations(pool, team_size):
+        team_data = {k: chars[k] for k in (target_char,) + team}
+        buffs = apply_team_buffs_to_panel(target_char, team_data, ele, skill_type)
+        base, panel, fixed_dmg, others, _ = buffs
+        bound = ArtifactOptimizer(inventory, sets, base, panel, fixed_dmg, multipliers, ele, skill_type, dmg_type,
+                                  rx, forced_set, **others).damage_upper_bound()
+        teams.append((bound, list(team), buffs))
+    teams.sort(key=lambda t: t[0], reverse=True)
+    return {"target_char": target_char, "skill_type": skill_type, "dmg_type": dmg_type, "reaction": reaction,
+            "forced_set": forced_set, "engine": engine, "team_size": team_size, "candidates": pool, "teams": teams}
+
+
+class TeamSearch:
+    """
+    配队搜索第二步的调度状态：队伍按上界顺序出队，门槛 (当前第 top_k 名伤害) 随已完成队伍抬高，
+    队首上界不超过门槛时其后所有队伍直接剪掉。只负责排名，由调用方决定各队伍在哪个进程池中优化。
+    """
+
+    def __init__(self, plan: Dict[str, Any], top_k: int = 5):
+        self.plan = plan
+        self.teams = plan["teams"]
+        self.top_k = top_k
+        self.ranked: List[Dict[str, Any]] = []
+        self.evaluated = 0
+        self.cut = 0
+        self.next_team = 0
+
+    def threshold(self) -> float:
+        return self.ranked[self.top_k - 1]["damage"] if len(self.ranked) >= self.top_k else 0.0
+
+    def has_next(self) -> bool:
+        return self.next_team < len(self.teams) and self.teams[self.next_team][0] > self.threshold()
+
+    def peek(self) -> Tuple[float, List[str], Dict[str, Any]]:
+        """(上界, 队友, run_optimizer 参数)；提交成功后调用 advance()"""
+        bound, team, buffs = self.teams[self.next_team]
+        plan = self.plan
+        kwargs = {"target_char": plan["target_char"], "teammates": team, "skill_type": plan["skill_type"],
+                  "reaction": plan["reaction"], "forced_set": plan["forced_set"], "engine": plan["engine"],
+                  "team_buffs": buffs, "min_damage": self.threshold()}
+        return bound, team, kwargs
+
+    def advance(self):
+        self.next_team += 1
+
+    def record(self, bound: float, team: List[str], result: Optional[Dict[str, Any]]):
+        self.evaluated += 1
+        if not result or not result["solutions"]:
+            self.cut += 1  # 精确引擎下没有组合超过提交时的门槛
+            return
+        self.ranked.append({"teammates": team, "damage": result["solutions"][0]["damage"], "upper_bound": bound,
+                            "solution": result["solutions"][0], "logs": result["logs"]})
+        self.ranked.sort(key=lambda t: t["damage"], reverse=True)
+        del self.ranked[self.top_k:]
+
+    def result(self) -> Dict[str, Any]:
+        for i, t in enumerate(self.ranked, 1): t["rank"] = i
+        plan = self.plan
+        return {
+            "meta": {"target_char": plan["target_char"], "skill_type": plan["skill_type"],
+                     "dmg_type": plan["dmg_type"], "engine": plan["engine"], "team_size": plan["team_size"],
+                     "candidates": plan["candidates"], "teams_total": len(self.teams),
+                     "teams_evaluated": self.evaluated, "teams_pruned": len(self.teams) - self.evaluated,
+                     "teams_cut": self.cut},
+            "teams": self.ranked,
+        }
+
+
+def run_team_search(target_char, skill_type="ElementalSkill", candidates=None, reaction=None, forced_set=None,
+                    engine="exact", team_size=3, top_k=5, workers=None, dataset=None):
+    """
+    配队搜索 (独立进程内直接调用，如脚本 / CLI)：对候选池中所有 team_size 人队友组合，按优化后伤害排名。
+    队伍按伤害上界从高到低提交到本函数自建的进程池，上界不超过当前第 top_k 名伤害的队伍 (及其后所有队伍) 直接剪掉。
+    上界剪枝对 exact 引擎是精确的；ga / islands 引擎下排名为近似。
+    API 中不要在任务队列的工作进程里调用 (会嵌套进程池)，改为 plan_team_search + TeamSearch 把各队伍提交到任务队列。
+    """
+    # [步骤 1] 每队一次 Buff 计算 + 伤害上界
+    chars, sets, inventory = load_dataset(dataset)
+    plan = plan_team_search(target_char, skill_type, candidates, reaction, forced_set, engine, team_size,
+                            {"characters": chars, "set_effects": sets, "inventory": inventory})
+    search = TeamSearch(plan, top_k)
+
+    # [步骤 2] 按上界顺序并行优化，门槛随已完成队伍抬高
+    print(f"Team search for {target_char} ({plan['dmg_type']}) [{engine}]: {len(plan['teams'])} teams...")
+    workers = max(1, min(workers or os.cpu_count() or 1, len(plan["teams"])))
+    spec, blocks = inventory.share()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                 initargs=(spec, inventory.artifacts, chars, sets)) as executor:
+            running = {}
+            while running or search.has_next():
+                while len(running) < workers and search.has_next():
+                    bound, team, kwargs = search.peek()
+                    running[executor.submit(run_batch_item, kwargs)] = (bound, team)
+                    search.advance()
+                if not running: break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in done:
+                    bound, team = running.pop(f)
+                    search.record(bound, team, f.result())
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    return search.result()
+
+
+# --- 批量计算工作进程 ---
+_BATCH_DATASET: Optional[Dict[str, Any]] = None
+
+
+def init_batch_worker(inventory_spec: Dict[str, Any], artifacts: List[Dict], chars: Dict, sets: Dict):
+    """批量计算进程池初始化：挂载共享内存中的圣遗物矩阵，整批请求共用同一份数据快照"""
+    global _BATCH_DATASET
+    _BATCH_DATASET = {"characters": chars, "set_effects": sets,
+                      "inventory": CompiledInventory.attach(inventory_spec, artifacts)}
+
+
+def run_batch_item(kwargs: Dict[str, Any]) -> Any:
+    return run_optimizer(**kwargs, dataset=_BATCH_DATASET)
+
+
 def print_result_cli(data: Dict[str, Any]):
     if not data: return
     meta = data['meta']
@@ -271,9 +532,20 @@ def print_result_cli(data: Dict[str, Any]):
         # 🟢 展示 Analyzer 收益报告
         if sol.get("substat_priority"):
             SubstatAnalyzer.print_report(sol["substat_priority"])
+
+    # 🟢 profile=True 时附带的剖析报告 (按累计耗时)
+    if meta.get("profile"):
+        prof = meta["profile"]
+        print(f"\n=== Profile ({prof['profiler']}, {prof['total_ms']:.0f} ms) ===")
+        for row in prof["top"]:
+            print(f"   {row['cumtime_ms']:>9.1f} ms  {row['tottime_ms']:>9.1f} ms  {row['calls']:>8}  {row['function']}")
+        if prof.get("path"): print(f"   已保存: {prof['path']}")
 if __name__ == "__main__":
-    # 示例 1: 龙王 (常规 ChargedAttack)
-    res_lw = run_optimizer("龙王", ["水神-芙宁娜", "万叶", "希诺宁"], skill_type="ChargedAttack")
+    import sys
+
+    # 示例 1: 龙王 (常规 ChargedAttack)；python main.py --profile 附带剖析报告
+    res_lw = run_optimizer("龙王", ["水神-芙宁娜", "万叶", "希诺宁"], skill_type="ChargedAttack",
+                           profile="--profile" in sys.argv)
     print_result_cli(res_lw)
 
     # 示例 2: 月神-少女 (MoonBloom)
@@ -3,6 +3,8 @@ from pydantic import BaseModel, Field, validator
 from typing import List, Dict, Optional, Any, Union
 from enum import Enum
 
+from src.engine.formula import compile_formula
+
 
 # --- 0. 枚举定义 ---
 class ElementType(str, Enum):
@@ -155,6 +157,12 @@ class Buff(BaseModel):
     scope: str = "self"
     element: str = "null"
 
+    @validator('value')
+    def check_formula(cls, v):
+        # 动态表达式在保存时即编译校验，非法公式直接报错
+        if isinstance(v, str): compile_formula(v)
+        return v
+
 
 # --- 7. 聚合数据 ---
 class CharacterData(BaseModel):
@@ -171,4 +179,40 @@ class CalculationRequest(BaseModel):
     teammates: List[str] = []
     skill_type: str = "ElementalBurst"
     reaction: Optional[str] = ""
-    forced_set: Optional[str] = None
\ No newline at end of file
+    forced_set: Optional[str] = None
+    engine: str = "ga"  # ga | exact | islands
+    # 提前结束：墙钟预算 (毫秒，用尽返回当前最优) / 连续 patience 代相对提升不足 min_improvement 即停止
+    time_budget_ms: Optional[int] = Field(None, gt=0)
+    patience: Optional[int] = Field(None, ge=1)
+    min_improvement: float = Field(0.0, ge=0)
+    # 按需性能剖析 (服务端 GENSHIN_PROFILING=1 时可用)，报告见 meta.profile
+    profile: bool = False
+
+
+class TeamSearchRequest(BaseModel):
+    target_char: str
+    skill_type: str = "ElementalBurst"
+    candidates: Optional[List[str]] = None  # 候选队友池，留空为全部角色
+    reaction: Optional[str] = ""
+    forced_set: Optional[str] = None
+    engine: str = "exact"  # exact 下上界剪枝与排名均为精确
+    team_size: int = Field(3, ge=1, le=3)
+    top_k: int = Field(5, ge=1, le=50)
+
+
+class RotationHit(BaseModel):
+    skill_type: str
+    hits: float = Field(1.0, gt=0)
+    reaction: Optional[str] = ""
+
+
+class RotationRequest(BaseModel):
+    target_char: str
+    teammates: List[str] = []
+    rotation: List[RotationHit]
+    forced_set: Optional[str] = None
+    time_budget_ms: Optional[int] = Field(None, gt=0)
+    patience: Optional[int] = Field(None, ge=1)
+    min_improvement: float = Field(0.0, ge=0)
+    # 按需性能剖析 (服务端 GENSHIN_PROFILING=1 时可用)，报告见 meta.profile
+    profile: bool = False
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+后台任务队列：CPU 密集的优化任务提交到进程池执行，事件循环只负责排队与状态查询
+"""
+import asyncio
+import multiprocessing
+import queue
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+
+
+class QueueFullError(RuntimeError):
+    """排队任务数已达上限"""
+
+
+class ProgressChannel:
+    """
+    跨进程进度通道 (可 pickle)：工作进程中作为优化器的 progress 回调调用，
+    把进度事件放入队列，并返回取消标志；主进程读取事件、在客户端断开时置位取消。
+    """
+
+    def __init__(self, events, cancel_event):
+        self.events = events
+        self.cancel_event = cancel_event
+
+    def __call__(self, event: Dict[str, Any]) -> bool:
+        self.events.put(event)
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出当前已到达的全部事件 (不等待，事件循环内调用不会占住线程)"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class Job:
+    """单个任务的状态记录：queued -> running -> done / failed (或 cancelled)"""
+
+    __slots__ = ("id", "kind", "status", "result", "error", "created_at", "started_at", "finished_at", "task")
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {"id": self.id, "kind": self.kind, "status": self.status, "error": self.error,
+                "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at}
+        if include_result: data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    有界任务队列：最多 max_workers 个任务并发运行 (进程池 + 信号量)，
+    最多 max_queue 个任务排队，超出时 submit 抛出 QueueFullError。
+    已结束的任务保留最近 keep_finished 个供查询；on_finish(job) 在每个任务结束时 (事件循环内) 调用。
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, keep_finished: int = 256,
+                 on_finish: Optional[Callable[[Job], None]] = None):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.keep_finished = keep_finished
+        self.on_finish = on_finish
+        self.jobs: Dict[str, Job] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._manager = None
+        self._queued = 0
+        self._running = 0
+
+    def _ensure_pool(self):
+        # 延迟到首次提交时创建，须在事件循环内调用
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+    def channel(self) -> ProgressChannel:
+        """新建进度通道 (首次调用时启动 multiprocessing Manager)"""
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        return ProgressChannel(self._manager.Queue(), self._manager.Event())
+
+    def cancel(self, job: Job):
+        """取消尚在排队的任务 (运行中的任务需通过进度通道请求取消)"""
+        if job.status == "queued" and job.task is not None:
+            job.task.cancel()
+
+    def submit(self, fn: Callable[..., Any], kind: str = "job", **kwargs) -> Job:
+        """登记任务并立即返回；fn 须为可 pickle 的模块级函数"""
+        if self._queued + self._running >= self.max_workers + self.max_queue:
+            raise QueueFullError(f"任务队列已满 ({self.max_queue} 个排队)")
+        self._ensure_pool()
+        job = Job(kind)
+        self.jobs[job.id] = job
+        self._queued += 1
+        job.task = asyncio.get_running_loop().create_task(self._run(job, fn, kwargs))
+        return job
+
+    async def _run(self, job: Job, fn: Callable[..., Any], kwargs: Dict[str, Any]):
+        try:
+            async with self._slots:
+                self._queued -= 1
+                self._running += 1
+                job.status, job.started_at = "running", time.time()
+                try:
+                    job.result = await asyncio.get_running_loop().run_in_executor(self._pool, _call, fn, kwargs)
+                    job.status = "done"
+                except Exception as e:
+                    job.status, job.error = "failed", str(e)
+                finally:
+                    self._running -= 1
+        except asyncio.CancelledError:
+            if job.status == "queued": self._queued -= 1
+            job.status, job.error = "cancelled", job.error or "cancelled"
+            raise
+        finally:
+            job.finished_at = time.time()
+            self._evict_finished()
+            if self.on_finish is not None:
+                try:
+                    self.on_finish(job)
+                except Exception as e:
+                    print(f"[Warn] on_finish 回调失败: {e}")
+
+    async def wait(self, job: Job) -> Job:
+        """等待任务结束 (不阻塞事件循环)"""
+        if job.task is not None:
+            await asyncio.shield(job.task)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self._queued, "running": self._running, "max_workers": self.max_workers,
+                "max_queue": self.max_queue, "tracked": len(self.jobs)}
+
+    def _evict_finished(self):
+        finished = [jid for jid, j in self.jobs.items() if j.finished_at is not None]
+        for jid in islice(finished, max(0, len(finished) - self.keep_finished)):
+            del self.jobs[jid]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+def _call(fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    return fn(**kwargs)
@@ -1,4 +1,228 @@
 #!/usr/bin/env python3
 """
-日志记录模块
-"""
\ No newline at end of file
+日志记录模块：分阶段计时 (PhaseTimer)、进程内指标汇总 (MetricsRegistry，输出 Prometheus 文本格式)
+与按需性能剖析 (profilable)
+"""
+import cProfile
+import functools
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 延迟直方图的默认分桶 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class PhaseTimer:
+    """
+    轻量分阶段计时：with timer.phase("optimize"): ...
+    同名阶段多次进入时累加；as_dict() 返回各阶段毫秒数 (按首次进入顺序) 及 total_ms。
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    def as_dict(self) -> Dict[str, float]:
+        data = {f"{name}_ms": seconds * 1000 for name, seconds in self.phases.items()}
+        data["total_ms"] = (time.perf_counter() - self.started_at) * 1000
+        return data
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value): return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> (各桶计数 (非累计), 总和, 次数)
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        idx = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = super().render()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标表：同名指标只注册一次，render() 输出 Prometheus 文本格式 (text/plain; version=0.0.4)"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets or LATENCY_BUCKETS)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+# 全局指标表 (每个进程一份；API 进程在任务结束时按结果 meta 汇总)
+metrics = MetricsRegistry()
+
+
+# --- 按需性能剖析 ---
+PROFILE_TOP = 25  # 剖析报告默认列出的函数数
+
+
+def _function_label(key: Tuple[str, int, str]) -> str:
+    filename, line, name = key
+    if filename == "~": return name  # 内建函数，如 <built-in method numpy...>
+    try:
+        filename = os.path.relpath(filename)
+    except ValueError:
+        pass
+    return f"{filename}:{line}({name})"
+
+
+def profile_call(fn: Callable[..., Any], args: Sequence[Any] = (), kwargs: Optional[Dict[str, Any]] = None,
+                 top: int = PROFILE_TOP, path: Optional[str] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    在 cProfile (确定性剖析) 下执行 fn，返回 (结果, 报告)。
+    报告按累计耗时列出前 top 个函数；给出 path 时另存 .prof 文件 (可用 pstats / snakeviz 打开)。
+    """
+    profiler = cProfile.Profile()
+    t0 = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn(*args, **(kwargs or {}))
+    finally:
+        profiler.disable()
+    total = time.perf_counter() - t0
+
+    rows = sorted(pstats.Stats(profiler).stats.items(), key=lambda kv: kv[1][3], reverse=True)
+    report: Dict[str, Any] = {
+        "profiler": "cProfile", "sort": "cumulative", "total_ms": total * 1000,
+        "top": [{"function": _function_label(key), "calls": nc, "primitive_calls": cc,
+                 "tottime_ms": tt * 1000, "cumtime_ms": ct * 1000}
+                for key, (cc, nc, tt, ct, _callers) in rows[:top]],
+    }
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profiler.dump_stats(path)
+        report["path"] = path
+    return result, report
+
+
+def profilable(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    为入口函数增加 profile / profile_path / profile_top 关键字参数：
+    profile=True 时在 profile_call 下执行并把报告写入结果的 meta.profile；默认直接调用，无额外开销。
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, profile: bool = False, profile_path: Optional[str] = None, profile_top: int = PROFILE_TOP,
+                **kwargs):
+        if not profile: return fn(*args, **kwargs)
+        result, report = profile_call(fn, args, kwargs, top=profile_top, path=profile_path)
+        if isinstance(result, dict): result.setdefault("meta", {})["profile"] = report
+        return result
+
+    return wrapper
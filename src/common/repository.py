@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+进程内数据仓库：解析后的 JSON 常驻内存，文件 mtime / 大小变化时再比对内容哈希，内容确有变化才重新解析
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# --- 数据文件路径 ---
+CHARACTERS_PATH = "data/rules/characters.json"
+SET_EFFECTS_PATH = "data/rules/set_effects.json"
+ARTIFACTS_PATH = "data/processed/artifacts.json"
+ARTIFACTS_STORE_PATH = "data/processed/artifacts.bin"  # 导入时同步生成的列式存储 (可选)
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ("data", "stat", "digest")
+
+    def __init__(self, data: Any, stat: Tuple[int, int], digest: str):
+        self.data = data
+        self.stat = stat
+        self.digest = digest
+
+
+class DataRepository:
+    """
+    文件级缓存：get() 每次只做一次 stat；mtime 与大小未变直接返回缓存对象，
+    变了则读入字节比对哈希 (仅 touch 不重解析)。解析 / 校验失败时保留上一个有效版本。
+    返回的对象在调用方之间共享，需修改时请用 get(..., copy=True)。
+    """
+
+    def __init__(self, validators: Optional[Dict[str, Callable[[Any], None]]] = None):
+        self.validators = dict(validators or {})
+        self._entries: Dict[str, _Entry] = {}
+        self._derived: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.RLock()
+        self.reloads = 0
+
+    def get(self, path: str, default: Any = _MISSING, copy: bool = False) -> Any:
+        """读取并解析 JSON 文件；文件不存在时返回 default (未给出则抛 FileNotFoundError)"""
+        entry = self._load(path)
+        if entry is None:
+            if default is _MISSING:
+                raise FileNotFoundError(f"找不到文件: {path}")
+            return default
+        return _deepcopy(entry.data) if copy else entry.data
+
+    def save(self, path: str, data: Any):
+        """写入 JSON (先写临时文件再替换)，并直接更新缓存"""
+        self._validate(path, data)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        with self._lock:
+            self._entries[path] = _Entry(_deepcopy(data), _stat_key(os.stat(path)), _digest(raw))
+
+    def digest(self, path: str) -> str:
+        """单个文件的内容哈希 (不存在时为空串)"""
+        entry = self._load(path)
+        return entry.digest if entry is not None else ""
+
+    def version(self, *paths: str) -> str:
+        """若干文件内容的联合版本号，供下游缓存作键；默认覆盖全部数据文件"""
+        paths = paths or (CHARACTERS_PATH, SET_EFFECTS_PATH, ARTIFACTS_PATH)
+        h = hashlib.blake2b(digest_size=8)
+        for path in paths:
+            h.update(path.encode("utf-8"))
+            h.update(self.digest(path).encode("ascii"))
+        return h.hexdigest()
+
+    def derived(self, name: str, path: str, build: Callable[[Any], Any]) -> Any:
+        """按文件版本缓存派生对象 (如编译后的圣遗物矩阵)，文件内容变化后重建"""
+        key = (name, path)
+        digest = self.digest(path)
+        with self._lock:
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == digest:
+                return cached[1]
+        value = build(self.get(path))
+        with self._lock:
+            self._derived[key] = (digest, value)
+        return value
+
+    def _load(self, path: str) -> Optional[_Entry]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+        stat = _stat_key(st)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stat == stat:
+                return entry
+            with open(path, "rb") as f:
+                raw = f.read()
+            digest = _digest(raw)
+            if entry is not None and entry.digest == digest:
+                entry.stat = stat
+                return entry
+            try:
+                data = json.loads(raw.decode("utf-8"))
+                self._validate(path, data)
+            except (ValueError, UnicodeDecodeError) as e:
+                # 文件写到一半或内容非法：沿用上一个有效版本
+                if entry is None: raise
+                print(f"[Warn] 重新加载 {path} 失败，沿用旧数据: {e}")
+                entry.stat = stat  # 文件再次变化前不再重试
+                return entry
+            entry = _Entry(data, stat, digest)
+            self._entries[path] = entry
+            self.reloads += 1
+            return entry
+
+    def _validate(self, path: str, data: Any):
+        validator = self.validators.get(path)
+        if validator is not None: validator(data)
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int]:
+    return st.st_mtime_ns, st.st_size
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _deepcopy(data: Any) -> Any:
+    return copy.deepcopy(data)
+
+
+def _expect(kind: type, name: str) -> Callable[[Any], None]:
+    def check(data: Any):
+        if not isinstance(data, kind):
+            raise ValueError(f"{name} 应为 {kind.__name__}，实际为 {type(data).__name__}")
+
+    return check
+
+
+# 全局仓库 (每个进程一份)
+repository = DataRepository({
+    CHARACTERS_PATH: _expect(dict, "characters.json"),
+    SET_EFFECTS_PATH: _expect(dict, "set_effects.json"),
+    ARTIFACTS_PATH: _expect(list, "artifacts.json"),
+})
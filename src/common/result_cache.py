@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+计算结果缓存：请求 (规范化后) + 数据版本 -> 优化结果。内存 LRU，可选 SQLite 持久化 (跨重启、跨 worker 共享)
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def cache_key(request: Dict[str, Any], data_version: str) -> str:
+    """规范化请求字段 (排序键、空值统一) 并拼上数据版本，取哈希作为缓存键"""
+    raw = json.dumps({"request": request, "data": data_version}, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    有界 LRU 结果缓存。path 为空时仅在内存中；给出 SQLite 文件路径时同时落盘，
+    内存未命中再查库，库内条目按最近使用时间淘汰至 maxsize。
+    """
+
+    def __init__(self, maxsize: int = 256, path: Optional[str] = None):
+        self.maxsize = max(1, maxsize)
+        self.path = path
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results "
+                             "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)")
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            value = self._db_get(key) if self._db is not None else None
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                                 (key, json.dumps(value, ensure_ascii=False, default=float), time.time()))
+                self._db.execute("DELETE FROM results WHERE key NOT IN "
+                                 "(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)", (self.maxsize,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data), "maxsize": self.maxsize, "persistent": self._db is not None}
+
+    def _remember(self, key: str, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[Any]:
+        row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None: return None
+        self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        return json.loads(row[0])
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -1,5 +1,8 @@
 # src/engine/analyzer.py
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
 from src.engine.calculator import DamageCalculator
 
 
@@ -33,113 +36,97 @@ class SubstatAnalyzer:
         "dmg_bonus": "增伤 (Dmg%)"
     }
 
+    # 默认分析的额外词条数 (1..N 次，给出边际收益曲线)
+    MAX_ROLLS = 5
+
+    # 词条 -> 作用的面板字段 (百分比词条按对应白值折算)
+    _PANEL_TARGETS = {
+        "hp_percent": ("hp", "base_hp"), "atk_percent": ("atk", "base_atk"), "def_percent": ("def", "base_def"),
+        "hp_flat": ("hp", None), "atk_flat": ("atk", None), "def_flat": ("def", None),
+        "em": ("em", None), "crit_rate": ("crit_rate", None), "crit_dmg": ("crit_dmg", None),
+        "dmg_bonus": ("all_damage_bonus", None),
+    }
+
     @staticmethod
     def analyze(
             base_info: Dict[str, float],  # 角色白值
             current_panel: Dict[str, float],  # 当前最终面板
             calc_args: Dict[str, Any],  # 传递给计算器的其他参数
-            others_params: Dict[str, float]  # 动态参数
+            others_params: Dict[str, float],  # 动态参数
+            max_rolls: int = 1
     ) -> List[Dict]:
         """
         计算词条收益率 (基于最大词条值)
         """
+        return SubstatAnalyzer.analyze_batch(base_info, [current_panel], calc_args, others_params, max_rolls)[0]
 
-        # 辅助函数：安全获取暴伤
-        def get_cd(panel):
-            return panel.get("crit_dmg", panel.get("crit_dmg", 0.0))
-
-        # 1. 计算基准伤害
-        base_dmg = DamageCalculator.calculate_damage(
-            final_atk=current_panel["atk"],
-            final_hp=current_panel["hp"],
-            final_def=current_panel["def"],
-            final_em=current_panel["em"],
-            final_er_bonus=current_panel.get("energy_recharge_bonus", 0),
-            crit_rate=current_panel["crit_rate"],
-            crit_dmg=get_cd(current_panel),
-            **calc_args,
-            **others_params
+    @staticmethod
+    def analyze_batch(
+            base_info: Dict[str, float],
+            panels: List[Dict[str, float]],  # 多个方案的最终面板
+            calc_args: Dict[str, Any],  # 共享的计算参数 (all_damage_bonus 为各方案缺省值)
+            others_params: Dict[str, float],
+            max_rolls: int = 1,
+            damage_bonuses: Optional[List[float]] = None  # 各方案的 all_damage_bonus
+    ) -> List[List[Dict]]:
+        """
+        一次批量调用算出所有方案、所有词条、1..max_rolls 次追加的伤害 (方案数 × (1 + 词条数 × 次数) 个面板)。
+        排名与单次追加 (max_rolls=1) 的旧结果一致；另给出每多一个词条的边际收益 marginal_gains。
+        """
+        keys = list(SubstatAnalyzer.STD_ROLLS)
+        n_panels, n_keys, n_rolls = len(panels), len(keys), max(1, max_rolls)
+        if n_panels == 0: return []
+        bonus = damage_bonuses if damage_bonuses is not None else [calc_args.get("all_damage_bonus", 0.0)] * n_panels
+        shared = {k: v for k, v in calc_args.items() if k != "all_damage_bonus"}
+
+        # 面板字段矩阵 (方案, 1 + 词条 × 次数)：第 0 列为基准，其余列为对应词条追加 r 次
+        fields = {f: np.repeat([[p.get(f, 0.0) for p in panels]], 1 + n_keys * n_rolls, axis=0).T.copy()
+                  for f in ("atk", "hp", "def", "em", "crit_rate", "crit_dmg")}
+        fields["energy_recharge_bonus"] = np.array([p.get("energy_recharge_bonus", 0) for p in panels])[:, None]
+        fields["all_damage_bonus"] = np.repeat(np.asarray(bonus, dtype=np.float64)[:, None], 1 + n_keys * n_rolls,
+                                               axis=1)
+        rolls = np.arange(1, n_rolls + 1)
+        for j, key in enumerate(keys):
+            target, base_key = SubstatAnalyzer._PANEL_TARGETS[key]
+            step = SubstatAnalyzer.STD_ROLLS[key] * (base_info[base_key] if base_key else 1.0)
+            cols = slice(1 + j * n_rolls, 1 + (j + 1) * n_rolls)
+            fields[target][:, cols] += step * rolls
+
+        dmg = DamageCalculator.calculate_damage_batch(
+            final_atk=fields["atk"], final_hp=fields["hp"], final_def=fields["def"], final_em=fields["em"],
+            final_er_bonus=fields["energy_recharge_bonus"], crit_rate=fields["crit_rate"],
+            crit_dmg=fields["crit_dmg"], all_damage_bonus=fields["all_damage_bonus"],
+            **shared, **others_params
         )
 
-        if base_dmg == 0:
-            return []
-
-        results = []
-
-        # 2. 遍历每一个标准词条
-        for stat_key, roll_val in SubstatAnalyzer.STD_ROLLS.items():
-            # 复制面板和参数，避免污染
-            new_stats = current_panel.copy()
-            local_calc_args = calc_args.copy()
-
-            # --- 核心逻辑：模拟加成 ---
-            if stat_key == "hp_percent":
-                new_stats["hp"] += base_info["base_hp"] * roll_val
-            elif stat_key == "atk_percent":
-                new_stats["atk"] += base_info["base_atk"] * roll_val
-            elif stat_key == "def_percent":
-                new_stats["def"] += base_info["base_def"] * roll_val
-
-            # 固定值属性
-            elif stat_key == "hp_flat":
-                new_stats["hp"] += roll_val
-            elif stat_key == "atk_flat":
-                new_stats["atk"] += roll_val
-            elif stat_key == "def_flat":
-                new_stats["def"] += roll_val
-            elif stat_key == "em":
-                new_stats["em"] += roll_val
-            elif stat_key == "crit_rate":
-                new_stats["crit_rate"] += roll_val
-            elif stat_key == "crit_dmg":
-                if "crit_dmg" in new_stats:
-                    new_stats["crit_dmg"] += roll_val
-                else:
-                    new_stats["crit_dmg"] = new_stats.get("crit_dmg", 0.0) + roll_val
-
-            # [新增] 增伤词条处理
-            elif stat_key == "dmg_bonus":
-                # 直接加到 calc_args 的 all_damage_bonus 参数中
-                prev_bonus = local_calc_args.get("all_damage_bonus", 0.0)
-                local_calc_args["all_damage_bonus"] = prev_bonus + roll_val
-
-            # 3. 计算新伤害
-            new_dmg = DamageCalculator.calculate_damage(
-                final_atk=new_stats["atk"],
-                final_hp=new_stats["hp"],
-                final_def=new_stats["def"],
-                final_em=new_stats["em"],
-                final_er_bonus=new_stats.get("energy_recharge_bonus", 0),
-                crit_rate=new_stats["crit_rate"],
-                crit_dmg=get_cd(new_stats),
-                **local_calc_args,  # 使用修改后的参数
-                **others_params
-            )
-
-            # 4. 计算收益幅度
-            gain = new_dmg - base_dmg
-            gain_pct = gain / base_dmg if base_dmg != 0 else 0
-
-            results.append({
-                "key": stat_key,
-                "label": SubstatAnalyzer.LABELS[stat_key],
-                "roll_value": roll_val,
-                "damage_increase": gain,
-                "percent_increase": gain_pct
-            })
-
-        # 5. 排序
-        results.sort(key=lambda x: x["percent_increase"], reverse=True)
-
-        # 6. 计算相对权重 (Score)
-        max_gain = results[0]["percent_increase"] if results else 0
-        for item in results:
-            if max_gain > 0:
-                item["score"] = (item["percent_increase"] / max_gain) * 100
-            else:
-                item["score"] = 0.0
-
-        return results
+        reports = []
+        for i in range(n_panels):
+            base_dmg = float(dmg[i, 0])
+            if base_dmg == 0:
+                reports.append([])
+                continue
+            results = []
+            for j, key in enumerate(keys):
+                curve = dmg[i, 1 + j * n_rolls: 1 + (j + 1) * n_rolls]
+                gain = float(curve[0]) - base_dmg
+                marginal = np.diff(np.concatenate([[base_dmg], curve])) / base_dmg
+                results.append({
+                    "key": key,
+                    "label": SubstatAnalyzer.LABELS[key],
+                    "roll_value": SubstatAnalyzer.STD_ROLLS[key],
+                    "damage_increase": gain,
+                    "percent_increase": gain / base_dmg,
+                    # 第 r 个追加词条带来的增幅 (相对基准伤害)，体现收益递减 / 暴击率溢出
+                    "marginal_gains": marginal.tolist(),
+                })
+
+            # 排序 + 相对权重 (Score)
+            results.sort(key=lambda x: x["percent_increase"], reverse=True)
+            max_gain = results[0]["percent_increase"] if results else 0
+            for item in results:
+                item["score"] = (item["percent_increase"] / max_gain) * 100 if max_gain > 0 else 0.0
+            reports.append(results)
+        return reports
 
     @staticmethod
     def print_report(results: List[Dict]):
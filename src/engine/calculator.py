@@ -1,14 +1,25 @@
 # src/engine/calculator.py
-import math
-import re
 from typing import List, Dict, Optional, Literal, Union, Set
 
+import numpy as np
+
+from src.engine.formula import compile_formula
+
 
 class DamageCalculator:
     LEVEL_MULTIPLIER_90 = 1446.858
     AGGRAVATE_COEFF = 1.15
     SPREAD_COEFF = 1.25
 
+    # 动作类型 -> 动作增伤键
+    ACTION_BONUS_KEYS: Dict[str, str] = {
+        "NormalAttack": "normal_bonus",
+        "ChargedAttack": "charged_bonus",
+        "PlungingAttack": "plunging_bonus",
+        "ElementalSkill": "skill_bonus",
+        "ElementalBurst": "burst_bonus"
+    }
+
     # 体系注册表
     MOON_SYSTEM_TYPES: Set[str] = {
         "MoonBloom", "MoonElectro", "MoonBurn"
@@ -31,19 +42,14 @@ class DamageCalculator:
 
     @staticmethod
     def resolve_dynamic_value(value: Union[float, str], context: Dict[str, float]) -> float:
-        """核心解析器：解析动态公式"""
+        """
+        核心解析器：解析动态公式 (编译结果按源码缓存)。
+        非法公式抛出 FormulaError；求值时的算术错误 (除零、溢出、结果为 inf / nan) 抛出 FormulaEvaluationError
+        (亦为 ArithmeticError)
+        """
         if isinstance(value, (int, float)): return float(value)
         if isinstance(value, str):
-            try:
-                expr = value
-                local_ctx = context.copy()
-                if "def" in local_ctx:
-                    local_ctx["def_val"] = local_ctx["def"]
-                    expr = re.sub(r'\bdef\b', 'def_val', expr)
-                safe_globals = {"min": min, "max": max, "math": math}
-                return float(eval(expr, {"__builtins__": None}, {**safe_globals, **local_ctx}))
-            except Exception:
-                return 0.0
+            return float(compile_formula(value)(context))
         return 0.0
 
     @staticmethod
@@ -62,14 +68,7 @@ class DamageCalculator:
         extra_dmg_bonus += kwargs.get("physical_bonus", 0.0)
 
         # 动作类型增伤
-        action_bonuses = {
-            "NormalAttack": "normal_bonus",
-            "ChargedAttack": "charged_bonus",
-            "PlungingAttack": "plunging_bonus",
-            "ElementalSkill": "skill_bonus",
-            "ElementalBurst": "burst_bonus"
-        }
-        bonus_key = action_bonuses.get(damage_type)
+        bonus_key = DamageCalculator.ACTION_BONUS_KEYS.get(damage_type)
         if bonus_key:
             extra_dmg_bonus += kwargs.get(bonus_key, 0.0)
 
@@ -125,7 +124,7 @@ class DamageCalculator:
             if reaction in ["aggravate", "spread"]:
                 coeff = DamageCalculator.AGGRAVATE_COEFF if reaction == "aggravate" else DamageCalculator.SPREAD_COEFF
                 bonus = reaction_map.get(reaction.split('_')[0], 0.0)
-                final_base_mult += 1446.858 * coeff * (1 + 5 * final_em / (final_em + 1200) + bonus)
+                final_base_mult += DamageCalculator.LEVEL_MULTIPLIER_90 * coeff * (1 + 5 * final_em / (final_em + 1200) + bonus)
             elif reaction and ("vaporize" in reaction or "melt" in reaction):
                 base = 2.0 if reaction in ["vaporize_hydro", "melt_pyro"] else 1.5
                 em_b = 2.78 * final_em / (final_em + 1400)
@@ -145,6 +144,105 @@ class DamageCalculator:
 
         return final_base_mult * reaction_mult * final_dmg_multiplier * crit_mult * def_mult * res_mult * (
                     1.0 + ascension_mult)
+
+    @staticmethod
+    def calculate_damage_batch(
+            skill_multipliers: List[Dict[str, float]],
+            damage_type: str,
+            final_atk, final_hp, final_def, final_em,
+            final_er_bonus,
+            all_damage_bonus,
+            crit_rate, crit_dmg,
+            **kwargs
+    ) -> np.ndarray:
+        """
+        批量版 calculate_damage：面板参数可为长度 N 的数组 (N 个候选)，其余上下文共享。
+        kwargs 中的数值参数同样支持标量或数组 (按 NumPy 广播)，结果与标量路径逐项一致。
+        """
+        final_atk = np.asarray(final_atk, dtype=np.float64)
+        final_hp = np.asarray(final_hp, dtype=np.float64)
+        final_def = np.asarray(final_def, dtype=np.float64)
+        final_em = np.asarray(final_em, dtype=np.float64)
+        all_damage_bonus = np.asarray(all_damage_bonus, dtype=np.float64)
+        crit_rate = np.asarray(crit_rate, dtype=np.float64)
+        crit_dmg = np.asarray(crit_dmg, dtype=np.float64)
+
+        # --- 1. 增伤聚合 ---
+        extra_dmg_bonus = kwargs.get("elemental_bonus", 0.0) + kwargs.get("physical_bonus", 0.0)
+        bonus_key = DamageCalculator.ACTION_BONUS_KEYS.get(damage_type)
+        if bonus_key:
+            extra_dmg_bonus = extra_dmg_bonus + kwargs.get(bonus_key, 0.0)
+
+        # --- 2. 基础倍率区 ---
+        raw_base_mult = 0.0
+        for m in skill_multipliers:
+            typ, val = m["type"], m["value"]
+            if typ == "atk_percent":
+                raw_base_mult = raw_base_mult + val / 100.0 * final_atk
+            elif typ == "hp_percent":
+                raw_base_mult = raw_base_mult + val / 100.0 * final_hp
+            elif typ == "def_percent":
+                raw_base_mult = raw_base_mult + val / 100.0 * final_def
+            elif typ == "em":
+                raw_base_mult = raw_base_mult + val / 100.0 * final_em
+            elif typ == "flat":
+                raw_base_mult = raw_base_mult + val
+
+        # --- 3. 体系/反应分支处理 ---
+        reaction = kwargs.get("reaction", None)
+        reaction_map = kwargs.get("reaction_bonus_map", kwargs)
+
+        enemy_level, attacker_level = kwargs.get("enemy_level", 103), kwargs.get("attacker_level", 90)
+        enemy_base_res, res_pen = kwargs.get("enemy_base_res", 0.10), kwargs.get("resistance_percent", 0.0)
+        def_red, def_ign = kwargs.get("def_reduction", 0.0), kwargs.get("def_ignore", 0.0)
+        ascension_mult = kwargs.get("ascension_mult", 0.0)
+
+        reaction_mult = 1.0
+
+        if damage_type in DamageCalculator.MOON_SYSTEM_TYPES:
+            # === 月体系逻辑 ===
+            final_base_mult = (raw_base_mult + kwargs.get("moon_base_flat", 0.0)) * (
+                    1 + kwargs.get("moon_base_pct", 0.0))
+            if damage_type == "MoonBloom":
+                curve_val = 1.0 + (6.0 * final_em) / (2000.0 + final_em)
+            elif damage_type == "MoonElectro":
+                curve_val = 1.0 + (3.0 * final_em) / (1500.0 + final_em)
+            else:
+                curve_val = 1.0
+            final_dmg_multiplier = curve_val + kwargs.get("moon_dmg_bonus", 0.0)
+            def_ign = DamageCalculator._get_moon_def_ignore(damage_type)
+        else:
+            # === 常规体系逻辑 ===
+            final_base_mult = raw_base_mult + kwargs.get("base_multiplier_add", 0.0)
+            final_dmg_multiplier = all_damage_bonus + extra_dmg_bonus
+
+            if reaction in ["aggravate", "spread"]:
+                coeff = DamageCalculator.AGGRAVATE_COEFF if reaction == "aggravate" else DamageCalculator.SPREAD_COEFF
+                bonus = reaction_map.get(reaction.split('_')[0], 0.0)
+                final_base_mult = final_base_mult + DamageCalculator.LEVEL_MULTIPLIER_90 * coeff * (
+                        1 + 5 * final_em / (final_em + 1200) + bonus)
+            elif reaction and ("vaporize" in reaction or "melt" in reaction):
+                base = 2.0 if reaction in ["vaporize_hydro", "melt_pyro"] else 1.5
+                em_b = 2.78 * final_em / (final_em + 1400)
+                bonus = reaction_map.get("vaporize" if "vaporize" in reaction else "melt", 0.0)
+                reaction_mult = base * (1 + em_b + bonus + kwargs.get("reaction_specific_bonus", 0.0))
+
+        # --- 4. 结算 ---
+        crit_mult = 1.0 + np.clip(crit_rate, 0.0, 1.0) * crit_dmg
+
+        def_ign = np.minimum(1.0, def_ign)
+        def_denominator = (attacker_level + 100) + (enemy_level + 100) * (1 - def_red) * (1 - def_ign)
+        def_mult = (attacker_level + 100) / def_denominator
+
+        res = np.asarray(enemy_base_res - res_pen, dtype=np.float64)
+        res_mult = np.where(res < 0, 1 - res / 2, np.where(res < 0.75, 1 - res, 1 / (1 + 4 * np.maximum(res, 0.0))))
+
+        dmg = final_base_mult * reaction_mult * final_dmg_multiplier * crit_mult * def_mult * res_mult * (
+                1.0 + ascension_mult)
+        shape = np.broadcast(dmg, final_atk, final_hp, final_def, final_em, crit_rate, crit_dmg, all_damage_bonus).shape
+        return np.broadcast_to(dmg, shape).astype(np.float64)
+
+
 # ==========================================
 # 🟢 [测试用例] 模拟真实输入 (预乘 1.6x)
 # ==========================================
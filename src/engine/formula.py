@@ -0,0 +1,144 @@
+# src/engine/formula.py
+import ast
+import math
+import re
+from functools import lru_cache, reduce
+from types import SimpleNamespace
+from typing import Dict, Any, FrozenSet
+
+import numpy as np
+
+# 公式中可引用的面板变量
+PANEL_VARIABLES: FrozenSet[str] = frozenset({"atk", "hp", "def", "em", "er", "crit_rate", "crit_dmg"})
+
+# `def` 是 Python 关键字，解析前替换为占位名
+_DEF_ALIAS = "_def_val"
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call, ast.Attribute,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+)
+
+
+# 幂运算的指数只能是绝对值不超过该值的数值常量 (防止 9**9**9 之类的超大整数运算卡死进程)
+MAX_EXPONENT = 16
+
+
+class FormulaError(ValueError):
+    """动态公式非法 (语法 / 白名单) 或求值失败"""
+
+
+class FormulaEvaluationError(FormulaError, ArithmeticError):
+    """
+    公式合法但求值时出现算术错误 (除零、溢出，或标量结果为 inf / nan)；调用方可按 ArithmeticError 跳过该效果。
+    数组上下文逐元素求值不抛出，非有限值留给调用方按候选处理
+    """
+
+
+def _vmin(*args):
+    if any(isinstance(a, np.ndarray) for a in args): return reduce(np.minimum, args)
+    return min(*args)
+
+
+def _vmax(*args):
+    if any(isinstance(a, np.ndarray) for a in args): return reduce(np.maximum, args)
+    return max(*args)
+
+
+# 可调用函数白名单 (同时兼容标量与 NumPy 数组)
+_FUNCTIONS = {"min": _vmin, "max": _vmax, "abs": np.abs}
+_MATH = SimpleNamespace(floor=np.floor, ceil=np.ceil, sqrt=np.sqrt, log=np.log, exp=np.exp, pi=np.pi, e=np.e)
+
+
+class _Rewriter(ast.NodeTransformer):
+    """校验节点白名单，并把变量名改写为 _v["name"] 下标访问"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.variables = set()
+
+    def generic_visit(self, node):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"公式 {self.source!r} 含不允许的语法: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def visit_BinOp(self, node: ast.BinOp):
+        if isinstance(node.op, ast.Pow):
+            exp = node.right
+            if isinstance(exp, ast.UnaryOp) and isinstance(exp.op, (ast.USub, ast.UAdd)): exp = exp.operand
+            if not (isinstance(exp, ast.Constant) and isinstance(exp.value, (int, float))
+                    and not isinstance(exp.value, bool) and abs(exp.value) <= MAX_EXPONENT):
+                raise FormulaError(f"公式 {self.source!r} 的幂指数须为绝对值不超过 {MAX_EXPONENT} 的数值常量")
+        return self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        is_math = (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                   and func.value.id == "math" and hasattr(_MATH, func.attr))
+        if not (is_math or (isinstance(func, ast.Name) and func.id in _FUNCTIONS)) or node.keywords:
+            raise FormulaError(f"公式 {self.source!r} 调用了不允许的函数: {ast.unparse(func)}")
+        node.args = [self.visit(a) for a in node.args]
+        return node
+
+    def visit_Attribute(self, node: ast.Attribute):
+        if isinstance(node.value, ast.Name) and node.value.id == "math" and hasattr(_MATH, node.attr):
+            return node
+        raise FormulaError(f"公式 {self.source!r} 访问了不允许的属性: {ast.unparse(node)}")
+
+    def visit_Constant(self, node: ast.Constant):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise FormulaError(f"公式 {self.source!r} 含非数值常量: {node.value!r}")
+        # 整数常量按浮点参与运算：结果超出范围时抛 OverflowError，而不是构造任意大的整数
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+    def visit_Name(self, node: ast.Name):
+        name = "def" if node.id == _DEF_ALIAS else node.id
+        if name not in PANEL_VARIABLES:
+            raise FormulaError(f"公式 {self.source!r} 引用了未知变量: {name} (可用: {', '.join(sorted(PANEL_VARIABLES))})")
+        self.variables.add(name)
+        return ast.copy_location(
+            ast.Subscript(value=ast.Name(id="_v", ctx=ast.Load()), slice=ast.Constant(name), ctx=ast.Load()), node)
+
+
+class Formula:
+    """编译后的动态公式，调用时传入变量上下文 (值可为标量或数组)"""
+
+    __slots__ = ("source", "variables", "_fn")
+
+    def __init__(self, source: str, variables: FrozenSet[str], fn):
+        self.source = source
+        self.variables = variables
+        self._fn = fn
+
+    def __call__(self, context: Dict[str, Any]):
+        try:
+            result = self._fn(context)
+        except KeyError as e:
+            raise FormulaError(f"公式 {self.source!r} 求值缺少变量 {e.args[0]}") from None
+        except ArithmeticError as e:
+            raise FormulaEvaluationError(f"公式 {self.source!r} 求值失败: {e}") from None
+        # 浮点乘法等溢出不抛异常而是得到 inf，标量结果在此拦下，避免污染面板
+        if np.ndim(result) == 0 and not math.isfinite(result):
+            raise FormulaEvaluationError(f"公式 {self.source!r} 求值结果非有限值: {result}")
+        return result
+
+    def __repr__(self):
+        return f"Formula({self.source!r})"
+
+
+@lru_cache(maxsize=1024)
+def compile_formula(source: str) -> Formula:
+    """解析一次、白名单校验、按源码字符串缓存"""
+    try:
+        tree = ast.parse(re.sub(r'\bdef\b', _DEF_ALIAS, source.strip()), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"公式 {source!r} 语法错误: {e.msg}") from None
+
+    rewriter = _Rewriter(source)
+    body = rewriter.visit(tree).body
+    lam = ast.Expression(ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg="_v")], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body))
+    ast.fix_missing_locations(lam)
+    fn = eval(compile(lam, f"<formula {source}>", "eval"), {"__builtins__": {}, "math": _MATH, **_FUNCTIONS})
+    return Formula(source, frozenset(rewriter.variables), fn)
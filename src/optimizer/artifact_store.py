@@ -0,0 +1,276 @@
+# src/optimizer/artifact_store.py
+"""
+圣遗物列式二进制存储：定宽数值列 + 整数编码的套装 / 部位 / 词条类型 + 小字符串表。
+文件以 mmap 只读映射，各列直接作为零拷贝 numpy 视图交给 CompiledInventory，
+同一文件在多个进程间共享操作系统页缓存；JSON 字典只在展示结果时按行还原。
+
+文件布局：MAGIC | 各列数据 (64 字节对齐) | JSON 尾部 (列偏移 / 字符串表 / 源文件信息) | 尾部长度 u64 | MAGIC
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.optimizer.inventory import CompiledInventory, SLOTS, STAT_COLUMNS
+
+MAGIC = b"GOARTS01"
+FORMAT_VERSION = 1
+ALIGN = 64
+MAX_SUBSTATS = 4
+
+# (列名, 类型, 每行形状)
+COLUMNS: List[Tuple[str, str, Tuple[int, ...]]] = [
+    ("ids", "<i8", ()),
+    ("set_ids", "<i4", ()),
+    ("slot_ids", "<i1", ()),
+    ("stats", "<f8", (len(STAT_COLUMNS),)),
+    ("main_types", "<i2", ()),
+    ("main_values", "<f8", ()),
+    ("main_elements", "<i2", ()),
+    ("sub_types", "<i2", (MAX_SUBSTATS,)),
+    ("sub_values", "<f8", (MAX_SUBSTATS,)),
+    ("sub_elements", "<i2", (MAX_SUBSTATS,)),
+]
+
+
+def _layout(count: int) -> Tuple[Dict[str, Tuple[int, str, Tuple[int, ...]]], int]:
+    """各列在文件中的 (偏移, 类型, 形状) 及数据区末尾位置，只取决于行数"""
+    layout, offset = {}, len(MAGIC)
+    for name, dtype, row_shape in COLUMNS:
+        offset = -(-offset // ALIGN) * ALIGN
+        shape = (count,) + row_shape
+        layout[name] = (offset, dtype, shape)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+def _file_digest(path: str) -> str:
+    """与 DataRepository.digest 相同的内容哈希 (分块读取)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _StringTable:
+    """字符串 -> 整数编码 (按首次出现顺序)"""
+
+    def __init__(self, initial: Iterable[Any] = ()):
+        self.values: List[Any] = []
+        self.index: Dict[Any, int] = {}
+        for v in initial: self.code(v)
+
+    def code(self, value: Any) -> int:
+        if value not in self.index:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+        return self.index[value]
+
+
+class ArtifactStoreWriter:
+    """
+    流式写出：行数预先给定，各列在目标文件上 memmap 后逐行填充，内存占用与圣遗物数量无关。
+    source 为对应的 artifacts.json，记录其大小 / mtime / 内容哈希用于判断存储是否过期。
+    """
+
+    def __init__(self, path: str, count: int, source: Optional[str] = None):
+        self.path = path
+        self.count = count
+        self.source = source
+        self.row = 0
+        self.sets = _StringTable()
+        self.slots = _StringTable(SLOTS)
+        self.stat_types = _StringTable()
+        self.elements = _StringTable()
+        self._tmp = f"{path}.tmp"
+        self._layout, end = _layout(count)
+        with open(self._tmp, "wb") as f:
+            f.write(MAGIC)
+            f.truncate(end)
+        self._mm = np.memmap(self._tmp, dtype=np.uint8, mode="r+", shape=(end,)) if end else None
+        self.cols = {name: self._mm[offset:offset + int(np.prod(shape)) * np.dtype(dtype).itemsize]
+                     .view(dtype).reshape(shape) for name, (offset, dtype, shape) in self._layout.items()} \
+            if self._mm is not None else {}
+        if count:
+            self.cols["sub_types"][...] = -1
+
+    def append(self, art: Dict[str, Any]):
+        if self.row >= self.count:
+            raise ValueError(f"圣遗物数量超过预定的 {self.count} 件")
+        substats = art.get("substats", [])
+        if len(substats) > MAX_SUBSTATS:
+            raise ValueError(f"圣遗物 {art.get('id')} 副词条超过 {MAX_SUBSTATS} 条")
+        c, row = self.cols, self.row
+        c["ids"][row] = art["id"]
+        c["set_ids"][row] = self.sets.code(art["set"])
+        c["slot_ids"][row] = self.slots.code(art["slot"])
+        CompiledInventory.accumulate_stats(art, c["stats"][row])
+        main = art["main_stat"]
+        c["main_types"][row] = self.stat_types.code(main["type"])
+        c["main_values"][row] = main["value"]
+        c["main_elements"][row] = self.elements.code(main.get("element", "null"))
+        for j, sub in enumerate(substats):
+            c["sub_types"][row, j] = self.stat_types.code(sub["type"])
+            c["sub_values"][row, j] = sub["value"]
+            c["sub_elements"][row, j] = self.elements.code(sub.get("element", "null"))
+        self.row += 1
+
+    def close(self):
+        if self.row != self.count:
+            raise ValueError(f"预定 {self.count} 件圣遗物，实际写入 {self.row} 件")
+        if self._mm is not None:
+            self._mm.flush()
+            self.cols, self._mm = {}, None
+        footer = {
+            "version": FORMAT_VERSION, "count": self.count, "stat_columns": STAT_COLUMNS,
+            "columns": {name: [offset, dtype, list(shape)] for name, (offset, dtype, shape) in self._layout.items()},
+            "sets": self.sets.values, "slots": self.slots.values,
+            "stat_types": self.stat_types.values, "elements": self.elements.values,
+            "source": _source_info(self.source) if self.source else None,
+        }
+        raw = json.dumps(footer, ensure_ascii=False).encode("utf-8")
+        with open(self._tmp, "ab") as f:
+            f.write(raw)
+            f.write(len(raw).to_bytes(8, "little"))
+            f.write(MAGIC)
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self) -> "ArtifactStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.cols, self._mm = {}, None
+            if os.path.exists(self._tmp): os.remove(self._tmp)
+
+
+def _source_info(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "digest": _file_digest(path)}
+
+
+def write_store(artifacts: Sequence, path: str, source: Optional[str] = None):
+    """把圣遗物列表整体写成列式存储"""
+    with ArtifactStoreWriter(path, len(artifacts), source) as writer:
+        for art in artifacts:
+            writer.append(art)
+
+
+class ArtifactRecords(Sequence):
+    """按行还原圣遗物字典 (与 artifacts.json 中的条目一致)，供结果展示；可 pickle (按路径重新映射)"""
+
+    def __init__(self, store: "ArtifactStore"):
+        self.store = store
+
+    def __len__(self) -> int:
+        return self.store.count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        s = self.store
+        row = int(row)
+        if row < 0: row += s.count
+        if not 0 <= row < s.count: raise IndexError(row)
+        substats = [{"type": s.stat_types[t], "value": float(v), "element": s.elements[e]}
+                    for t, v, e in zip(s.sub_types[row].tolist(), s.sub_values[row].tolist(),
+                                       s.sub_elements[row].tolist()) if t >= 0]
+        return {
+            "id": int(s.ids[row]),
+            "set": s.set_names[s.set_ids[row]],
+            "slot": s.slots[s.slot_ids[row]],
+            "main_stat": {"type": s.stat_types[s.main_types[row]], "value": float(s.main_values[row]),
+                          "element": s.elements[s.main_elements[row]]},
+            "substats": substats,
+        }
+
+    def __reduce__(self):
+        return _open_records, (self.store.path,)
+
+
+class ArtifactStore:
+    """只读映射的列式存储；各列为 numpy 视图，inventory 为零拷贝构造的 CompiledInventory"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if len(mm) < 2 * len(MAGIC) + 8 or mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"不是圣遗物列式存储文件: {path}")
+        footer_len = int.from_bytes(mm[-len(MAGIC) - 8:-len(MAGIC)], "little")
+        footer_end = len(mm) - len(MAGIC) - 8
+        footer = json.loads(mm[footer_end - footer_len:footer_end].decode("utf-8"))
+        if footer["version"] != FORMAT_VERSION or footer["stat_columns"] != STAT_COLUMNS:
+            raise ValueError(f"列式存储版本与当前程序不一致，请重新导入: {path}")
+        self.count = footer["count"]
+        self.source = footer["source"]
+        self.set_names: List[str] = footer["sets"]
+        self.slots: List[str] = footer["slots"]
+        self.stat_types: List[str] = footer["stat_types"]
+        self.elements: List[str] = footer["elements"]
+        for name, (offset, dtype, shape) in footer["columns"].items():
+            arr = np.frombuffer(mm, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=offset) \
+                if self.count else np.zeros(0, dtype=np.dtype(dtype))
+            setattr(self, name, arr.reshape(shape))
+        self.records = ArtifactRecords(self)
+        self._inventory: Optional[CompiledInventory] = None
+
+    @property
+    def inventory(self) -> CompiledInventory:
+        """零拷贝的 CompiledInventory (首次访问时构造，之后复用以保留套装表缓存)"""
+        if self._inventory is None:
+            inv = CompiledInventory.from_arrays({f: getattr(self, f) for f in CompiledInventory.ARRAY_FIELDS},
+                                                self.set_names, self.records)
+            inv.store_path = self.path
+            self._inventory = inv
+        return self._inventory
+
+    def is_fresh(self, source: str) -> bool:
+        """对应的 JSON 源文件未在写出存储后改动 (源文件不存在时以存储为准)"""
+        try:
+            st = os.stat(source)
+        except FileNotFoundError:
+            return True
+        return self.source is not None and (st.st_mtime_ns, st.st_size) == (self.source["mtime_ns"], self.source["size"])
+
+
+# 每个进程按文件 (mtime, 大小) 缓存已映射的存储
+_STORES: Dict[str, Tuple[Tuple[int, int], ArtifactStore]] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def open_store(path: str) -> ArtifactStore:
+    """映射存储文件；文件未变时复用同一映射"""
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _STORES_LOCK:
+        cached = _STORES.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        store = ArtifactStore(path)
+        _STORES[path] = (key, store)
+        return store
+
+
+def fresh_store(path: str, source: str) -> Optional[ArtifactStore]:
+    """存储文件存在、可读且不比 JSON 源旧时返回它，否则返回 None (调用方回退到 JSON)"""
+    if not os.path.exists(path): return None
+    try:
+        store = open_store(path)
+    except (OSError, ValueError) as e:
+        print(f"[Warn] 无法读取列式存储 {path}，改用 JSON: {e}")
+        return None
+    return store if store.is_fresh(source) else None
+
+
+def _open_records(path: str) -> ArtifactRecords:
+    return open_store(path).records
@@ -0,0 +1,230 @@
+# src/optimizer/branch_bound.py
+import heapq
+from typing import List, Dict, Any
+
+import numpy as np
+
+from src.optimizer.genetic_algo import ArtifactOptimizer
+
+
+class ExactArtifactOptimizer(ArtifactOptimizer):
+    """
+    分支定界精确搜索：逐部位枚举，用“剩余部位逐列最大词条 + 套装乐观上界”估计伤害上限，
+    上限不超过当前第 top_n 名的分支直接剪掉，结果为可证明的最优前 N 名。
+
+    上界成立的前提：伤害对各累加列单调不减 (词条与套装增量非负、动态公式单调)，
+    这对当前的倍率 / 增伤 / 暴击 / 反应公式均成立。
+    """
+
+    # 主词条差异大的部位先定，尽早收紧上界
+    SEARCH_ORDER = ["sands", "goblet", "circlet", "flower", "plume"]
+    # 从该层起按块向量化展开剩余部位；每块子节点数不超过 LEAF_CHUNK，块间刷新门槛
+    VECTOR_DEPTH = 2
+    LEAF_CHUNK = 16384
+    # 部位池不超过该件数时不分簇 (逐件展开已足够便宜)
+    CLUSTER_MIN_POOL = 16
+
+    def optimize(self, top_n=5, prune=True, **kwargs):
+        self._start_run()
+        if prune: self._prune_pools(top_n)
+        inv = self.inventory
+        n_sets = len(inv.set_names)
+        order = [self.SLOTS.index(s) for s in self.SEARCH_ORDER]
+        pools = [np.asarray(self.artifacts_by_slot[self.SLOTS[i]], dtype=np.int64) for i in order]
+        forced_sid = None
+        if self.forced_set:
+            if self.forced_set_id < 0: return []
+            forced_sid = self.forced_set_id
+        if any(len(p) == 0 for p in pools): return []
+
+        # 剩余部位的逐列词条上界 (后缀和)
+        slot_max = [inv.stats[p].max(axis=0) for p in pools]
+        suffix = [np.zeros(inv.stats.shape[1])]
+        for m in reversed(slot_max):
+            suffix.insert(0, suffix[0] + m)
+        # 剩余部位中各套装最多还能凑几件 (该部位候选里有此套装才计 1)
+        reach = [np.zeros(n_sets, dtype=np.int64)]
+        for p in reversed(pools):
+            reach.insert(0, reach[0] + (np.bincount(inv.set_ids[p], minlength=n_sets) > 0))
+
+        set_bound_cache: Dict[bytes, np.ndarray] = {}
+        heap = []  # 小顶堆：(伤害, 序号, 行号组合)
+        # 精确搜索不做收敛判断；时间预算用尽时返回已找到的前 N 名 (不再保证最优)
+        stats = {"nodes": 0, "pruned": 0, "bound_evaluations": 0, "cancelled": False, "stop_reason": "completed"}
+
+        def threshold() -> float:
+            # min_score 为外部给定的门槛 (如配队搜索中的当前第 K 名)，低于它的组合无需求出
+            return max(heap[0][0], self.min_score) if len(heap) >= top_n else self.min_score
+
+        def push(score: float, rows: List[int]):
+            item = (score, stats["nodes"], rows)
+            if len(heap) < top_n:
+                heapq.heappush(heap, item)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+        def stopped() -> bool:
+            if stats["stop_reason"] == "completed" and self._time_exhausted():
+                stats["stop_reason"] = "time_budget"
+            return stats["stop_reason"] != "completed"
+
+        pool_stats = [inv.stats[p] for p in pools]
+        pool_sets = [inv.set_ids[p] for p in pools]
+        # 各部位池按相关词条聚簇：先以簇的逐列最大值求上界，整簇剪掉后不再逐件展开
+        columns = self._relevant_columns()
+        clusters = [self._clusters(st, columns) for st in pool_stats]
+        cluster_cover = [np.stack([st[g].max(axis=0) for g in cl]) for st, cl in zip(pool_stats, clusters)]
+        cluster_sets = [[np.unique(ps[g]) for g in cl] for ps, cl in zip(pool_sets, clusters)]
+
+        def expand(sums: np.ndarray, counts: np.ndarray, depth: int, th: float):
+            """
+            M 个前缀 × pools[depth]：先求 (前缀, 簇) 的上界并按门槛 th 过滤，再对存活簇逐件求上界
+            (最后一个部位同样如此)。返回子节点展平下标 (前缀序号 × P + 池内序号)、词条和与上界；
+            行号 / 件数只在 take 中为存活的子节点构造。
+            """
+            m, p = len(sums), len(pools[depth])
+            groups = clusters[depth]
+            # 套装上界只依赖父节点件数分布：相同分布共用一张 (套装数, 累加列) 表
+            keys = np.ascontiguousarray(counts).view(np.dtype((np.void, counts.shape[1])))[:, 0]
+            uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            tables = self._child_set_bounds(counts[first], uniq, reach[depth + 1], 4 - depth, forced_sid,
+                                            set_bound_cache)
+
+            idx = np.arange(m * p)
+            if len(groups) > 1:
+                k = len(groups)
+                group_tables = np.stack([tables[:, sets, :].max(axis=1) for sets in cluster_sets[depth]], axis=1)
+                group_sums = sums[:, None, :] + cluster_cover[depth][None, :, :] + group_tables[inverse]
+                # 簇内任一件的件数潜力都不超过 “已定件数 + 含本部位的可凑件数”
+                potential = np.repeat(counts + reach[depth], k, axis=0) if self.set_table.dynamic_effects else None
+                group_bounds = self._upper_bounds(group_sums.reshape(m * k, -1) + suffix[depth + 1], potential)
+                stats["bound_evaluations"] += m * k
+                if forced_sid is not None:
+                    has_forced = np.array([forced_sid in sets for sets in cluster_sets[depth]])
+                    forced = counts[:, forced_sid, None] + has_forced[None, :] + reach[depth + 1][forced_sid]
+                    group_bounds[(forced < 4).ravel()] = -np.inf
+                live = (group_bounds > th).reshape(m, k)
+                sizes = np.array([len(g) for g in groups])
+                stats["pruned"] += int(((~live) * sizes).sum())
+                idx = np.concatenate([(np.flatnonzero(live[:, g])[:, None] * p + groups[g][None, :]).ravel()
+                                      for g in range(k)])
+            parent, j = np.divmod(idx, p)
+            child_sums = sums[parent] + pool_stats[depth][j]
+            set_bounds = tables[inverse[parent], pool_sets[depth][j]]
+            potential = None
+            if self.set_table.dynamic_effects:
+                potential = counts[parent] + reach[depth + 1]
+                potential[np.arange(len(idx)), pool_sets[depth][j]] += 1
+            bounds = self._upper_bounds(child_sums + suffix[depth + 1] + set_bounds, potential)
+            stats["nodes"] += len(idx)
+            stats["bound_evaluations"] += len(idx)
+            if forced_sid is not None:
+                forced = counts[parent, forced_sid] + (pool_sets[depth][j] == forced_sid)
+                bounds[forced + reach[depth + 1][forced_sid] < 4] = -np.inf
+            return idx, child_sums, bounds
+
+        def take(rows: np.ndarray, counts: np.ndarray, depth: int, idx: np.ndarray):
+            """expand 返回的展平下标 -> (行号组合, 件数)"""
+            parent, j = np.divmod(idx, len(pools[depth]))
+            child_counts = counts[parent]
+            child_counts[np.arange(len(idx)), pool_sets[depth][j]] += 1
+            return np.column_stack([rows[parent], pools[depth][j]]), child_counts
+
+        def descend(rows: np.ndarray, sums: np.ndarray, counts: np.ndarray, bounds: np.ndarray, depth: int):
+            """
+            向量化阶段：rows 为按上界降序排列的前缀。父节点分块展开 (子节点数 ≤ LEAF_CHUNK)，
+            每块先按当前门槛过滤，非叶子按上界降序递归、叶子只评估过滤后的部分，门槛逐块抬高。
+            """
+            step = max(1, self.LEAF_CHUNK // len(pools[depth]))
+            for start in range(0, len(rows), step):
+                if stopped(): return
+                th = threshold()
+                live = np.flatnonzero(bounds[start:start + step] > th)
+                if len(live) == 0:
+                    # 父节点按上界降序，之后的块只会更低
+                    stats["pruned"] += len(rows) - start
+                    return
+                stats["pruned"] += min(step, len(rows) - start) - len(live)
+                live += start
+                c_idx, c_sums, c_bounds = expand(sums[live], counts[live], depth, th)
+                alive = np.flatnonzero(c_bounds > th)
+                stats["pruned"] += len(c_bounds) - len(alive)
+                if len(alive) == 0: continue
+                if depth == 4:
+                    leaves = take(rows[live], counts[live], depth, c_idx[alive])[0]
+                    scores = self._evaluate_population(leaves)
+                    better = np.flatnonzero(scores > threshold())
+                    for i in better[np.argsort(-scores[better], kind="stable")][:top_n]:
+                        push(float(scores[i]), leaves[i].tolist())
+                    continue
+                alive = alive[np.argsort(-c_bounds[alive], kind="stable")]
+                c_rows, c_counts = take(rows[live], counts[live], depth, c_idx[alive])
+                descend(c_rows, c_sums[alive], c_counts, c_bounds[alive], depth + 1)
+
+        def search(rows: np.ndarray, sums: np.ndarray, counts: np.ndarray, depth: int):
+            # 前几个部位深度优先，按上界从高到低展开，尽早抬高门槛
+            c_idx, c_sums, bounds = expand(sums, counts, depth, threshold())
+            ordered = np.argsort(-bounds, kind="stable")
+            c_rows, c_counts = take(rows, counts, depth, c_idx[ordered])
+            c_sums, bounds = c_sums[ordered], bounds[ordered]
+            if depth + 1 == self.VECTOR_DEPTH:
+                descend(c_rows, c_sums, c_counts, bounds, depth + 1)
+                return
+            for step in range(1, len(bounds) + 1):
+                if stopped(): return
+                if bounds[step - 1] <= threshold():
+                    stats["pruned"] += len(bounds) - step + 1
+                    break
+                search(c_rows[step - 1:step], c_sums[step - 1:step], c_counts[step - 1:step], depth + 1)
+                if depth == 0:
+                    # 以首层分支为进度步
+                    best = max(heap) if heap else (0.0, 0, None)
+                    stats["cancelled"] = self._report_progress(step, len(bounds), best[0], self._slot_order(best[2]))
+                    if stats["cancelled"]: stats["stop_reason"] = "cancelled"
+
+        # 件数矩阵用 int8 (每套至多 5 件)，按字节去重更快
+        search(np.zeros((1, 0), dtype=np.int64), np.zeros((1, inv.stats.shape[1])),
+               np.zeros((1, n_sets), dtype=np.int8), 0)
+
+        final_scored = [(score, self._slot_order(rows)) for score, _, rows in sorted(heap, reverse=True)]
+
+        self.run_stats = {"engine": "exact", "evaluations": self.evaluations, "pruned_artifacts": self.pruned_count,
+                          "elapsed_ms": self._elapsed_ms(), "evals_per_sec": self._evals_per_sec(), **stats}
+        return self._format_results(final_scored, top_n)
+
+    def _slot_order(self, rows):
+        """搜索顺序的行号组合 -> SLOTS 顺序，便于展示"""
+        if rows is None: return None
+        ind = [0] * 5
+        for depth, row in enumerate(rows): ind[self.SLOTS.index(self.SEARCH_ORDER[depth])] = row
+        return ind
+
+    def _clusters(self, stats: np.ndarray, columns: List[int]) -> List[np.ndarray]:
+        """
+        部位池按相关列中 (相对该池最大值) 最突出的两列分簇，返回各簇的池内下标。
+        同簇圣遗物词条形态相近，簇的逐列最大值比整池逐列最大值紧得多。
+        """
+        if len(stats) <= self.CLUSTER_MIN_POOL or not columns:
+            return [np.arange(len(stats))]
+        vals = stats[:, columns]
+        norm = vals / np.maximum(vals.max(axis=0), 1e-12)
+        top = np.sort(np.argsort(-norm, axis=1, kind="stable")[:, :2], axis=1)
+        labels = np.unique(top, axis=0, return_inverse=True)[1].ravel()
+        return [np.flatnonzero(labels == g) for g in range(labels.max() + 1)]
+
+    def _child_set_bounds(self, counts: np.ndarray, keys: np.ndarray, reach: np.ndarray, remaining: int,
+                          forced_sid, cache: Dict) -> np.ndarray:
+        """
+        在已定件数 counts (U, 套装数) 下，下一件分别取各套装时的套装增量上界 (U, 套装数, 累加列)。
+        reach 为之后 remaining 个部位中每个套装最多还能凑的件数；只依赖这几项，按件数分布 (keys) 缓存，
+        大量节点共享，未命中的分布一次批量求出。
+        """
+        suffix = reach.tobytes() + bytes([remaining])
+        keys = [k.tobytes() + suffix for k in keys]
+        missing = [i for i, k in enumerate(keys) if k not in cache]
+        if missing:
+            n_sets = counts.shape[1]
+            child = counts[missing][:, None, :] + np.eye(n_sets, dtype=counts.dtype)[None, :, :]
+            for i, table in zip(missing, self.set_table.feasible_upper_bound(child, reach, remaining, forced_sid)):
+                cache[keys[i]] = table
+        return np.stack([cache[k] for k in keys])
@@ -0,0 +1,43 @@
+# src/optimizer/fitness_cache.py
+from itertools import islice
+from typing import Dict, Any, Hashable, Iterable, List, Optional
+
+
+class FitnessCache:
+    """有界适应度缓存：组合键 -> 伤害。写满后按插入顺序淘汰最旧条目。"""
+
+    def __init__(self, maxsize: int = 200_000):
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_many(self, keys: Iterable[Hashable]) -> List[Optional[float]]:
+        data = self._data
+        found = [data.get(k) for k in keys]
+        n_miss = found.count(None)
+        self.misses += n_miss
+        self.hits += len(found) - n_miss
+        return found
+
+    def put_many(self, keys: Iterable[Hashable], values: Iterable[float]):
+        data = self._data
+        for k, v in zip(keys, values):
+            data[k] = v
+        overflow = len(data) - self.maxsize
+        if overflow > 0:
+            for k in list(islice(data, overflow)):
+                del data[k]
+
+    def stats(self) -> Dict[str, Any]:
+        return self.summary(self.hits, self.misses, len(self._data))
+
+    @staticmethod
+    def summary(hits: int, misses: int, size: int) -> Dict[str, Any]:
+        """命中 / 未命中 / 条目数 -> run_stats 中的缓存统计项 (多个缓存汇总时各项先求和)"""
+        total = hits + misses
+        return {"cache_hits": hits, "cache_misses": misses, "cache_hit_rate": hits / total if total else 0.0,
+                "cache_size": size}
@@ -1,12 +1,23 @@
 # src/optimizer/genetic_algo.py
 import random
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from collections import Counter
+
+import numpy as np
+
 from src.engine.calculator import DamageCalculator
+from src.optimizer.inventory import CompiledInventory, COL, SLOTS
+from src.optimizer.set_bonus import SetBonusTable
+from src.optimizer.pruning import relevant_columns, prune_dominated
+from src.optimizer.fitness_cache import FitnessCache
+from src.optimizer.panel_state import PanelState
+from src.common.logger import PhaseTimer
 
 
 class ArtifactOptimizer:
-    SLOTS = ["flower", "plume", "sands", "goblet", "circlet"]
+    SLOTS = SLOTS
+    FITNESS_CACHE_SIZE = 200_000
     # 🟢 统一铁律字段: crit_dmg
     STAT_MAP = {
         "hp_flat": "生命值", "hp_percent": "生命值%", "atk_flat": "攻击力",
@@ -19,7 +30,10 @@ class ArtifactOptimizer:
                  fixed_damage_bonus, target_skill_multipliers, character_element, skill_type,
                  damage_type,
                  reaction=None, forced_set=None, **kwargs):
-        self.artifacts = artifacts_data
+        # artifacts_data 可为原始圣遗物列表，也可为已编译 (或共享内存挂载) 的 CompiledInventory
+        self.inventory = artifacts_data if isinstance(artifacts_data, CompiledInventory) \
+            else CompiledInventory(artifacts_data)
+        self.artifacts = self.inventory.artifacts
         self.set_effects = set_effects_data
         self.base_info = base_info
         self.fixed_panel = fixed_panel
@@ -31,119 +45,121 @@ class ArtifactOptimizer:
         self.skill_type = skill_type
         self.damage_type = damage_type
         self.params = kwargs
+        # 运行统计 (评估次数等)，由各引擎的 optimize 填充
+        self.evaluations = 0
+        self.pruned_count = 0
+        self.run_stats: Dict[str, Any] = {}
+        # 进度回调：每代 (或每个搜索步) 调用一次，返回 True 表示请求取消
+        self.progress_callback: Optional[Callable[[Dict[str, Any]], Optional[bool]]] = None
+        self._started_at = time.perf_counter()
+        # 伤害门槛：精确引擎只求高于它的组合 (其余引擎忽略)
+        self.min_score = 0.0
+        # 提前结束 (None 为不启用)：连续 patience 代最优值相对提升不足 min_improvement 视为收敛；
+        # time_budget_ms 为墙钟预算，用尽时返回当前最优的前 N 名
+        self.patience: Optional[int] = None
+        self.min_improvement = 0.0
+        self.time_budget_ms: Optional[float] = None
+        self._best_seen = 0.0
+        self._stagnant = 0
+        # 适应度缓存：同一组合 (精英、重复子代、最终排名) 只算一次
+        self.fitness_cache = FitnessCache(self.FITNESS_CACHE_SIZE)
 
-        # 预处理：按部位分类圣遗物
-        self.artifacts_by_slot = {s: [a for a in artifacts_data if a["slot"] == s] for s in self.SLOTS}
-        # 预处理：ID 查找表
-        self.art_lookup = {a["id"]: a for a in artifacts_data}
+        # 预处理：个体以稠密词条矩阵的行号表示
+        self.artifacts_by_slot = self.inventory.rows_by_slot
+        # 预处理：套装效果按 (元素, 技能类型) 编译为查表
+        self.set_table = self._compiled_set_table(set_effects_data, character_element, skill_type)
 
         # 预处理：强制套装池
         if self.forced_set:
-            self.forced_by_slot = {s: [a for a in artifacts_data if a["slot"] == s and a["set"] == self.forced_set] for
-                                   s in self.SLOTS}
+            self.forced_set_id = self.inventory.set_index.get(self.forced_set, -1)
+            self.forced_by_slot = self.inventory.rows_of_set(self.forced_set)
+
+    def _compiled_set_table(self, set_effects_data, character_element, skill_type) -> SetBonusTable:
+        """同一库存、同一份套装配置下按 (元素, 技能类型) 复用编译表"""
+        cache = self.inventory.set_tables
+        key = (id(set_effects_data), character_element, skill_type)
+        hit = cache.get(key)
+        # 缓存项持有配置对象本身，既防止 id 被复用，也能识别配置已被替换
+        if hit is not None and hit[0] is set_effects_data: return hit[1]
+        table = SetBonusTable(set_effects_data, self.inventory.set_names, character_element, skill_type)
+        cache[key] = (set_effects_data, table)
+        return table
+
+    def _relevant_columns(self) -> List[int]:
+        return relevant_columns(self.skill_multipliers, self.damage_type, self.reaction, self.set_table)
+
+    def _prune_pools(self, keep: int):
+        """搜索前剪枝：按目标技能相关列剔除各部位池中被支配的圣遗物"""
+        self.artifacts_by_slot, self.pruned_count = prune_dominated(
+            self.inventory, self.inventory.rows_by_slot, self._relevant_columns(), keep)
+        if self.forced_set:
+            self.forced_by_slot = {s: [r for r in rows if self.inventory.set_ids[r] == self.forced_set_id]
+                                   for s, rows in self.artifacts_by_slot.items()}
 
     def _format_stat_value(self, stat_type, value):
         """格式化数值显示，使用 :.1% 自动处理乘100逻辑"""
         is_percent = any(x in stat_type for x in ["percent", "crit", "recharge", "bonus"])
         return f"{value:.1%}" if is_percent else f"{int(value)}"
 
-    def _calculate_panel_and_bonus(self, selected: List[Dict[str, Any]], skill_type: str = "") -> Dict[str, float]:
-        sums = {
-            "atk_pct": 0.0, "atk_flat": 0.0, "hp_pct": 0.0, "hp_flat": 0.0,
-            "def_pct": 0.0, "def_flat": 0.0, "em": 0.0,
-            "crit_rate": 0.0, "crit_dmg": 0.0,
-            "energy_recharge": 0.0,
-            "universal_dmg": 0.0,  # 🟢 细分增伤：通用
-            "ele_dmg": 0.0,  # 🟢 细分增伤：元素
-            "act_dmg": 0.0,  # 🟢 细分增伤：动作(重击/普攻等)
-            "moon_dmg_bonus": 0.0
-        }
+    def _candidate_sums(self, rows: np.ndarray) -> np.ndarray:
+        """(N, 5) 行号 -> (N, 累加列)：套装效果 (查表) + 五件圣遗物词条 (行求和)"""
+        return self._state_sums(self._panel_state(rows))
+
+    def _panel_state(self, rows) -> PanelState:
+        return PanelState(self.inventory, self.set_table, rows)
+
+    def _state_sums(self, state: PanelState) -> np.ndarray:
+        """增量面板状态 -> (N, 累加列)；状态若由其他套装表构建 (如轮换中的另一技能)，按件数重查本表"""
+        if state.set_table is self.set_table:
+            sums = state.totals()
+        else:
+            sums = state.stat_sums + self.set_table.bonus_from_counts(state.counts)
+        if self.set_table.dynamic_effects:
+            # 动态套装效果 (如 "er * 0.25") 以候选自身面板为上下文逐个求值
+            sums += self.set_table.dynamic_bonus(state.counts, self._formula_context(sums))
+        return sums
+
+    def _sum_selected(self, individual: List[int]) -> np.ndarray:
+        return self._candidate_sums(np.asarray([individual], dtype=np.int64))[0]
 
-        char_elem = self.character_element.lower()
-        set_count = Counter(a["set"] for a in selected)
-
-        # 1. 圣遗物套装效果
-        for set_name, count in set_count.items():
-            if set_name in self.set_effects:
-                effs = self.set_effects[set_name]
-                for n in ["2", "4"]:
-                    if count >= int(n):
-                        key = n if n in effs else f"{n}_piece"
-                        for eff in effs.get(key, []):
-                            t, v, e = eff.get("type"), eff.get("value", 0), eff.get("element", "null").lower()
-
-                            if t == "atk_percent":
-                                sums["atk_pct"] += v
-                            elif t == "hp_percent":
-                                sums["hp_pct"] += v
-                            elif t == "em":
-                                sums["em"] += v
-                            elif t == "crit_rate":
-                                sums["crit_rate"] += v
-                            elif t == "crit_dmg":
-                                sums["crit_dmg"] += v
-                            elif t == "energy_recharge":
-                                sums["energy_recharge"] += v
-                            elif t == "moon_dmg_bonus":
-                                sums["moon_dmg_bonus"] += v
-                            elif (e == "null" or e == char_elem):
-                                if t == "damage_bonus":
-                                    sums["universal_dmg"] += v
-                                elif t == "elemental_bonus":
-                                    sums["ele_dmg"] += v
-
-                            # 🟢 [修正] 动作特定增伤分类，确保 15% 重击加成归类到动作区
-                            if t == "skill_bonus" and skill_type == "ElementalSkill": sums["act_dmg"] += v
-                            if t == "burst_bonus" and skill_type == "ElementalBurst": sums["act_dmg"] += v
-                            if t == "attack_bonus" and skill_type == "NormalAttack": sums["act_dmg"] += v
-                            if t == "charged_bonus" and skill_type == "ChargedAttack": sums["act_dmg"] += v
-
-        # 2. 圣遗物单件词条
-        for art in selected:
-            for s in [art["main_stat"]] + art.get("substats", []):
-                st, sv = s["type"], s["value"]
-                if st == "atk_percent":
-                    sums["atk_pct"] += sv
-                elif st == "atk_flat":
-                    sums["atk_flat"] += sv
-                elif st == "hp_percent":
-                    sums["hp_pct"] += sv
-                elif st == "hp_flat":
-                    sums["hp_flat"] += sv
-                elif st == "em":
-                    sums["em"] += sv
-                elif st == "crit_rate":
-                    sums["crit_rate"] += sv
-                elif st == "crit_dmg":
-                    sums["crit_dmg"] += sv
-                elif st == "energy_recharge":
-                    sums["energy_recharge"] += sv
+    def _formula_context(self, sums: np.ndarray) -> Dict[str, np.ndarray]:
+        p = self._final_stats(sums)
+        return {"atk": p["atk"], "hp": p["hp"], "def": p["def"], "em": p["em"],
+                "er": 1.0 + self.fixed_panel.get("er", 0.0) + p["energy_recharge_bonus"],
+                "crit_rate": p["crit_rate"], "crit_dmg": p["crit_dmg"]}
 
+    def _final_stats(self, sums: np.ndarray) -> Dict[str, Any]:
+        """由累加列计算最终面板 (sums 可为单行或 N 行矩阵)"""
         # 🟢 [核心修复] 面板计算公式：移除 (1 + sums)，改用 sums 直乘 Base，避免 Base 被双倍计算
-        panel = {
-            "atk": self.base_info["base_atk"] * sums["atk_pct"] + sums["atk_flat"] + self.fixed_panel["atk"],
-            "hp": self.base_info["base_hp"] * sums["hp_pct"] + sums["hp_flat"] + self.fixed_panel["hp"],
-            "def": self.base_info["base_def"] * sums["def_pct"] + sums["def_flat"] + self.fixed_panel["def"],
-            "em": sums["em"] + self.fixed_panel["em"],
-            "crit_rate": sums["crit_rate"] + self.fixed_panel["crit_rate"],
-            "crit_dmg": sums["crit_dmg"] + self.fixed_panel["crit_dmg"],
-            "energy_recharge_bonus": sums["energy_recharge"] + self.fixed_panel.get("energy_recharge_bonus", 0.0),
+        c = lambda name: sums[..., COL[name]]
+        return {
+            "atk": self.base_info["base_atk"] * c("atk_pct") + c("atk_flat") + self.fixed_panel["atk"],
+            "hp": self.base_info["base_hp"] * c("hp_pct") + c("hp_flat") + self.fixed_panel["hp"],
+            "def": self.base_info["base_def"] * c("def_pct") + c("def_flat") + self.fixed_panel["def"],
+            "em": c("em") + self.fixed_panel["em"],
+            "crit_rate": c("crit_rate") + self.fixed_panel["crit_rate"],
+            "crit_dmg": c("crit_dmg") + self.fixed_panel["crit_dmg"],
+            "energy_recharge_bonus": c("energy_recharge") + self.fixed_panel.get("energy_recharge_bonus", 0.0),
 
             # 增伤汇总：all_damage_bonus 依然作为传给计算器的总加成
-            "all_damage_bonus": sums["universal_dmg"] + sums["ele_dmg"] + sums["act_dmg"] + self.fixed_damage_bonus,
-
-            # 为了让 main.py 打印正确，需要将圣遗物提供的分类增伤存入对应键名
-            "elemental_bonus": sums["ele_dmg"] + self.params.get("elemental_bonus", 0.0),
-            "moon_dmg_bonus": sums["moon_dmg_bonus"] + self.params.get("moon_dmg_bonus", 0.0)
+            "all_damage_bonus": c("universal_dmg") + c("ele_dmg") + c("act_dmg") + self.fixed_damage_bonus,
         }
 
+    def _calculate_panel_and_bonus(self, individual: List[int], skill_type: str = "") -> Dict[str, float]:
+        sums = self._sum_selected(individual)
+        panel = {k: float(v) for k, v in self._final_stats(sums).items()}
+
+        # 为了让 main.py 打印正确，需要将圣遗物提供的分类增伤存入对应键名
+        panel["elemental_bonus"] = float(sums[COL["ele_dmg"]]) + self.params.get("elemental_bonus", 0.0)
+        panel["moon_dmg_bonus"] = float(sums[COL["moon_dmg_bonus"]]) + self.params.get("moon_dmg_bonus", 0.0)
+
         # 🟢 修正动作加成的键名映射，确保 15% 显示在“动作加成”
         action_key = {
             "NormalAttack": "normal_bonus", "ChargedAttack": "charged_bonus",
             "ElementalSkill": "skill_bonus", "ElementalBurst": "burst_bonus"
         }.get(skill_type, "")
         if action_key:
-            panel[action_key] = sums["act_dmg"] + self.params.get(action_key, 0.0)
+            panel[action_key] = float(sums[COL["act_dmg"]]) + self.params.get(action_key, 0.0)
 
         # 注入 params 中的其他队友 Buff
         for k, v in self.params.items():
@@ -153,13 +169,30 @@ class ArtifactOptimizer:
 
     def _evaluate(self, individual: List[int]) -> float:
         if self.forced_set:
-            count = sum(1 for aid in individual if self.art_lookup[aid]["set"] == self.forced_set)
+            count = int(np.count_nonzero(self.inventory.set_ids[individual] == self.forced_set_id))
             if count < 4: return 0.0
 
-        selected = [self.art_lookup[aid] for aid in individual]
-        p = self._calculate_panel_and_bonus(selected, self.skill_type)
+        p = self._final_stats(self._sum_selected(individual))
 
         return DamageCalculator.calculate_damage(
+            skill_multipliers=self.skill_multipliers,
+            damage_type=self.damage_type,
+            final_atk=float(p["atk"]),
+            final_hp=float(p["hp"]),
+            final_def=float(p["def"]),
+            final_em=float(p["em"]),
+            final_er_bonus=float(p["energy_recharge_bonus"]),
+            all_damage_bonus=float(p["all_damage_bonus"]),
+            crit_rate=float(p["crit_rate"]),
+            crit_dmg=float(p["crit_dmg"]),
+            reaction=self.reaction,
+            **self.params
+        )
+
+    def _score_sums(self, sums: np.ndarray) -> np.ndarray:
+        """(N, 累加列) -> (N,) 期望伤害 (批量伤害内核)"""
+        p = self._final_stats(sums)
+        return DamageCalculator.calculate_damage_batch(
             skill_multipliers=self.skill_multipliers,
             damage_type=self.damage_type,
             final_atk=p["atk"],
@@ -174,26 +207,76 @@ class ArtifactOptimizer:
             **self.params
         )
 
+    def _upper_bounds(self, sums: np.ndarray, potential: np.ndarray) -> np.ndarray:
+        """乐观词条 (已含套装上界) 的伤害上限，动态套装效果按可能激活者取正部计入"""
+        if self.set_table.dynamic_effects:
+            sums = sums + np.maximum(self.set_table.dynamic_bonus(potential, self._formula_context(sums)), 0.0)
+        return self._score_sums(sums)
+
+    def damage_upper_bound(self) -> float:
+        """
+        不经搜索的伤害上限：各部位逐列最大词条之和 + 套装乐观上界。
+        伤害对各累加列单调不减，故任何合法组合的伤害都不超过该值 (用于配队搜索剪枝)。
+        """
+        pools = [self.artifacts_by_slot.get(s, []) for s in self.SLOTS]
+        if any(len(p) == 0 for p in pools): return 0.0
+        forced_sid = None
+        if self.forced_set:
+            if self.forced_set_id < 0: return 0.0
+            forced_sid = self.forced_set_id
+        stats = sum(self.inventory.stats[p].max(axis=0) for p in pools)
+        potential = np.full((1, len(self.inventory.set_names)), 5)
+        sums = stats[None, :] + self.set_table.upper_bound(potential, forced_sid)
+        return float(self._upper_bounds(sums, potential)[0])
+
+    def _evaluate_population(self, population, state: Optional[PanelState] = None) -> np.ndarray:
+        """整代个体一次性评估：行求和 (或由父代增量派生的面板状态) + 批量伤害内核"""
+        if len(population) == 0: return np.zeros(0)
+        rows = np.asarray(population, dtype=np.int64)
+        self.evaluations += len(rows)
+        if state is None: state = self._panel_state(rows)
+        scores = self._score_sums(self._state_sums(state))
+        if self.forced_set:
+            forced_count = np.count_nonzero(self.inventory.set_ids[rows] == self.forced_set_id, axis=1)
+            scores = np.where(forced_count < 4, 0.0, scores)
+        return scores
+
+    def _evaluate_cached(self, population: List[List[int]], state: Optional[PanelState] = None) -> np.ndarray:
+        """带缓存的整代评估：只对缓存未命中的组合调用批量内核"""
+        keys = [tuple(sorted(ind)) for ind in population]
+        found = self.fitness_cache.get_many(keys)
+        scores = np.array([0.0 if v is None else v for v in found])
+        miss = [i for i, v in enumerate(found) if v is None]
+        if miss:
+            fresh = self._evaluate_population([population[i] for i in miss],
+                                              state.take(miss) if state is not None else None)
+            scores[miss] = fresh
+            self.fitness_cache.put_many((keys[i] for i in miss), fresh.tolist())
+        return scores
+
     # ... (其余 optimize, _repair_individual, _tournament_selection 保持逻辑不变) ...
 
     def _repair_individual(self, individual: List[int]) -> List[int]:
         if not self.forced_set: return individual
-        current_set_indices = [idx for idx, aid in enumerate(individual) if
-                               self.art_lookup[aid]["set"] == self.forced_set]
+        current_set_indices = [idx for idx, row in enumerate(individual) if
+                               self.inventory.set_ids[row] == self.forced_set_id]
         if len(current_set_indices) >= 4: return individual
         new_ind = individual[:]
         off_piece_indices = [idx for idx in range(5) if idx not in current_set_indices]
         random.shuffle(off_piece_indices)
         for idx in off_piece_indices[:4 - len(current_set_indices)]:
             pool = self.forced_by_slot.get(self.SLOTS[idx], [])
-            if pool: new_ind[idx] = random.choice(pool)["id"]
+            if pool: new_ind[idx] = random.choice(pool)
         return new_ind
 
     def _tournament_selection(self, population, scores, k=3):
+        return population[self._tournament_index(population, scores, k)]
+
+    def _tournament_index(self, population, scores, k=3) -> int:
         candidates = random.sample(range(len(population)), k)
-        return population[max(candidates, key=lambda i: scores[i])]
+        return max(candidates, key=lambda i: scores[i])
 
-    def optimize(self, population_size=400, generations=100, top_n=5):
+    def _init_population(self, population_size: int) -> List[List[int]]:
         population = []
         for _ in range(population_size):
             ind = []
@@ -205,33 +288,126 @@ class ArtifactOptimizer:
                 if not pool:
                     valid = False; break
                 else:
-                    ind.append(random.choice(pool)["id"])
+                    ind.append(random.choice(pool))
             if valid: population.append(self._repair_individual(ind))
+        return population
+
+    def _evolve(self, population: List[List[int]], scores_list: List[float], gen: int, generations: int,
+                population_size: int) -> Tuple[List[List[int]], List[int]]:
+        """
+        一代进化：精英保留 + 锦标赛选择 + 均匀交叉 + 变异 + 套装修复 + 去重。
+        返回 (下一代, 各子代的父代下标)；父代取与子代相同部位较多的一方，供面板增量派生。
+        """
+        order = sorted(range(len(population)), key=lambda i: scores_list[i], reverse=True)
+        elite_count = max(2, int(population_size * 0.05))
+        parents = order[:elite_count]
+        next_gen = [population[i] for i in parents]
+        seen_hashes = set(tuple(ind) for ind in next_gen)
+        while len(next_gen) < population_size:
+            i1 = self._tournament_index(population, scores_list)
+            i2 = self._tournament_index(population, scores_list)
+            p1, p2 = population[i1], population[i2]
+            child = [p1[i] if random.random() < 0.5 else p2[i] for i in range(5)]
+            if random.random() < (0.3 - 0.2 * gen / generations):
+                idx = random.randint(0, 4)
+                pool = self.artifacts_by_slot[self.SLOTS[idx]]
+                if pool: child[idx] = random.choice(pool)
+            child = self._repair_individual(child)
+            child_tuple = tuple(child)
+            if child_tuple not in seen_hashes:
+                next_gen.append(child)
+                seen_hashes.add(child_tuple)
+                same1 = sum(a == b for a, b in zip(child, p1))
+                same2 = sum(a == b for a, b in zip(child, p2))
+                parents.append(i1 if same1 >= same2 else i2)
+        return next_gen, parents
+
+    def _report_progress(self, step: int, total: int, best_score: float, best_ind: Optional[List[int]]) -> bool:
+        """向 progress_callback 汇报进度 (当前最优伤害、评估速率、当前最优配装)，返回是否请求取消"""
+        if self.progress_callback is None: return False
+        elapsed = time.perf_counter() - self._started_at
+        top_build = None
+        if best_ind is not None and best_score > 0:
+            top_build = {"artifact_ids": [int(self.inventory.ids[row]) for row in best_ind],
+                         "sets": dict(Counter(self.inventory.set_names[self.inventory.set_ids[row]] for row in best_ind))}
+        return bool(self.progress_callback({
+            "generation": step, "generations": total, "best_damage": float(best_score),
+            "evaluations": self.evaluations, "elapsed": elapsed,
+            "evals_per_sec": self._evals_per_sec(),
+            "top_build": top_build,
+        }))
+
+    def _start_run(self):
+        self.evaluations = 0
+        self._started_at = time.perf_counter()
+        self._best_seen = 0.0
+        self._stagnant = 0
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started_at) * 1000
+
+    def _evals_per_sec(self) -> float:
+        elapsed = time.perf_counter() - self._started_at
+        return self.evaluations / elapsed if elapsed > 0 else 0.0
+
+    def _time_exhausted(self) -> bool:
+        return self.time_budget_ms is not None and self._elapsed_ms() >= self.time_budget_ms
+
+    def _stop_reason(self, best_score: float, generations: int = 1) -> Optional[str]:
+        """每代 (或每轮) 结束时检查提前结束条件，返回 "time_budget" / "stagnation"，继续则为 None"""
+        if self._time_exhausted(): return "time_budget"
+        if not self.patience: return None
+        if best_score > self._best_seen * (1 + self.min_improvement) and best_score > self._best_seen:
+            self._best_seen, self._stagnant = best_score, 0
+        else:
+            self._stagnant += generations
+        return "stagnation" if self._stagnant >= self.patience else None
+
+    def optimize(self, population_size=400, generations=100, top_n=5, prune=True):
+        self._start_run()
+        timer = PhaseTimer()
+        with timer.phase("prune"):
+            if prune: self._prune_pools(top_n)
+        population = self._init_population(population_size)
         if not population: return []
 
+        # 面板状态随种群逐代派生：子代只对换掉的部位做增量更新
+        state = self._panel_state(population)
+        stop_reason, gens_run = "completed", 0
         for gen in range(generations):
-            scored = [(self._evaluate(ind), ind) for ind in population]
-            scores_list = [s[0] for s in scored]
-            scored_sorted = sorted(scored, key=lambda x: x[0], reverse=True)
-            elite_count = max(2, int(population_size * 0.05))
-            next_gen = [ind for s, ind in scored_sorted[:elite_count]]
-            seen_hashes = set(tuple(ind) for ind in next_gen)
-            while len(next_gen) < population_size:
-                p1 = self._tournament_selection(population, scores_list)
-                p2 = self._tournament_selection(population, scores_list)
-                child = [p1[i] if random.random() < 0.5 else p2[i] for i in range(5)]
-                if random.random() < (0.3 - 0.2 * gen / generations):
-                    idx = random.randint(0, 4)
-                    pool = self.artifacts_by_slot[self.SLOTS[idx]]
-                    if pool: child[idx] = random.choice(pool)["id"]
-                child = self._repair_individual(child)
-                child_tuple = tuple(child)
-                if child_tuple not in seen_hashes:
-                    next_gen.append(child)
-                    seen_hashes.add(child_tuple)
-            population = next_gen
-
-        final_scored = sorted([(self._evaluate(ind), ind) for ind in population], key=lambda x: x[0], reverse=True)
+            with timer.phase("evaluate"):
+                scores_list = self._evaluate_cached(population, state).tolist()
+            best = max(range(len(population)), key=scores_list.__getitem__)
+            gens_run = gen + 1
+            if self._report_progress(gen + 1, generations, scores_list[best], population[best]):
+                stop_reason = "cancelled"
+                break
+            reason = self._stop_reason(scores_list[best])
+            if reason:
+                stop_reason = reason
+                break
+            with timer.phase("evolve"):
+                population, parents = self._evolve(population, scores_list, gen, generations, population_size)
+                state = state.derive(parents, population)
+
+        with timer.phase("evaluate"):
+            final_scored = sorted(zip(self._evaluate_cached(population, state).tolist(), population),
+                                  key=lambda x: x[0], reverse=True)
+        phases = timer.as_dict()
+        del phases["total_ms"]
+        self.run_stats = {"engine": "ga", "evaluations": self.evaluations, "generations": generations,
+                          "generations_run": gens_run, "stop_reason": stop_reason,
+                          "cancelled": stop_reason == "cancelled", "elapsed_ms": self._elapsed_ms(),
+                          "evals_per_sec": self._evals_per_sec(), **phases,
+                          "pruned_artifacts": self.pruned_count, **self.fitness_cache.stats()}
+        return self._format_results(final_scored, top_n)
+
+    def _result_extras(self, individual: List[int]) -> Dict[str, Any]:
+        """子类可为每个方案附加的额外字段"""
+        return {}
+
+    def _format_results(self, final_scored, top_n: int) -> List[Dict[str, Any]]:
+        """(伤害, 行号组合) 按伤害降序 -> 去重后的前 top_n 个方案"""
         results = []
         seen = set()
         slot_cn = {"flower": "花", "plume": "羽", "sands": "沙", "goblet": "杯", "circlet": "头"}
@@ -239,7 +415,7 @@ class ArtifactOptimizer:
             if score <= 0: continue
             combo = tuple(sorted(ind))
             if combo not in seen:
-                selected_arts = [self.art_lookup[aid] for aid in ind]
+                selected_arts = [self.artifacts[row] for row in ind]
                 art_details = []
                 for a in selected_arts:
                     m_stat = a["main_stat"]
@@ -251,11 +427,12 @@ class ArtifactOptimizer:
                         f"   [{slot_cn[a['slot']]}] {a['set']} | {main_str} | 副: {' / '.join(sub_strs)}")
                 results.append({
                     "damage": score,
-                    "panel": self._calculate_panel_and_bonus(selected_arts, self.skill_type),
+                    "panel": self._calculate_panel_and_bonus(ind, self.skill_type),
                     "sets": dict(Counter(a["set"] for a in selected_arts)),
                     "artifact_strings": art_details,
-                    "artifacts": selected_arts
+                    "artifacts": selected_arts,
+                    **self._result_extras(ind)
                 })
                 seen.add(combo)
             if len(results) >= top_n: break
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,141 @@
+# src/optimizer/inventory.py
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Sequence, Optional, Tuple
+
+import numpy as np
+
+SLOTS = ["flower", "plume", "sands", "goblet", "circlet"]
+
+# 面板累加列 (与 ArtifactOptimizer 的 sums 字段一一对应)
+STAT_COLUMNS = [
+    "atk_pct", "atk_flat", "hp_pct", "hp_flat",
+    "def_pct", "def_flat", "em",
+    "crit_rate", "crit_dmg",
+    "energy_recharge",
+    "universal_dmg",  # 细分增伤：通用
+    "ele_dmg",  # 细分增伤：元素
+    "act_dmg",  # 细分增伤：动作(重击/普攻等)
+    "moon_dmg_bonus",
+]
+COL = {name: i for i, name in enumerate(STAT_COLUMNS)}
+
+# 圣遗物词条类型 -> 累加列 (未列出的词条不计入面板)
+ARTIFACT_STAT_COLUMNS = {
+    "atk_percent": COL["atk_pct"], "atk_flat": COL["atk_flat"],
+    "hp_percent": COL["hp_pct"], "hp_flat": COL["hp_flat"],
+    "em": COL["em"],
+    "crit_rate": COL["crit_rate"], "crit_dmg": COL["crit_dmg"],
+    "energy_recharge": COL["energy_recharge"],
+}
+
+
+class CompiledInventory:
+    """
+    圣遗物库的稠密表示：每件圣遗物一行、每个累加列一列，套装/部位驻留为整数编号。
+    构造一次后只读，可在多次评估 (乃至多个优化器、多个进程) 之间共享。
+    """
+
+    # 可共享的数组字段
+    ARRAY_FIELDS = ("stats", "set_ids", "slot_ids", "ids")
+
+    def __init__(self, artifacts_data: List[Dict[str, Any]]):
+        self.artifacts = artifacts_data
+        n = len(artifacts_data)
+
+        self.set_names: List[str] = []
+        set_index: Dict[str, int] = {}
+        slot_index = {s: i for i, s in enumerate(SLOTS)}
+
+        self.stats = np.zeros((n, len(STAT_COLUMNS)), dtype=np.float64)
+        self.set_ids = np.empty(n, dtype=np.int32)
+        self.slot_ids = np.empty(n, dtype=np.int8)
+        self.ids = np.empty(n, dtype=np.int64)
+
+        for row, art in enumerate(artifacts_data):
+            set_name = art["set"]
+            if set_name not in set_index:
+                set_index[set_name] = len(self.set_names)
+                self.set_names.append(set_name)
+            self.set_ids[row] = set_index[set_name]
+            self.slot_ids[row] = slot_index.get(art["slot"], -1)
+            self.ids[row] = art["id"]
+            self.accumulate_stats(art, self.stats[row])
+
+        self._build_index()
+
+    @staticmethod
+    def accumulate_stats(art: Dict[str, Any], out: np.ndarray):
+        """把单件圣遗物的主副词条累加进一行累加列 (out 原地修改)"""
+        for s in [art["main_stat"]] + art.get("substats", []):
+            col = ARTIFACT_STAT_COLUMNS.get(s["type"])
+            if col is not None:
+                out[col] += s["value"]
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], set_names: List[str],
+                    artifacts: Optional[List[Dict[str, Any]]] = None) -> "CompiledInventory":
+        """由已编译的数组直接构造 (不再遍历 artifacts 字典)"""
+        inv = cls.__new__(cls)
+        inv.artifacts = artifacts if artifacts is not None else []
+        for field in cls.ARRAY_FIELDS:
+            setattr(inv, field, arrays[field])
+        inv.set_names = list(set_names)
+        inv._build_index()
+        return inv
+
+    def _build_index(self):
+        # 套装效果编译表缓存：(套装配置, 元素, 技能类型) -> SetBonusTable，同一库存的多次优化复用
+        self.set_tables: Dict[Tuple[int, str, str], Tuple[Any, Any]] = {}
+        self.set_index = {name: i for i, name in enumerate(self.set_names)}
+        self.row_by_id = {int(aid): row for row, aid in enumerate(self.ids)}
+        self.rows_by_slot: Dict[str, List[int]] = {
+            s: np.flatnonzero(self.slot_ids == i).tolist() for i, s in enumerate(SLOTS)}
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+    def rows_of_set(self, set_name: str) -> Dict[str, List[int]]:
+        """按部位列出某套装的行号"""
+        sid = self.set_index.get(set_name, -1)
+        return {s: np.flatnonzero((self.slot_ids == i) & (self.set_ids == sid)).tolist()
+                for i, s in enumerate(SLOTS)}
+
+    def sum_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """单套组合的词条累加 (五行求和)"""
+        return self.stats[list(rows)].sum(axis=0)
+
+    # --- 跨进程共享 (只读) ---
+    def share(self) -> Tuple[Dict[str, Any], List[shared_memory.SharedMemory]]:
+        """
+        把数组复制进共享内存，返回可 pickle 的描述 (只含名字/形状/类型与套装名表) 及内存块句柄。
+        调用方负责在使用结束后对句柄 close() + unlink()。
+        由列式存储文件映射而来的矩阵本身即可跨进程共享页面，只传文件路径、不复制。
+        """
+        if getattr(self, "store_path", None):
+            return {"store": self.store_path}, []
+        spec = {"set_names": self.set_names, "arrays": {}}
+        blocks = []
+        for field in self.ARRAY_FIELDS:
+            arr = getattr(self, field)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            spec["arrays"][field] = (shm.name, arr.shape, arr.dtype.str)
+            blocks.append(shm)
+        return spec, blocks
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any], artifacts: Optional[List[Dict[str, Any]]] = None) -> "CompiledInventory":
+        """在工作进程中按 share() 的描述挂载共享内存，得到零拷贝的只读视图 (artifacts 用于结果展示，可省略)"""
+        if "store" in spec:
+            from src.optimizer.artifact_store import open_store
+            return open_store(spec["store"]).inventory
+        blocks, arrays = [], {}
+        for field, (name, shape, dtype) in spec["arrays"].items():
+            shm = shared_memory.SharedMemory(name=name)
+            arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            arr.flags.writeable = False
+            arrays[field] = arr
+            blocks.append(shm)
+        inv = cls.from_arrays(arrays, spec["set_names"], artifacts)
+        inv._shared_blocks = blocks  # 保持引用，视图存续期间内存块不被关闭
+        return inv
@@ -0,0 +1,154 @@
+# src/optimizer/islands.py
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from src.optimizer.fitness_cache import FitnessCache
+from src.optimizer.genetic_algo import ArtifactOptimizer
+from src.optimizer.inventory import CompiledInventory
+
+# 工作进程内的岛屿优化器 (每个进程初始化一次)
+_WORKER: Optional[ArtifactOptimizer] = None
+
+
+def _init_worker(spec: Dict[str, Any]):
+    """工作进程初始化：挂载共享内存中的圣遗物矩阵，构造只含搜索状态的优化器"""
+    global _WORKER
+    inventory = CompiledInventory.attach(spec["inventory"])
+    _WORKER = ArtifactOptimizer(inventory, *spec["args"], **spec["params"])
+    _WORKER.artifacts_by_slot = spec["artifacts_by_slot"]
+    _WORKER.forced_by_slot = spec["forced_by_slot"]
+
+
+def _run_epoch(population: Optional[List[List[int]]], rng_state, gen_start: int, n_gens: int, generations: int,
+               population_size: int, deadline: Optional[float] = None):
+    """
+    在工作进程中把一个岛屿推进 n_gens 代，返回 (种群, 分数, 随机数状态, 本轮评估次数, 实际推进代数, 缓存统计)；
+    deadline 为时间预算的截止时刻 (time.time() 墙钟，跨进程可比)，每代结束时检查，到时即提前返回。
+    缓存统计为本进程适应度缓存 (同进程的各岛共用) 的 (进程号, 本轮命中, 本轮未命中, 当前条目数)
+    """
+    opt = _WORKER
+    random.setstate(rng_state)
+    evaluations, hits, misses = opt.evaluations, opt.fitness_cache.hits, opt.fitness_cache.misses
+    if population is None:
+        population = opt._init_population(population_size)
+    if not population: return population, [], random.getstate(), 0, 0, (os.getpid(), 0, 0, len(opt.fitness_cache))
+    state = opt._panel_state(population)
+    gens_done = 0
+    for gen in range(gen_start, gen_start + n_gens):
+        scores_list = opt._evaluate_cached(population, state).tolist()
+        population, parents = opt._evolve(population, scores_list, gen, generations, population_size)
+        state = state.derive(parents, population)
+        gens_done += 1
+        if deadline is not None and time.time() >= deadline: break
+    scores = opt._evaluate_cached(population, state).tolist()
+    cache = opt.fitness_cache
+    return population, scores, random.getstate(), opt.evaluations - evaluations, gens_done, \
+        (os.getpid(), cache.hits - hits, cache.misses - misses, len(cache))
+
+
+class IslandArtifactOptimizer(ArtifactOptimizer):
+    """
+    岛屿模型遗传算法：K 个子种群在进程池中各自进化 (独立随机种子)，每 M 代按环形拓扑
+    把各岛最优个体迁入下一个岛替换其最差个体。圣遗物矩阵经共享内存只读共享，不向工作进程 pickle 圣遗物数据。
+    """
+
+    def optimize(self, population_size=400, generations=100, top_n=5, prune=True,
+                 islands=None, migration_interval=10, migrants=5, workers=None, seed=None):
+        self._start_run()
+        if prune: self._prune_pools(top_n)
+        islands = islands or min(8, os.cpu_count() or 1)
+        workers = workers or min(islands, os.cpu_count() or 1)
+        island_size = max(2 * migrants, population_size // islands)
+        base_seed = seed if seed is not None else random.randrange(2 ** 32)
+        states = [random.Random(base_seed + i).getstate() for i in range(islands)]
+        populations: List[Optional[List[List[int]]]] = [None] * islands
+        scores: List[List[float]] = [[] for _ in range(islands)]
+
+        spec_inventory, blocks = self.inventory.share()
+        spec = {
+            "inventory": spec_inventory,
+            "args": (self.set_effects, self.base_info, self.fixed_panel, self.fixed_damage_bonus,
+                     self.skill_multipliers, self.character_element, self.skill_type, self.damage_type,
+                     self.reaction, self.forced_set),
+            "params": self.params,
+            "artifacts_by_slot": self.artifacts_by_slot,
+            "forced_by_slot": getattr(self, "forced_by_slot", {}),
+        }
+        epochs, stop_reason, gens_run = 0, "completed", 0
+        # 各工作进程适应度缓存的累计命中 / 未命中，及各进程缓存的最新条目数
+        cache_hits, cache_misses, cache_sizes = 0, 0, {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as pool:
+                for gen_start in range(0, max(generations, 1), migration_interval):
+                    n_gens = min(migration_interval, generations - gen_start)
+                    # 时间预算的截止时刻随本轮一起下发，工作进程逐代检查 (不必等到整轮结束)
+                    deadline = time.time() + (self.time_budget_ms - self._elapsed_ms()) / 1000 \
+                        if self.time_budget_ms is not None else None
+                    futures = [pool.submit(_run_epoch, populations[i], states[i], gen_start, n_gens, generations,
+                                           island_size, deadline) for i in range(islands)]
+                    gens_done = 0
+                    for i, f in enumerate(futures):
+                        populations[i], scores[i], states[i], n_eval, done, (pid, hits, misses, size) = f.result()
+                        self.evaluations += n_eval
+                        gens_done = max(gens_done, done)
+                        cache_hits, cache_misses, cache_sizes[pid] = cache_hits + hits, cache_misses + misses, size
+                    epochs += 1
+                    gens_run = gen_start + gens_done
+                    best_island = max(range(islands), key=lambda i: max(scores[i], default=0.0))
+                    best = max(range(len(scores[best_island])), key=scores[best_island].__getitem__, default=None)
+                    best_score = scores[best_island][best] if best is not None else 0.0
+                    if self._report_progress(gens_run, generations, best_score,
+                                             populations[best_island][best] if best is not None else None):
+                        stop_reason = "cancelled"
+                        break
+                    # 收敛按迁移轮检查 (停滞代数按本轮推进的代数累计)；时间预算在工作进程内逐代检查，这里兜底
+                    reason = self._stop_reason(best_score, gens_done)
+                    if reason:
+                        stop_reason = reason
+                        break
+                    if gen_start + n_gens < generations:
+                        self._migrate(populations, scores, migrants)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        merged = [ind for pop in populations if pop for ind in pop]
+        if not merged: return []
+        final_scored = sorted(zip(self._evaluate_cached(merged).tolist(), merged), key=lambda x: x[0], reverse=True)
+        # 汇总各岛 (工作进程) 与本进程最终排名时的缓存统计
+        cache = self.fitness_cache
+        cache_stats = FitnessCache.summary(cache_hits + cache.hits, cache_misses + cache.misses,
+                                           sum(cache_sizes.values()) + len(cache))
+        self.run_stats = {"engine": "islands", "evaluations": self.evaluations, "generations": generations,
+                          "generations_run": gens_run, "stop_reason": stop_reason,
+                          "cancelled": stop_reason == "cancelled", "elapsed_ms": self._elapsed_ms(),
+                          "evals_per_sec": self._evals_per_sec(), "islands": islands, "workers": workers, "island_size": island_size,
+                          "migration_interval": migration_interval, "epochs": epochs, "seed": base_seed,
+                          "pruned_artifacts": self.pruned_count, **cache_stats}
+        return self._format_results(final_scored, top_n)
+
+    @staticmethod
+    def _migrate(populations: List[List[List[int]]], scores: List[List[float]], migrants: int):
+        """环形迁移：岛 i 的前 migrants 名替换岛 i+1 的最差个体 (跳过目标岛已有的组合)"""
+        k = len(populations)
+        if k < 2 or migrants <= 0: return
+        emigrants = []
+        for pop, sc in zip(populations, scores):
+            order = sorted(range(len(pop)), key=lambda j: sc[j], reverse=True)
+            emigrants.append([(sc[j], pop[j]) for j in order[:migrants]])
+        for i in range(k):
+            dst, dst_scores = populations[(i + 1) % k], scores[(i + 1) % k]
+            present = set(tuple(ind) for ind in dst)
+            worst = sorted(range(len(dst)), key=lambda j: dst_scores[j])
+            w = 0
+            for score, ind in emigrants[i]:
+                if tuple(ind) in present or w >= len(worst): continue
+                j = worst[w]
+                if score <= dst_scores[j]: break
+                dst[j], dst_scores[j] = list(ind), score
+                present.add(tuple(ind))
+                w += 1
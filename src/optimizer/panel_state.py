@@ -0,0 +1,79 @@
+# src/optimizer/panel_state.py
+from typing import Optional
+
+import numpy as np
+
+from src.optimizer.inventory import CompiledInventory
+from src.optimizer.set_bonus import SetBonusTable, PIECE_COUNTS
+
+
+class PanelState:
+    """
+    一批个体的增量面板状态：行号、圣遗物词条累加、套装件数、套装静态增量。
+    子代由父代派生：只对换掉的部位做 “减旧加新”，套装增量只对跨过 2/4 件阈值的个体重算。
+    """
+
+    __slots__ = ("inventory", "set_table", "rows", "stat_sums", "counts", "set_bonus")
+
+    def __init__(self, inventory: CompiledInventory, set_table: SetBonusTable, rows: np.ndarray,
+                 stat_sums: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None,
+                 set_bonus: Optional[np.ndarray] = None):
+        self.inventory = inventory
+        self.set_table = set_table
+        self.rows = np.asarray(rows, dtype=np.int64).reshape(-1, 5)
+        if stat_sums is None:
+            # 全量构建
+            stat_sums = inventory.stats[self.rows].sum(axis=1)
+            counts = set_table.set_counts(inventory.set_ids[self.rows])
+            set_bonus = set_table.bonus_from_counts(counts)
+        self.stat_sums = stat_sums
+        self.counts = counts
+        self.set_bonus = set_bonus
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def totals(self) -> np.ndarray:
+        """(N, 累加列)：圣遗物词条 + 套装静态增量 (动态套装效果由调用方按面板另算)"""
+        return self.stat_sums + self.set_bonus
+
+    def take(self, idx) -> "PanelState":
+        return PanelState(self.inventory, self.set_table, self.rows[idx], self.stat_sums[idx],
+                          self.counts[idx], self.set_bonus[idx])
+
+    def derive(self, parents: np.ndarray, rows: np.ndarray) -> "PanelState":
+        """由父代状态派生子代：parents[i] 为子代 i 的父代下标，rows 为子代行号 (N, 5)"""
+        parents = np.asarray(parents, dtype=np.int64)
+        child = self.take(parents)
+        child.stat_sums = child.stat_sums.copy()
+        child.counts = child.counts.copy()
+        child.set_bonus = child.set_bonus.copy()
+        child._replace(np.asarray(rows, dtype=np.int64).reshape(-1, 5))
+        return child
+
+    def swap(self, i: int, slot: int, row: int):
+        """原地把个体 i 的第 slot 个部位换成 row (局部搜索单步)"""
+        rows = self.rows.copy()
+        rows[i, slot] = row
+        self._replace(rows)
+
+    def _replace(self, rows: np.ndarray):
+        old = self.rows
+        ii, jj = np.nonzero(rows != old)
+        if len(ii):
+            inv = self.inventory
+            old_rows, new_rows = old[ii, jj], rows[ii, jj]
+            np.add.at(self.stat_sums, ii, inv.stats[new_rows] - inv.stats[old_rows])
+            changed = np.unique(ii)
+            before = self.counts[changed]
+            np.add.at(self.counts, (ii, inv.set_ids[old_rows]), -1)
+            np.add.at(self.counts, (ii, inv.set_ids[new_rows]), 1)
+            # 只有件数跨过 2/4 件阈值的个体需要重算套装增量
+            after = self.counts[changed]
+            crossed = np.zeros(len(changed), dtype=bool)
+            for pieces in PIECE_COUNTS:
+                crossed |= ((before >= pieces) != (after >= pieces)).any(axis=1)
+            if crossed.any():
+                redo = changed[crossed]
+                self.set_bonus[redo] = self.set_table.bonus_from_counts(self.counts[redo])
+        self.rows = rows
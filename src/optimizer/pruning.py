@@ -0,0 +1,64 @@
+# src/optimizer/pruning.py
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from src.engine.calculator import DamageCalculator
+from src.optimizer.inventory import CompiledInventory, COL
+from src.optimizer.set_bonus import SetBonusTable
+
+# 技能倍率类型 / 公式变量 -> 受影响的累加列
+_MULTIPLIER_COLUMNS = {
+    "atk_percent": ("atk_pct", "atk_flat"),
+    "hp_percent": ("hp_pct", "hp_flat"),
+    "def_percent": ("def_pct", "def_flat"),
+    "em": ("em",),
+}
+_VARIABLE_COLUMNS = {
+    "atk": ("atk_pct", "atk_flat"), "hp": ("hp_pct", "hp_flat"), "def": ("def_pct", "def_flat"),
+    "em": ("em",), "er": ("energy_recharge",), "crit_rate": ("crit_rate",), "crit_dmg": ("crit_dmg",),
+}
+
+
+def relevant_columns(skill_multipliers: List[Dict[str, Any]], damage_type: str, reaction: Optional[str],
+                     set_table: SetBonusTable) -> List[int]:
+    """目标技能实际用到的累加列 (其余列不影响伤害)"""
+    names = {"crit_rate", "crit_dmg", "universal_dmg", "ele_dmg", "act_dmg"}
+    for m in skill_multipliers:
+        names.update(_MULTIPLIER_COLUMNS.get(m["type"], ()))
+    # 精通曲线：激化 / 增幅反应与月绽放、月感电
+    if (reaction and any(r in reaction for r in ["aggravate", "spread", "vaporize", "melt"])) or \
+            (damage_type in DamageCalculator.MOON_SYSTEM_TYPES and damage_type != "MoonBurn"):
+        names.add("em")
+    # 动态套装效果引用的面板变量
+    for _, _, _, formula in set_table.dynamic_effects:
+        for var in formula.variables:
+            names.update(_VARIABLE_COLUMNS.get(var, ()))
+    return sorted(COL[n] for n in names)
+
+
+def prune_dominated(inventory: CompiledInventory, pools: Dict[str, List[int]], columns: List[int],
+                    keep: int) -> Tuple[Dict[str, List[int]], int]:
+    """
+    在同部位、同套装内剔除被至少 keep 件圣遗物支配 (所有相关列均不差) 的圣遗物。
+    同套装比较保证套装件数约束不受影响；被 keep 件支配的圣遗物不可能进入前 keep 名方案。
+    返回 (剪枝后的部位池, 剔除件数)。
+    """
+    pruned, removed = {}, 0
+    for slot, rows in pools.items():
+        rows = np.asarray(rows, dtype=np.int64)
+        kept_mask = np.ones(len(rows), dtype=bool)
+        set_rows = inventory.set_ids[rows]
+        for sid in np.unique(set_rows):
+            idx = np.flatnonzero(set_rows == sid)
+            if len(idx) <= keep: continue
+            vals = inventory.stats[rows[idx]][:, columns]
+            # ge[a, b]: b 在所有相关列上不差于 a；完全相同者按先后顺序视为前者支配后者
+            ge = (vals[None, :, :] >= vals[:, None, :]).all(axis=-1)
+            gt = (vals[None, :, :] > vals[:, None, :]).any(axis=-1)
+            order = np.arange(len(idx))
+            dominates = ge & (gt | (order[None, :] < order[:, None]))
+            kept_mask[idx[dominates.sum(axis=1) >= keep]] = False
+        pruned[slot] = rows[kept_mask].tolist()
+        removed += int((~kept_mask).sum())
+    return pruned, removed
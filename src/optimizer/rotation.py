@@ -0,0 +1,66 @@
+# src/optimizer/rotation.py
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from src.optimizer.genetic_algo import ArtifactOptimizer
+from src.optimizer.inventory import CompiledInventory
+from src.optimizer.panel_state import PanelState
+
+
+class RotationArtifactOptimizer(ArtifactOptimizer):
+    """
+    轮换目标：一次优化同时考虑多个技能 (如 普攻 + 战技 + 月绽放重击)，适应度为 Σ 次数 × 单次伤害。
+    每个候选的圣遗物词条与套装件数只算一次，各技能只重查各自的套装表 (动作增伤 / 元素不同) 并批量求伤害。
+
+    entries 中每项：{"skill_type", "hits", "base_info", "fixed_panel", "fixed_damage_bonus",
+    "multipliers", "element", "damage_type", "reaction", "params"}，Buff 面板由调用方按技能分别算好。
+    """
+
+    def __init__(self, artifacts_data, set_effects_data, entries: List[Dict[str, Any]], forced_set=None):
+        if not entries: raise ValueError("轮换至少需要一个技能")
+        inventory = artifacts_data if isinstance(artifacts_data, CompiledInventory) \
+            else CompiledInventory(artifacts_data)
+        self.entries = [self._entry_optimizer(inventory, set_effects_data, e, forced_set) for e in entries]
+        self.hits = np.array([float(e["hits"]) for e in entries])
+        # 面板展示、强制套装等沿用第一个技能的配置
+        first = entries[0]
+        super().__init__(inventory, set_effects_data, first["base_info"], first["fixed_panel"],
+                         first["fixed_damage_bonus"], first["multipliers"], first["element"], first["skill_type"],
+                         first["damage_type"], first["reaction"], forced_set, **first["params"])
+
+    @staticmethod
+    def _entry_optimizer(artifacts_data, set_effects_data, e: Dict[str, Any], forced_set) -> ArtifactOptimizer:
+        return ArtifactOptimizer(artifacts_data, set_effects_data, e["base_info"], e["fixed_panel"],
+                                 e["fixed_damage_bonus"], e["multipliers"], e["element"], e["skill_type"],
+                                 e["damage_type"], e["reaction"], forced_set, **e["params"])
+
+    def _relevant_columns(self) -> List[int]:
+        # 总伤害对各技能单调，取各技能相关列的并集做支配剪枝仍然安全
+        return sorted({c for opt in self.entries for c in opt._relevant_columns()})
+
+    def _rotation_scores(self, state: PanelState) -> np.ndarray:
+        """(N,) 个体 -> (技能数, N) 单次伤害"""
+        return np.stack([opt._score_sums(opt._state_sums(state)) for opt in self.entries])
+
+    def _evaluate_population(self, population, state: Optional[PanelState] = None) -> np.ndarray:
+        if len(population) == 0: return np.zeros(0)
+        rows = np.asarray(population, dtype=np.int64)
+        self.evaluations += len(rows)
+        if state is None: state = self._panel_state(rows)
+        scores = self.hits @ self._rotation_scores(state)
+        if self.forced_set:
+            forced_count = np.count_nonzero(self.inventory.set_ids[rows] == self.forced_set_id, axis=1)
+            scores = np.where(forced_count < 4, 0.0, scores)
+        return scores
+
+    def _evaluate(self, individual: List[int]) -> float:
+        return float(self._evaluate_population([individual])[0])
+
+    def _result_extras(self, individual: List[int]) -> Dict[str, Any]:
+        per_hit = self._rotation_scores(self._panel_state([individual]))[:, 0]
+        return {"rotation": [
+            {"skill_type": opt.skill_type, "damage_type": opt.damage_type, "reaction": opt.reaction,
+             "hits": float(hits), "damage_per_hit": float(d), "damage": float(hits * d),
+             "panel": opt._calculate_panel_and_bonus(individual, opt.skill_type)}
+            for opt, hits, d in zip(self.entries, self.hits, per_hit)]}
@@ -0,0 +1,153 @@
+# src/optimizer/set_bonus.py
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from src.engine.formula import Formula, compile_formula
+from src.optimizer.inventory import STAT_COLUMNS, COL
+
+# 与元素无关、直接累加的套装效果
+_PLAIN_EFFECT_COLUMNS = {
+    "atk_percent": COL["atk_pct"], "hp_percent": COL["hp_pct"], "em": COL["em"],
+    "crit_rate": COL["crit_rate"], "crit_dmg": COL["crit_dmg"],
+    "energy_recharge": COL["energy_recharge"], "moon_dmg_bonus": COL["moon_dmg_bonus"],
+}
+
+# 🟢 动作特定增伤：仅当技能类型匹配时计入动作区
+_ACTION_EFFECT_SKILLS = {
+    "skill_bonus": "ElementalSkill", "burst_bonus": "ElementalBurst",
+    "attack_bonus": "NormalAttack", "charged_bonus": "ChargedAttack",
+}
+
+PIECE_COUNTS = (2, 4)
+
+
+def effect_column(effect_type: str, effect_element: str, character_element: str, skill_type: str) -> Optional[int]:
+    """套装效果 -> 面板累加列；不影响当前角色/技能的效果返回 None"""
+    if effect_type in _PLAIN_EFFECT_COLUMNS:
+        return _PLAIN_EFFECT_COLUMNS[effect_type]
+    if effect_element in ("null", character_element):
+        if effect_type == "damage_bonus": return COL["universal_dmg"]
+        if effect_type == "elemental_bonus": return COL["ele_dmg"]
+    if _ACTION_EFFECT_SKILLS.get(effect_type) == skill_type:
+        return COL["act_dmg"]
+    return None
+
+
+class SetBonusTable:
+    """
+    套装效果编译表：对给定 (角色元素, 技能类型)，一次性把 set_effects.json 解析为
+    每个套装 2件套 / 4件套的面板增量向量。套装贡献 = 按件数阈值查表求和。
+    """
+
+    def __init__(self, set_effects_data: Dict[str, Any], set_names: List[str],
+                 character_element: str, skill_type: str):
+        self.set_names = set_names
+        char_elem = character_element.lower()
+        n_sets = len(set_names)
+
+        # tables[k] 对应 PIECE_COUNTS[k] 件套的增量矩阵 (套装 × 累加列)
+        self.tables = np.zeros((len(PIECE_COUNTS), n_sets, len(STAT_COLUMNS)), dtype=np.float64)
+        # 字符串公式 (按候选面板求值)：(套装编号, 件数, 累加列, 编译后公式)
+        self.dynamic_effects: List[Tuple[int, int, int, Formula]] = []
+        # 求值失败而被跳过的公式源码 (只提示一次)
+        self._skipped = set()
+
+        for sid, set_name in enumerate(set_names):
+            effs = set_effects_data.get(set_name)
+            if not effs: continue
+            for k, pieces in enumerate(PIECE_COUNTS):
+                n = str(pieces)
+                key = n if n in effs else f"{n}_piece"
+                for eff in effs.get(key, []):
+                    col = effect_column(eff.get("type"), (eff.get("element") or "null").lower(), char_elem, skill_type)
+                    if col is None: continue
+                    value = eff.get("value", 0)
+                    if isinstance(value, str):
+                        self.dynamic_effects.append((sid, pieces, col, compile_formula(value)))
+                    else:
+                        self.tables[k, sid, col] += value
+
+    def set_counts(self, set_rows: np.ndarray) -> np.ndarray:
+        """(N, 5) 的套装编号 -> (N, 套装数) 的件数矩阵"""
+        n_sets = len(self.set_names)
+        flat = (np.arange(len(set_rows))[:, None] * n_sets + set_rows).ravel()
+        return np.bincount(flat, minlength=len(set_rows) * n_sets).reshape(len(set_rows), n_sets)
+
+    def bonus_from_counts(self, counts: np.ndarray) -> np.ndarray:
+        """件数矩阵 -> 套装增量 (按 2/4 件阈值查表)"""
+        total = np.zeros(counts.shape[:-1] + (len(STAT_COLUMNS),), dtype=np.float64)
+        for k, pieces in enumerate(PIECE_COUNTS):
+            total += (counts >= pieces).astype(np.float64) @ self.tables[k]
+        return total
+
+    def bonus(self, set_rows: np.ndarray) -> np.ndarray:
+        """(N, 5) 的套装编号 -> (N, 累加列) 的套装增量"""
+        return self.bonus_from_counts(self.set_counts(set_rows))
+
+    def dynamic_bonus(self, counts: np.ndarray, context: Dict[str, np.ndarray]) -> np.ndarray:
+        """动态套装效果：对满足件数的候选按其面板 (context) 求值公式"""
+        total = np.zeros(counts.shape[:-1] + (len(STAT_COLUMNS),), dtype=np.float64)
+        for sid, pieces, col, formula in self.dynamic_effects:
+            active = counts[..., sid] >= pieces
+            if not active.any(): continue
+            try:
+                with np.errstate(all="ignore"):
+                    value = formula(context)
+            except ArithmeticError as e:
+                # 求值失败 (如标量除零) 时跳过该效果，同一公式只提示一次
+                if formula.source not in self._skipped:
+                    self._skipped.add(formula.source)
+                    print(f"[Warn] 套装 {self.set_names[sid]} 的动态效果已跳过: {e}")
+                continue
+            # 数组求值中除零 / 溢出的候选得到非有限值，按 0 计入
+            value = np.where(np.isfinite(value), value, 0.0)
+            total[..., col] += np.where(active, value, 0.0)
+        return total
+
+    def upper_bound(self, potential: np.ndarray, forced_sid: Optional[int] = None) -> np.ndarray:
+        """
+        套装增量的逐列乐观上界。potential 为 (N, 套装数) 的“最多可能件数”
+        (已定件数 + 剩余部位数)。五件圣遗物只能构成：无 / 一个2件套 / 两个2件套 / 一个4件套。
+        """
+        shape = potential.shape[:-1] + (len(STAT_COLUMNS),)
+        t2, t4 = self.tables
+        if forced_sid is not None:
+            # 强制套装必须凑满4件，剩余一件无法再成2件套
+            return np.broadcast_to(t2[forced_sid] + t4[forced_sid], shape).copy()
+        if not self.set_names:
+            return np.zeros(shape, dtype=np.float64)
+        two = np.where((potential >= 2)[..., None], t2, 0.0)
+        best_two_pairs = np.sort(two, axis=-2)[..., -2:, :].sum(axis=-2)
+        best_four = np.where((potential >= 4)[..., None], t2 + t4, 0.0).max(axis=-2)
+        return np.maximum(np.maximum(best_two_pairs, best_four), 0.0)
+
+    def feasible_upper_bound(self, counts: np.ndarray, reach: np.ndarray, remaining: int,
+                             forced_sid: Optional[int] = None) -> np.ndarray:
+        """
+        比 upper_bound 更紧的逐列上界：counts 为 (N, 套装数) 的已定件数，reach 为之后各部位中
+        每个套装最多还能凑的件数，remaining 为剩余部位数。只计入补齐所需件数不超过剩余部位的
+        4件套 / 2件套 / 两个2件套 (两个2件套所需件数之和也不超过 remaining)。
+        """
+        shape = counts.shape[:-1] + (len(STAT_COLUMNS),)
+        t2, t4 = self.tables
+        if forced_sid is not None:
+            return np.broadcast_to(t2[forced_sid] + t4[forced_sid], shape).copy()
+        if not self.set_names:
+            return np.zeros(shape, dtype=np.float64)
+        cap = np.minimum(reach, remaining)
+        need2 = np.maximum(2 - counts, 0)
+        ok2 = need2 <= cap
+        best = np.where((np.maximum(4 - counts, 0) <= cap)[..., None], t2 + t4, 0.0).max(axis=-2)
+        # 按补齐 2 件所需件数 (0 / 1 / 2) 分组，取每组逐列前两名组合成两个2件套
+        top = []
+        for k in range(3):
+            vals = np.sort(np.where((ok2 & (need2 == k))[..., None], t2, -np.inf), axis=-2)
+            top.append((vals[..., -1, :], vals[..., -2, :]))
+        for a in range(3):
+            best = np.maximum(best, top[a][0])
+            for b in range(a, 3):
+                if a + b > remaining: continue
+                pair = top[a][0] + top[a][1] if a == b else top[a][0] + top[b][0]
+                best = np.maximum(best, pair)
+        return np.maximum(best, 0.0)
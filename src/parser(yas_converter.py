@@ -1,141 +1,311 @@
+import hashlib
 import json
 import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, TextIO
 
+# 以脚本方式运行 (工作目录为 src/) 时也能导入项目模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.optimizer.artifact_store import ArtifactStoreWriter, fresh_store
 
-def convert_mona_to_my_format(input_file: str, output_file: str):
-    if not os.path.exists(input_file):
-        print(f"错误: 找不到输入文件 {input_file}")
-        return
-
-    with open(input_file, "r", encoding="utf-8") as f:
-        mona_data = json.load(f)
-
-    # 1. 完整的映射表（处理莫娜驼峰命名）
-    raw_set_map = {
-        "instructor": "教官",
-        "shimenawareminiscence": "追忆之注连",
-        "tenacityofthemillelith": "千岩牢固",
-        "finaleofthedeepgalleries": "深廊终曲",
-        "thunderingfury": "如雷的盛怒",
-        "wanderertroupe": "流浪大地的乐团",
-        "gladiatorfinale": "角斗士的终幕礼",
-        "longnightsoath": "长夜显现的誓言", "obsidiancodex": "黑曜典藏",
-        "scrolloftheheroofcindercity": "烬城勇者绘卷", "scrolloftheheroofanancientcity": "烬城勇者绘卷",
-        "weaverssongofthemoonlitnight": "纺月的夜歌", "pinnacleofcreation": "穹境示显之夜",
-        "marechausseehunter": "逐影猎人", "goldentroupe": "黄金剧团",
-        "nighttimewhispersintheechoingwoods": "回声之林夜话", "songofdayspast": "昔时之歌",
-        "fragmentofharmonicwhimsy": "谐律异想断章", "unfinishedreverie": "未竟的遐思",
-        "deepwoodmemories": "深林的记忆", "gildeddreams": "饰金之梦",
-        "emblemofseveredfate": "绝缘之旗印", "noblesseoblige": "昔日宗室之仪",
-        "viridescentvenerer": "翠绿之影", "archaicpetra": "悠古的磐岩",
-        "nymphsdream": "水仙之梦", "heartofdepth": "沉沦之心"
-    }
+# 1. 完整的映射表（处理莫娜驼峰命名）
+RAW_SET_MAP = {
+    "instructor": "教官",
+    "shimenawareminiscence": "追忆之注连",
+    "tenacityofthemillelith": "千岩牢固",
+    "finaleofthedeepgalleries": "深廊终曲",
+    "thunderingfury": "如雷的盛怒",
+    "wanderertroupe": "流浪大地的乐团",
+    "gladiatorfinale": "角斗士的终幕礼",
+    "longnightsoath": "长夜显现的誓言", "obsidiancodex": "黑曜典藏",
+    "scrolloftheheroofcindercity": "烬城勇者绘卷", "scrolloftheheroofanancientcity": "烬城勇者绘卷",
+    "weaverssongofthemoonlitnight": "纺月的夜歌", "pinnacleofcreation": "穹境示显之夜",
+    "marechausseehunter": "逐影猎人", "goldentroupe": "黄金剧团",
+    "nighttimewhispersintheechoingwoods": "回声之林夜话", "songofdayspast": "昔时之歌",
+    "fragmentofharmonicwhimsy": "谐律异想断章", "unfinishedreverie": "未竟的遐思",
+    "deepwoodmemories": "深林的记忆", "gildeddreams": "饰金之梦",
+    "emblemofseveredfate": "绝缘之旗印", "noblesseoblige": "昔日宗室之仪",
+    "viridescentvenerer": "翠绿之影", "archaicpetra": "悠古的磐岩",
+    "nymphsdream": "水仙之梦", "heartofdepth": "沉沦之心"
+}
 
-    element_map = {
-        "icebonus": "Cryo", "firebonus": "Pyro", "waterbonus": "Hydro",
-        "windbonus": "Anemo", "rockbonus": "Geo", "thunderbonus": "Electro",
-        "grassbonus": "Dendro", "physicalbonus": "Physical"
-    }
+ELEMENT_MAP = {
+    "icebonus": "Cryo", "firebonus": "Pyro", "waterbonus": "Hydro",
+    "windbonus": "Anemo", "rockbonus": "Geo", "thunderbonus": "Electro",
+    "grassbonus": "Dendro", "physicalbonus": "Physical"
+}
 
-    raw_stat_map = {
-        "lifestatic": "hp_flat", "lifepercentage": "hp_percent",
-        "attackstatic": "atk_flat", "attackpercentage": "atk_percent",
-        "defendstatic": "def_flat", "defendpercentage": "def_percent",
-        "elementalmastery": "em", "recharge": "energy_recharge",
-        "critical": "crit_rate", "criticaldamage": "crit_dmg",
-        "cureeffect": "healing_bonus"
-    }
-    for k in element_map.keys(): raw_stat_map[k] = "elemental_bonus"
+RAW_STAT_MAP = {
+    "lifestatic": "hp_flat", "lifepercentage": "hp_percent",
+    "attackstatic": "atk_flat", "attackpercentage": "atk_percent",
+    "defendstatic": "def_flat", "defendpercentage": "def_percent",
+    "elementalmastery": "em", "recharge": "energy_recharge",
+    "critical": "crit_rate", "criticaldamage": "crit_dmg",
+    "cureeffect": "healing_bonus"
+}
+for _k in ELEMENT_MAP.keys(): RAW_STAT_MAP[_k] = "elemental_bonus"
+
+SLOT_FIX_MAP = {
+    "flower": "flower", "feather": "plume", "plume": "plume",
+    "sand": "sands", "sands": "sands", "cup": "goblet",
+    "goblet": "goblet", "head": "circlet", "circlet": "circlet"
+}
+
+CHUNK_SIZE = 1 << 16
+MAX_SKIPPED_DETAILS = 10  # 报告中仅显示前10条
+ID_BITS = 53  # 内容哈希 ID 位数 (前端 JS 可精确表示的整数范围)
+
+
+class JsonArrayStream:
+    """
+    增量 JSON 读取：按块读入文本，逐个解码顶层数组 (或顶层对象中各数组值) 的元素，
+    缓冲区只保留当前元素，内存占用与导出文件大小无关。
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """读入下一块并丢弃已消费的部分；文件已读完时返回 False"""
+        if self.eof: return False
+        chunk = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk: self.eof = True
+        return bool(chunk)
+
+    def _peek(self) -> str:
+        """跳过空白，返回下一个非空白字符 (文件结束时为空串)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self._fill(): return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"JSON 格式错误: 位置 {self.pos} 处应为 '{char}'")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        """解码一个完整的值；缓冲区内不完整 (或数字可能被截断) 时继续读入"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof: raise
+            self._fill()
+
+    def _array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            sep = self._peek()
+            self.pos += 1
+            if sep == "]": return
+            if sep != ",": raise ValueError(f"JSON 格式错误: 位置 {self.pos - 1} 处应为 ',' 或 ']'")
+
+    def items(self) -> Iterator[Any]:
+        """
+        顶层为数组时逐个产出其元素；顶层为对象时产出各数组值的元素 (莫娜按部位分组)，
+        出现 "artifacts" 键时只取该键，其后的其他数组不再读取。
+        """
+        first = self._peek()
+        if first == "[":
+            yield from self._array()
+            return
+        self._expect("{")
+        if self._peek() == "}": return
+        only_artifacts = False
+        while True:
+            key = self._value()
+            self._expect(":")
+            if self._peek() == "[" and (key == "artifacts" or not only_artifacts):
+                only_artifacts = only_artifacts or key == "artifacts"
+                yield from self._array()
+            else:
+                self._value()  # 非数组值 (如 version) 直接跳过
+            sep = self._peek()
+            self.pos += 1
+            if sep == "}": return
+            if sep != ",": raise ValueError(f"JSON 格式错误: 位置 {self.pos - 1} 处应为 ',' 或 '}}'")
+
+
+def artifact_uid(art: Dict[str, Any]) -> int:
+    """
+    由莫娜原始内容 (套装 / 部位 / 主词条 / 副词条，副词条顺序无关) 计算稳定 ID：
+    同一件圣遗物每次导入 ID 不变，重复扫描到的同一件得到相同 ID。映射表更新不改变 ID。
+    """
+    m_tag = art.get("mainTag", {})
+    raw_pos = art.get("position", art.get("slot", ""))
+    key = [(art.get("setName") or "").lower(), SLOT_FIX_MAP.get(raw_pos.lower(), raw_pos.lower()),
+           m_tag.get("name", "").lower(), round(float(m_tag.get("value", 0)), 4),
+           sorted((sub["name"].lower(), round(float(sub["value"]), 4)) for sub in art.get("normalTags", []))]
+    digest = hashlib.blake2b(json.dumps(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> (64 - ID_BITS)
+
+
+def record_digest(art: Dict[str, Any]) -> bytes:
+    """转换后记录的内容摘要，用于与上次导入比对是否变更"""
+    return hashlib.blake2b(json.dumps(art, ensure_ascii=False, sort_keys=True).encode("utf-8"), digest_size=8).digest()
 
-    slot_fix_map = {
-        "flower": "flower", "feather": "plume", "plume": "plume",
-        "sand": "sands", "sands": "sands", "cup": "goblet",
-        "goblet": "goblet", "head": "circlet", "circlet": "circlet"
+
+def load_previous(output_file: str) -> Dict[int, bytes]:
+    """上次导入结果：ID -> 记录摘要 (流式读取，文件不存在或损坏时视为首次导入)"""
+    if not os.path.exists(output_file): return {}
+    try:
+        with open(output_file, "r", encoding="utf-8") as f:
+            return {art["id"]: record_digest(art) for art in JsonArrayStream(f).items()}
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"[Warn] 无法读取上次导入结果 {output_file}，按首次导入处理: {e}")
+        return {}
+
+
+def convert_artifact(art: Dict[str, Any], new_id: int) -> Optional[Dict[str, Any]]:
+    """单件莫娜圣遗物 -> 本项目格式；部位无法识别时返回 None"""
+    # 部位与套装识别
+    raw_pos = art.get("position", art.get("slot", ""))
+    target_slot = SLOT_FIX_MAP.get(raw_pos.lower())
+    if not target_slot: return None
+
+    set_name = RAW_SET_MAP.get(art.get("setName", "").lower(), art.get("setName"))
+
+    # 主副词条处理
+    m_tag = art.get("mainTag", {})
+    mk = m_tag.get("name", "").lower()
+
+    new_art = {
+        "id": new_id,
+        "set": set_name,
+        "slot": target_slot,
+        # "level" 字段按要求移除
+        "main_stat": {
+            "type": RAW_STAT_MAP.get(mk, mk),
+            "value": m_tag.get("value", 0),
+            "element": ELEMENT_MAP.get(mk, "null")
+        },
+        "substats": []
     }
 
-    # 2. 提取数据
-    all_raw_artifacts = []
-    if isinstance(mona_data, dict):
-        if "artifacts" in mona_data:
-            all_raw_artifacts = mona_data["artifacts"]
-        else:
-            for val in mona_data.values():
-                if isinstance(val, list): all_raw_artifacts.extend(val)
-    elif isinstance(mona_data, list):
-        all_raw_artifacts = mona_data
-
-    result = []
+    for sub in art.get("normalTags", []):
+        sk = sub["name"].lower()
+        new_art["substats"].append({
+            "type": RAW_STAT_MAP.get(sk, sk),
+            "value": sub["value"],
+            "element": "null"
+        })
+    return new_art
+
+
+def write_artifact_store(json_file: str, store_file: str, count: int):
+    """按已写出的 JSON 再流式读一遍，整体重新生成列式二进制存储 (供优化器 mmap 加载)"""
+    with open(json_file, "r", encoding="utf-8") as src, ArtifactStoreWriter(store_file, count, json_file) as writer:
+        for art in JsonArrayStream(src).items():
+            writer.append(art)
+
+
+def convert_mona_to_my_format(input_file: str, output_file: str, store_file: Optional[str] = None) \
+        -> Optional[Dict[str, List[int]]]:
+    """
+    store_file 默认与输出 JSON 同名、扩展名为 .bin；传空串则不生成列式存储。
+    ID 取内容哈希，重复圣遗物只保留一件；与上次导入结果比对，返回新增 / 移除 / 变更的 ID，
+    内容没有任何变化时不重写输出文件 (下游按文件版本缓存的数据保持有效)。
+
+    局限：只要有任何一件新增 / 移除 / 变更，输出 JSON 与列式存储都整体重写 (不做逐行修补)。
+    列式存储按件数定长分列、行号即 JSON 中的顺序，增删会使其后所有行移位，字符串表也可能变化；
+    下游缓存按文件版本失效，需要按 ID 精确失效时使用返回的 added / removed / changed。
+    """
+    if not os.path.exists(input_file):
+        print(f"错误: 找不到输入文件 {input_file}")
+        return None
+
+    previous = load_previous(output_file)
+
+    # 2. 流式读取、筛选、去重并逐行写出 (先写临时文件，有变化才替换，中途出错不破坏旧文件)
+    total_count = 0
     skipped_count = 0
     skipped_details = []
-    current_id = 1
-
-    for art in all_raw_artifacts:
-        # --- 等级筛选逻辑 ---
-        level = art.get("level", 0)
-        if level != 20:
-            skipped_count += 1
-            skipped_details.append(f"ID: {art.get('id', 'N/A')} | Set: {art.get('setName')} | Level: {level}")
-            continue
-
-        # 部位与套装识别
-        raw_pos = art.get("position", art.get("slot", ""))
-        target_slot = slot_fix_map.get(raw_pos.lower())
-        if not target_slot: continue
-
-        set_name = raw_set_map.get(art.get("setName", "").lower(), art.get("setName"))
-
-        # 主副词条处理
-        m_tag = art.get("mainTag", {})
-        mk = m_tag.get("name", "").lower()
-
-        new_art = {
-            "id": current_id,
-            "set": set_name,
-            "slot": target_slot,
-            # "level" 字段按要求移除
-            "main_stat": {
-                "type": raw_stat_map.get(mk, mk),
-                "value": m_tag.get("value", 0),
-                "element": element_map.get(mk, "null")
-            },
-            "substats": []
-        }
-
-        for sub in art.get("normalTags", []):
-            sk = sub["name"].lower()
-            new_art["substats"].append({
-                "type": raw_stat_map.get(sk, sk),
-                "value": sub["value"],
-                "element": "null"
-            })
-
-        result.append(new_art)
-        current_id += 1
-
-    # 3. 单行保存
-    with open(output_file, "w", encoding="utf-8") as f:
+    converted_count = 0
+    duplicate_count = 0
+    seen = set()
+    added: List[int] = []
+    changed: List[int] = []
+
+    tmp_file = f"{output_file}.tmp"
+    with open(input_file, "r", encoding="utf-8") as src, open(tmp_file, "w", encoding="utf-8") as f:
         f.write("[\n")
-        for i, art in enumerate(result):
-            line = json.dumps(art, ensure_ascii=False)
-            f.write(f"  {line}{',' if i < len(result) - 1 else ''}\n")
-        f.write("]\n")
+        for art in JsonArrayStream(src).items():
+            total_count += 1
+            # --- 等级筛选逻辑 ---
+            level = art.get("level", 0)
+            if level != 20:
+                skipped_count += 1
+                if len(skipped_details) < MAX_SKIPPED_DETAILS:
+                    skipped_details.append(f"ID: {art.get('id', 'N/A')} | Set: {art.get('setName')} | Level: {level}")
+                continue
+
+            uid = artifact_uid(art)
+            if uid in seen:
+                duplicate_count += 1
+                continue
+            new_art = convert_artifact(art, uid)
+            if new_art is None: continue
+            seen.add(uid)
+
+            old = previous.get(uid)
+            if old is None:
+                added.append(uid)
+            elif old != record_digest(new_art):
+                changed.append(uid)
+
+            # 3. 单行保存
+            line = json.dumps(new_art, ensure_ascii=False)
+            f.write(f",\n  {line}" if converted_count else f"  {line}")
+            converted_count += 1
+        f.write("\n]\n" if converted_count else "]\n")
+    removed = [uid for uid in previous if uid not in seen]
+
+    if store_file is None: store_file = os.path.splitext(output_file)[0] + ".bin"
+    if added or removed or changed or not os.path.exists(output_file):
+        os.replace(tmp_file, output_file)
+        if store_file: write_artifact_store(output_file, store_file, converted_count)
+    else:
+        os.remove(tmp_file)
+        if store_file and fresh_store(store_file, output_file) is None:
+            write_artifact_store(output_file, store_file, converted_count)
 
     # 4. 输出报告
     print(f"\n" + "═" * 50)
     print(f"【圣遗物转换与筛选报告】")
-    print(f"扫描源数据总量: {len(all_raw_artifacts)} 件")
+    print(f"扫描源数据总量: {total_count} 件")
     print(f"筛选掉非20级圣遗物: {skipped_count} 件")
-    print(f"最终成功转换: {len(result)} 件")
+    print(f"合并重复圣遗物: {duplicate_count} 件")
+    print(f"最终成功转换: {converted_count} 件")
+    print(f"与上次导入相比: 新增 {len(added)} / 移除 {len(removed)} / 变更 {len(changed)} / "
+          f"未变 {converted_count - len(added) - len(changed)} 件")
     print("═" * 50)
 
     if skipped_count > 0:
         print("\n[过滤详情 (Level != 20)]:")
-        for detail in skipped_details[:10]:  # 仅显示前10条
+        for detail in skipped_details:
             print(f"  - {detail}")
-        if skipped_count > 10:
-            print(f"  ... 以及其他 {skipped_count - 10} 件")
+        if skipped_count > MAX_SKIPPED_DETAILS:
+            print(f"  ... 以及其他 {skipped_count - MAX_SKIPPED_DETAILS} 件")
     print("═" * 50 + "\n")
+    return {"added": added, "removed": removed, "changed": changed}
 
 
 if __name__ == "__main__":
-    convert_mona_to_my_format("../data/raw/mona.json", "../data/processed/artifacts.json")
\ No newline at end of file
+    convert_mona_to_my_format("../data/raw/mona.json", "../data/processed/artifacts.json")
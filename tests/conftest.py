@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# 项目以根目录为导入起点 (src.engine.xxx)，直接运行 pytest 时补上
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
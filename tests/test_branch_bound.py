@@ -0,0 +1,54 @@
+# tests/test_branch_bound.py
+"""精确引擎 (分支定界) 与穷举一致：小规模子采样库存上逐个枚举全部组合对照前 N 名"""
+import contextlib
+import io
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.bench import Scenario
+from benchmarks.quality import CASES
+from benchmarks.synthetic import generate_inventory
+from src.common.repository import SET_EFFECTS_PATH
+from src.optimizer.branch_bound import ExactArtifactOptimizer
+
+TOP_N = 5
+PER_SLOT = 7
+# 子采样只保留少数套装，保证 2+2 / 4 件套组合足够多；绝缘之旗印带动态公式 (er * 0.25)
+SETS = ["绝缘之旗印", "辰砂往生录", "来歆余响", "逐影猎人"]
+
+
+def _sample(seed: int):
+    with open(SET_EFFECTS_PATH, encoding="utf-8") as f:
+        set_names = list(json.load(f))
+    artifacts = [a for a in generate_inventory(3000, set_names, seed) if a["set"] in SETS]
+    picked = []
+    for slot in ["flower", "plume", "sands", "goblet", "circlet"]:
+        picked += [a for a in artifacts if a["slot"] == slot][:PER_SLOT]
+    return picked
+
+
+def _brute_force(opt) -> np.ndarray:
+    pools = [opt.inventory.rows_by_slot[s] for s in opt.SLOTS]
+    rows = np.asarray(list(itertools.product(*pools)), dtype=np.int64)
+    scores = opt._evaluate_population(rows)
+    return np.sort(scores)[::-1][:TOP_N]
+
+
+@pytest.mark.parametrize("case", CASES + [{**CASES[2], "forced_set": "绝缘之旗印"}],
+                         ids=["charged", "spread", "aggravate_dynamic", "forced_set"])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_exact_matches_brute_force(case, seed, monkeypatch):
+    # 缩小分簇门槛与叶子块大小，让小库存也走到分簇剪枝与分块展开
+    monkeypatch.setattr(ExactArtifactOptimizer, "CLUSTER_MIN_POOL", 2)
+    monkeypatch.setattr(ExactArtifactOptimizer, "LEAF_CHUNK", 64)
+    scenario = Scenario(0, seed, case, artifacts=_sample(seed))
+    opt = scenario.make_optimizer(ExactArtifactOptimizer)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = opt.optimize(top_n=TOP_N)
+    expected = _brute_force(scenario.make_optimizer(ExactArtifactOptimizer))
+    expected = expected[expected > 0]
+    assert len(expected) and opt.run_stats["stop_reason"] == "completed"
+    np.testing.assert_allclose([r["damage"] for r in result], expected, rtol=1e-9)
@@ -0,0 +1,72 @@
+# tests/test_calculator.py
+"""calculate_damage_batch 与标量 calculate_damage 逐项一致 (优化器内核依赖这一点)"""
+import numpy as np
+import pytest
+
+from src.engine.calculator import DamageCalculator
+
+MULTIPLIERS = [{"type": "atk_percent", "value": 180.0}, {"type": "hp_percent", "value": 12.0},
+               {"type": "def_percent", "value": 20.0}, {"type": "em", "value": 50.0}, {"type": "flat", "value": 300.0}]
+
+CONTEXT = {
+    "elemental_bonus": 0.466, "physical_bonus": 0.0, "skill_bonus": 0.2, "burst_bonus": 0.3,
+    "charged_bonus": 0.15, "base_multiplier_add": 800.0, "resistance_percent": 0.2, "def_reduction": 0.1,
+    "def_ignore": 0.05, "ascension_mult": 0.1, "moon_base_flat": 500.0, "moon_base_pct": 0.2,
+    "moon_dmg_bonus": 0.3, "reaction_bonus_map": {"aggravate": 0.2, "spread": 0.1, "vaporize": 0.15, "melt": 0.15},
+    "reaction_specific_bonus": 0.05,
+}
+
+CASES = [
+    ("ElementalSkill", None),
+    ("ElementalBurst", "aggravate"),
+    ("ElementalSkill", "spread"),
+    ("ChargedAttack", "vaporize_hydro"),
+    ("ElementalBurst", "vaporize_pyro"),
+    ("NormalAttack", "melt_pyro"),
+    ("ElementalBurst", "melt_cryo"),
+    ("MoonBloom", None),
+    ("MoonElectro", None),
+    ("MoonBurn", None),
+]
+
+
+def _panels(n=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "final_atk": rng.uniform(800, 3000, n), "final_hp": rng.uniform(15000, 50000, n),
+        "final_def": rng.uniform(500, 1500, n), "final_em": rng.uniform(0, 1000, n),
+        "final_er_bonus": rng.uniform(0, 1.5, n), "all_damage_bonus": rng.uniform(1.0, 2.5, n),
+        # 含越界暴击率，覆盖截断分支
+        "crit_rate": rng.uniform(-0.1, 1.2, n), "crit_dmg": rng.uniform(0.5, 3.0, n),
+    }
+
+
+@pytest.mark.parametrize("damage_type,reaction", CASES)
+def test_batch_matches_scalar(damage_type, reaction):
+    panels = _panels()
+    batch = DamageCalculator.calculate_damage_batch(MULTIPLIERS, damage_type, **panels, reaction=reaction, **CONTEXT)
+    scalar = [DamageCalculator.calculate_damage(MULTIPLIERS, damage_type, **{k: float(v[i]) for k, v in panels.items()},
+                                                reaction=reaction, **CONTEXT)
+              for i in range(len(batch))]
+    np.testing.assert_allclose(batch, scalar, rtol=1e-12)
+
+
+@pytest.mark.parametrize("res_pen", [0.0, 0.5, -0.8])
+def test_batch_matches_scalar_resistance_branches(res_pen):
+    # 抗性 <0 / 0~0.75 / ≥0.75 三段
+    panels = _panels(8, seed=1)
+    ctx = {**CONTEXT, "resistance_percent": res_pen}
+    batch = DamageCalculator.calculate_damage_batch(MULTIPLIERS, "ElementalSkill", **panels, **ctx)
+    scalar = [DamageCalculator.calculate_damage(MULTIPLIERS, "ElementalSkill",
+                                                **{k: float(v[i]) for k, v in panels.items()}, **ctx)
+              for i in range(len(batch))]
+    np.testing.assert_allclose(batch, scalar, rtol=1e-12)
+
+
+def test_batch_broadcasts_scalar_panel():
+    panels = {k: float(v[0]) for k, v in _panels(1).items()}
+    batch = DamageCalculator.calculate_damage_batch(MULTIPLIERS, "ElementalBurst", **panels, reaction="aggravate",
+                                                    **CONTEXT)
+    scalar = DamageCalculator.calculate_damage(MULTIPLIERS, "ElementalBurst", **panels, reaction="aggravate", **CONTEXT)
+    assert batch.shape == ()
+    assert float(batch) == pytest.approx(scalar, rel=1e-12)
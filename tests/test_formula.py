@@ -0,0 +1,56 @@
+# tests/test_formula.py
+"""动态公式：保存时拒绝非法 / 危险语法，求值时的算术错误只跳过对应效果"""
+import copy
+import json
+
+import numpy as np
+import pytest
+
+from main import apply_team_buffs_to_panel
+from src.common.repository import CHARACTERS_PATH
+from src.engine.calculator import DamageCalculator
+from src.engine.formula import FormulaError, compile_formula
+from src.optimizer.inventory import COL
+from src.optimizer.set_bonus import SetBonusTable
+
+
+@pytest.mark.parametrize("source", ["atk * 9**9**9", "atk ** atk", "2 ** 100", "atk +", "__import__('os')"])
+def test_rejected_at_compile_time(source):
+    with pytest.raises(FormulaError):
+        compile_formula(source)
+
+
+def test_small_constant_power_allowed():
+    assert compile_formula("atk ** 2 + 2 ** -1")({"atk": 3.0}) == pytest.approx(9.5)
+
+
+@pytest.mark.parametrize("source", ["atk / (em - em)", "((9 ** 9) ** 9) ** 9 * atk", "em ** 16 * 1e300",
+                                    "em ** 16 * 1e300 - em ** 16 * 1e300"])
+def test_runtime_error_is_arithmetic(source):
+    with pytest.raises(ArithmeticError):
+        DamageCalculator.resolve_dynamic_value(source, {"atk": 1000.0, "em": 100.0})
+
+
+def test_set_table_skips_failing_effect():
+    sets = {"A": {"2": [{"type": "em", "value": 80.0}], "4": [{"type": "crit_dmg", "value": "atk / (em - em)"}]}}
+    table = SetBonusTable(sets, ["A"], "Pyro", "ElementalSkill")
+    counts = np.array([[4], [2]])
+    # 数组上下文：除零得到非有限值，按 0 计入
+    bonus = table.dynamic_bonus(counts, {"atk": np.array([1000.0, 1000.0]), "em": np.array([100.0, 100.0])})
+    assert np.all(bonus[:, COL["crit_dmg"]] == 0.0)
+    # 标量上下文：抛出 ZeroDivisionError，跳过该效果
+    bonus = table.dynamic_bonus(counts[:1], {"atk": 1000.0, "em": 100.0})
+    assert np.all(bonus == 0.0)
+
+
+@pytest.mark.parametrize("source", ["hp / (em - em)", "hp ** 16 * 1e300"])
+def test_team_buffs_skip_failing_formula(source):
+    with open(CHARACTERS_PATH, encoding="utf-8") as f:
+        chars = json.load(f)
+    name = "龙王"
+    team = {name: copy.deepcopy(chars[name])}
+    _, baseline, *_ = apply_team_buffs_to_panel(name, team, "hydro", "ChargedAttack")
+    team[name].setdefault("buffs", []).append({"type": "em", "value": source, "scope": "self"})
+    _, panel, *_, logs = apply_team_buffs_to_panel(name, team, "hydro", "ChargedAttack")
+    assert panel == baseline
+    assert any("已跳过" in line for line in logs[name])